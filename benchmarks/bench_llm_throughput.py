@@ -0,0 +1,54 @@
+"""
+Measure LLM call throughput against a local stub instead of the OpenAI API.
+
+Usage:
+    python -m benchmarks.bench_llm_throughput --calls 200 --latency 0.5
+"""
+import argparse
+import asyncio
+import time
+from types import SimpleNamespace
+
+from llm import client as llm_client
+from llm.explanation_llm import generate_llm_explanation, generate_llm_explanations
+
+
+class StubAsyncClient:
+    """
+    Minimal stand-in for AsyncOpenAI that answers every completion after a fixed delay.
+    """
+
+    def __init__(self, latency: float):
+        self.latency = latency
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+
+    async def _create(self, model: str, messages: list[dict], temperature: float, **kwargs):
+        await asyncio.sleep(self.latency)
+        message = SimpleNamespace(content=f"stub explanation for {len(messages)} messages")
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)])
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--calls", type=int, default=100)
+    parser.add_argument("--latency", type=float, default=0.5)
+    args = parser.parse_args()
+
+    llm_client.set_async_client(StubAsyncClient(args.latency))
+    prompts = [f"prompt {i}" for i in range(args.calls)]
+
+    start = time.perf_counter()
+    for prompt in prompts[:10]:
+        generate_llm_explanation(prompt)
+    sequential = 10 / (time.perf_counter() - start)
+
+    start = time.perf_counter()
+    generate_llm_explanations(prompts)
+    concurrent = args.calls / (time.perf_counter() - start)
+
+    print(f"sequential: {sequential:.1f} calls/s")
+    print(f"concurrent: {concurrent:.1f} calls/s (max concurrency {llm_client.MAX_CONCURRENCY})")
+
+
+if __name__ == "__main__":
+    main()
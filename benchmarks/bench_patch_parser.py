@@ -0,0 +1,84 @@
+"""
+Micro-benchmark of code region extraction over large generated files and patches.
+
+Compares the previous regex + splitlines extraction with utils.patch_parser.
+
+Usage:
+    python -m benchmarks.bench_patch_parser --lines 50000 --hunks 500
+"""
+import argparse
+import random
+import re
+import timeit
+
+from utils.patch_parser import extract_region_pairs
+
+
+def legacy_extract_matched_code_regions(pre_code: str, post_code: str, patch: str, context_lines: int = 3) -> list[tuple[str, str]]:
+    pre_lines = pre_code.splitlines()
+    post_lines = post_code.splitlines()
+    pairs = []
+
+    for match in re.finditer(r"@@ -(\d+)(?:,(\d+))? \+(\d+)(?:,(\d+))?", patch):
+        start_pre = int(match.group(1)) - 1
+        len_pre = int(match.group(2)) if match.group(2) else 1
+        start_post = int(match.group(3)) - 1
+        len_post = int(match.group(4)) if match.group(4) else 1
+
+        lower_pre = max(0, start_pre - context_lines)
+        upper_pre = min(len(pre_lines), start_pre + len_pre + context_lines)
+        region_pre = "\n".join(pre_lines[lower_pre:upper_pre])
+
+        lower_post = max(0, start_post - context_lines)
+        upper_post = min(len(post_lines), start_post + len_post + context_lines)
+        region_post = "\n".join(post_lines[lower_post:upper_post])
+
+        pairs.append((region_pre, region_post))
+
+    return pairs
+
+
+def generate_case(line_count: int, hunk_count: int, seed: int = 0) -> tuple[str, str, str]:
+    """
+    Build a file, its edited version and the unified diff patch between them.
+    Each hunk replaces one line and carries 3 lines of context on each side.
+    """
+    rng = random.Random(seed)
+    pre_lines = [f"    value_{i} = compute({i}, {rng.random():.6f})" for i in range(line_count)]
+    post_lines = list(pre_lines)
+
+    changed = sorted(rng.sample(range(3, line_count - 3), hunk_count))
+    patch_lines = []
+    for line_no in changed:
+        post_lines[line_no] = pre_lines[line_no].replace("compute", "compute_fast")
+        patch_lines.append(f"@@ -{line_no - 2},7 +{line_no - 2},7 @@")
+        patch_lines.extend(f" {pre_lines[i]}" for i in range(line_no - 3, line_no))
+        patch_lines.append(f"-{pre_lines[line_no]}")
+        patch_lines.append(f"+{post_lines[line_no]}")
+        patch_lines.extend(f" {pre_lines[i]}" for i in range(line_no + 1, line_no + 4))
+
+    return "\n".join(pre_lines) + "\n", "\n".join(post_lines) + "\n", "\n".join(patch_lines)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--lines", type=int, default=50_000)
+    parser.add_argument("--hunks", type=int, default=500)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    pre_code, post_code, patch = generate_case(args.lines, args.hunks)
+
+    legacy = timeit.timeit(lambda: legacy_extract_matched_code_regions(pre_code, post_code, patch), number=args.repeat)
+    parsed = timeit.timeit(lambda: extract_region_pairs(pre_code, post_code, patch), number=args.repeat)
+
+    legacy_regions = len(legacy_extract_matched_code_regions(pre_code, post_code, patch))
+    parsed_regions = len(extract_region_pairs(pre_code, post_code, patch))
+
+    print(f"{args.lines} lines, {args.hunks} hunks, {args.repeat} runs")
+    print(f"legacy regex + splitlines: {legacy / args.repeat * 1000:.2f} ms/run, {legacy_regions} regions")
+    print(f"patch_parser:              {parsed / args.repeat * 1000:.2f} ms/run, {parsed_regions} regions (overlaps merged)")
+
+
+if __name__ == "__main__":
+    main()
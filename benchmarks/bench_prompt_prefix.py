@@ -0,0 +1,124 @@
+"""
+Compare provider prompt-cache hit rates and simulated latency of the legacy single-JSON
+explanation prompt against the shared-prefix message layout.
+
+A stub client emulates OpenAI prompt caching: prefixes of at least 1024 tokens are cached
+in 128-token increments, and uncached prompt tokens add latency.
+
+Usage:
+    python -m benchmarks.bench_prompt_prefix --input experiments/exp_001/base_output.jsonl
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import time
+from pathlib import Path
+from types import SimpleNamespace
+
+from llm import client as llm_client
+from llm.explanation_llm import generate_llm_explanations
+from llm.response_cache import set_cache_mode
+from models.datatypes import CodeRegion
+from prompt.assemble import build_explanation_prompt, build_explanation_messages, fit_shared_extra
+
+CHARS_PER_TOKEN = 4
+CACHE_MIN_TOKENS = 1024
+CACHE_INCREMENT = 128
+
+INSTRUCTIONS = (
+    "Given the topic and summary of the issue, analyze the provided code region and explain both why a change "
+    "is necessary and what changes should be made to address or improve it. "
+) * 4
+README = "\n".join(f"Project documentation line {i}: installation, usage and configuration notes." for i in range(50))
+
+
+class StubCachingClient:
+    """
+    AsyncOpenAI stand-in that reports cached prompt tokens like the OpenAI API.
+    """
+
+    def __init__(self, base_latency: float, latency_per_token: float):
+        self.base_latency = base_latency
+        self.latency_per_token = latency_per_token
+        self.seen_prefixes: set[str] = set()
+        self.prompt_tokens = 0
+        self.cached_tokens = 0
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+
+    async def _create(self, model: str, messages: list[dict], temperature: float, **kwargs):
+        text = "".join(f"{m['role']}:{m['content']}\n" for m in messages)
+        tokens = len(text) // CHARS_PER_TOKEN
+
+        cached = 0
+        for boundary in range(CACHE_MIN_TOKENS, tokens + 1, CACHE_INCREMENT):
+            digest = hashlib.sha256(text[:boundary * CHARS_PER_TOKEN].encode()).hexdigest()
+            if digest in self.seen_prefixes:
+                cached = boundary
+            self.seen_prefixes.add(digest)
+
+        self.prompt_tokens += tokens
+        self.cached_tokens += cached
+        await asyncio.sleep(self.base_latency + (tokens - cached) * self.latency_per_token)
+
+        usage = SimpleNamespace(
+            prompt_tokens=tokens,
+            completion_tokens=0,
+            total_tokens=tokens,
+            prompt_tokens_details=SimpleNamespace(cached_tokens=cached)
+        )
+        message = SimpleNamespace(content="stub explanation")
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)], usage=usage)
+
+
+def load_issues(path: Path) -> list[dict]:
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip() and line[0] != "/"]
+
+
+def build_prompts(issue: dict, layout: str) -> list:
+    regions = [CodeRegion(filename=r["filename"], code=r["code"]) for r in issue["code_regions"]]
+    summary = f"Issue {issue['repo']}#{issue['issue_no']}"
+    extra = {"readme": README}
+
+    if layout == "legacy":
+        return [build_explanation_prompt(issue["topic"], summary, region, extra, INSTRUCTIONS) for region in regions]
+
+    shared_extra = fit_shared_extra(issue["topic"], summary, regions, extra, INSTRUCTIONS)
+    return [build_explanation_messages(issue["topic"], summary, region, shared_extra, INSTRUCTIONS) for region in regions]
+
+
+def run_layout(issues: list[dict], layout: str, base_latency: float, latency_per_token: float):
+    stub = StubCachingClient(base_latency, latency_per_token)
+    llm_client.set_async_client(stub)
+
+    start = time.perf_counter()
+    calls = 0
+    for issue in issues:
+        prompts = build_prompts(issue, layout)
+        generate_llm_explanations(prompts)
+        calls += len(prompts)
+    elapsed = time.perf_counter() - start
+
+    ratio = stub.cached_tokens / stub.prompt_tokens if stub.prompt_tokens else 0.0
+    print(f"{layout:>7}: {calls} calls, {stub.prompt_tokens} prompt tokens, "
+          f"{ratio:.1%} cached, {elapsed / max(calls, 1) * 1000:.1f} ms/call simulated")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--input", type=Path, default=Path("experiments/exp_001/base_output.jsonl"))
+    parser.add_argument("--base-latency", type=float, default=0.05)
+    parser.add_argument("--latency-per-token", type=float, default=0.00005)
+    args = parser.parse_args()
+
+    set_cache_mode("bypass")  # Measure provider-side caching only
+    # Lift client-side rate limits so only the simulated latency is measured
+    llm_client.REQUESTS_PER_MINUTE = llm_client.TOKENS_PER_MINUTE = 10 ** 9
+    issues = load_issues(args.input)
+    for layout in ("legacy", "prefix"):
+        run_layout(issues, layout, args.base_latency, args.latency_per_token)
+
+
+if __name__ == "__main__":
+    main()
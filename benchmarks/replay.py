@@ -0,0 +1,341 @@
+"""
+Record/replay stand-ins for the GitHub and OpenAI clients, for running the flows offline.
+
+A GitHub fixture is a JSON document holding, per repo, its README, default branch head and,
+per PR, the base/head shas, changed files with patches and commits, plus file contents
+keyed by "ref:path". Fixtures are either recorded from the live API with `record_github_fixture`
+or derived from the experiment outputs with `derive_github_fixture`.
+
+Usage (record a fixture for the issues of an explanation output):
+    python -m benchmarks.replay --input experiments/exp_001/base_output.jsonl --output fixtures/exp_001.json
+"""
+import argparse
+import asyncio
+import difflib
+import hashlib
+import json
+import re
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+from types import SimpleNamespace
+
+GITHUB_LATENCY = 0.02  # Simulated seconds per GitHub call
+LLM_LATENCY = 0.2  # Simulated seconds per LLM call
+FILLER_LINES = 12  # Unchanged lines between derived regions of the same file, enough to keep hunks apart
+
+GRAPHQL_ALIAS = re.compile(r'f(\d+): object\(expression: ("(?:[^"\\]|\\.)*")\)')
+
+
+def load_jsonl(path: Path) -> list[dict]:
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip() and line[0] != "/"]
+
+
+def _sha(*parts) -> str:
+    return hashlib.sha1("/".join(str(p) for p in parts).encode()).hexdigest()
+
+
+class CallStats:
+    """
+    Thread-safe count of replayed calls by kind.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.calls = Counter()
+
+    def add(self, kind: str, latency: float):
+        with self._lock:
+            self.calls[kind] += 1
+        if latency:
+            time.sleep(latency)
+
+    def total(self) -> int:
+        return sum(self.calls.values())
+
+
+class ReplayRepo:
+    def __init__(self, full_name: str, data: dict, github: "ReplayGitHub"):
+        self.full_name = full_name
+        self.default_branch = data.get("default_branch", "main")
+        self._data = data
+        self._github = github
+
+    def _call(self, kind: str):
+        self._github.stats.add(kind, self._github.latency)
+
+    def get_pull(self, number: int):
+        self._call("get_pull")
+        pull = self._data.get("pulls", {}).get(str(number))
+        if pull is None:
+            raise LookupError(f"No replayed PR {self.full_name}#{number}")
+
+        def get_files():
+            self._call("get_files")
+            return [SimpleNamespace(**f) for f in pull["files"]]
+
+        def get_commits():
+            self._call("get_commits")
+            return [SimpleNamespace(sha=c["sha"], commit=SimpleNamespace(message=c["message"])) for c in pull["commits"]]
+
+        return SimpleNamespace(
+            base=SimpleNamespace(sha=pull["base"]),
+            head=SimpleNamespace(sha=pull["head"]),
+            get_files=get_files,
+            get_commits=get_commits
+        )
+
+    def get_commit(self, sha: str):
+        self._call("get_commit")
+        for pull in self._data.get("pulls", {}).values():
+            for commit in pull["commits"]:
+                if commit["sha"] == sha:
+                    return SimpleNamespace(
+                        sha=sha,
+                        parents=[SimpleNamespace(sha=p) for p in commit["parents"]],
+                        files=[SimpleNamespace(**f) for f in commit.get("files", pull["files"])]
+                    )
+        raise LookupError(f"No replayed commit {sha} in {self.full_name}")
+
+    def get_contents(self, path: str, ref: str):
+        self._call("get_contents")
+        content = self._data.get("contents", {}).get(f"{ref}:{path}")
+        if content is None:
+            raise LookupError(f"No replayed content for {self.full_name}@{ref}:{path}")
+        return SimpleNamespace(decoded_content=content.encode())
+
+    def get_branch(self, name: str):
+        self._call("get_branch")
+        return SimpleNamespace(commit=SimpleNamespace(sha=self._data.get("head_sha", _sha(self.full_name))))
+
+    def get_readme(self, ref: str | None = None):
+        self._call("get_readme")
+        if self._data.get("readme") is None:
+            raise LookupError(f"No replayed README for {self.full_name}")
+        return SimpleNamespace(decoded_content=self._data["readme"].encode())
+
+
+class ReplayGitHub:
+    """
+    PyGithub `Github` stand-in serving repos from a fixture.
+    """
+
+    def __init__(self, fixture: dict, latency: float = GITHUB_LATENCY, stats: CallStats | None = None):
+        self.fixture = fixture
+        self.latency = latency
+        self.stats = stats or CallStats()
+        self.rate_limiting = (5000, 5000)
+        self.rate_limiting_resettime = time.time() + 3600
+
+    def get_repo(self, full_name: str) -> ReplayRepo:
+        self.stats.add("get_repo", self.latency)
+        return ReplayRepo(full_name, self.fixture["repos"].get(full_name, {}), self)
+
+
+class ReplayGitHubPool:
+    """
+    `GitHubClientPool` stand-in: every acquire returns the replay client, and GraphQL blob
+    queries are answered from the fixture contents.
+    """
+
+    def __init__(self, github: ReplayGitHub):
+        self.github = github
+
+    def acquire(self) -> ReplayGitHub:
+        return self.github
+
+    def graphql(self, query: str, variables: dict) -> dict:
+        self.github.stats.add("graphql", self.github.latency)
+        data = self.github.fixture["repos"].get(f"{variables['owner']}/{variables['name']}", {})
+        repository = {}
+        for match in GRAPHQL_ALIAS.finditer(query):
+            text = data.get("contents", {}).get(json.loads(match.group(2)))
+            repository[f"f{match.group(1)}"] = None if text is None else {"text": text, "isBinary": False, "isTruncated": False}
+        return {"data": {"repository": repository}}
+
+
+class ReplayAsyncClient:
+    """
+    AsyncOpenAI stand-in answering with recorded explanations after a simulated latency.
+    JSON-mode requests for several code regions get one answer per region.
+    """
+
+    def __init__(self, answers: list[str], latency: float = LLM_LATENCY):
+        self.answers = answers or ["Replayed explanation."]
+        self.latency = latency
+        self.calls = 0
+        self._lock = threading.Lock()
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+
+    def _next_answer(self) -> str:
+        with self._lock:
+            self.calls += 1
+            return self.answers[self.calls % len(self.answers)]
+
+    async def _create(self, model: str, messages: list[dict], temperature: float, response_format: dict | None = None, **kwargs):
+        await asyncio.sleep(self.latency)
+        content = self._next_answer()
+        if response_format is not None:
+            region_count = len(json.loads(messages[-1]["content"])["code_regions"])
+            content = json.dumps({"regions": [{"index": i, "explanation": content} for i in range(region_count)]})
+
+        prompt_tokens = sum(len(m["content"]) for m in messages) // 4
+        completion_tokens = len(content) // 4
+        usage = SimpleNamespace(
+            prompt_tokens=prompt_tokens,
+            completion_tokens=completion_tokens,
+            total_tokens=prompt_tokens + completion_tokens,
+            prompt_tokens_details=SimpleNamespace(cached_tokens=0)
+        )
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))], usage=usage)
+
+
+def recorded_answers(paths: list[Path]) -> list[str]:
+    """
+    Explanations recorded in experiment outputs, used as replayed LLM answers.
+    """
+    return [
+        region["explanation"]
+        for path in paths
+        for issue in load_jsonl(path)
+        for region in issue["code_regions"]
+        if region.get("explanation")
+    ]
+
+
+def derive_github_fixture(pr_outputs: list[Path], readme_outputs: list[Path] = ()) -> dict:
+    """
+    Build a GitHub fixture from experiment outputs.
+
+    Every issue in `pr_outputs` becomes a PR whose files contain its recorded code regions,
+    each with its inner lines changed, so the real patch parsing and region extraction run
+    on it and yield the recorded regions again. Repos in `readme_outputs` only get a README.
+    """
+    repos: dict[str, dict] = {}
+
+    def repo_entry(name: str) -> dict:
+        readme = f"# {name}\n" + "\n".join(f"{name} documentation line {i}." for i in range(60))
+        return repos.setdefault(name, {"default_branch": "main", "head_sha": _sha(name), "readme": readme, "pulls": {}, "contents": {}})
+
+    for path in readme_outputs:
+        for issue in load_jsonl(path):
+            repo_entry(issue["repo"])
+
+    for path in pr_outputs:
+        for issue in load_jsonl(path):
+            repo = repo_entry(issue["repo"])
+            base, head = _sha(issue["repo"], issue["issue_no"], "base"), _sha(issue["repo"], issue["issue_no"], "head")
+
+            codes_by_file: dict[str, list[str]] = {}
+            for region in issue["code_regions"]:
+                codes_by_file.setdefault(region["filename"], []).append(region["code"])
+
+            files = []
+            for filename, codes in codes_by_file.items():
+                pre_lines, post_lines = [], []
+                for i, code in enumerate(codes):
+                    if i:
+                        filler = [f"# unchanged line {j}" for j in range(FILLER_LINES)]
+                        pre_lines += filler
+                        post_lines += filler
+                    lines = code.split("\n")
+                    pre_lines += lines
+                    # Hunks carry 3 context lines and extraction adds 3 more, so changing all but the
+                    # outer 6 lines on each side yields the recorded region again
+                    middle = len(lines) // 2
+                    changed = range(6, len(lines) - 6) if len(lines) > 12 else range(middle, middle + 1)
+                    post_lines += [f"{line}  # changed" if j in changed else line for j, line in enumerate(lines)]
+
+                pre, post = "\n".join(pre_lines) + "\n", "\n".join(post_lines) + "\n"
+                diff = difflib.unified_diff(pre.splitlines(keepends=True), post.splitlines(keepends=True), n=3)
+                patch = "".join(list(diff)[2:])  # Drop the ---/+++ file headers, as GitHub does
+                repo["contents"][f"{base}:{filename}"] = pre
+                repo["contents"][f"{head}:{filename}"] = post
+                files.append({"filename": filename, "status": "modified", "patch": patch})
+
+            repo["pulls"][str(issue["issue_no"])] = {
+                "base": base,
+                "head": head,
+                "files": files,
+                "commits": [{"sha": head, "message": f"Fix #{issue['issue_no']}", "parents": [base]}]
+            }
+
+    return {"repos": repos}
+
+
+def record_github_fixture(issues: list[tuple[str, int]], github=None) -> dict:
+    """
+    Record everything the flows read from GitHub for `issues` from the live API.
+    """
+    if github is None:
+        from github_api.client import get_github
+        github = get_github()
+
+    repos: dict[str, dict] = {}
+    for repo_name, issue_no in issues:
+        repo = github.get_repo(repo_name)
+        entry = repos.get(repo_name)
+        if entry is None:
+            head_sha = repo.get_branch(repo.default_branch).commit.sha
+            try:
+                readme = repo.get_readme(ref=head_sha).decoded_content.decode()
+            except Exception:
+                readme = None
+            entry = repos[repo_name] = {"default_branch": repo.default_branch, "head_sha": head_sha, "readme": readme, "pulls": {}, "contents": {}}
+
+        pr = repo.get_pull(issue_no)
+        files = [{"filename": f.filename, "status": f.status, "patch": f.patch} for f in pr.get_files()]
+        commits = []
+        for c in pr.get_commits():
+            commit = repo.get_commit(c.sha)
+            commits.append({
+                "sha": c.sha,
+                "message": c.commit.message,
+                "parents": [p.sha for p in commit.parents],
+                "files": [{"filename": f.filename, "status": f.status, "patch": f.patch} for f in commit.files]
+            })
+        entry["pulls"][str(issue_no)] = {"base": pr.base.sha, "head": pr.head.sha, "files": files, "commits": commits}
+
+        wanted = {(f["filename"], ref) for f in files if f["patch"] and f["status"] != "removed" for ref in (pr.base.sha, pr.head.sha)}
+        wanted |= {(f["filename"], ref) for c in commits for f in c["files"] if f["patch"] for ref in (c["sha"], *c["parents"][:1])}
+        for path, ref in wanted:
+            try:
+                entry["contents"][f"{ref}:{path}"] = repo.get_contents(path, ref=ref).decoded_content.decode()
+            except Exception:
+                continue  # Added or deleted on this side of the change
+
+    return {"repos": repos}
+
+
+def install_replay(fixture: dict, answers: list[str], github_latency: float = GITHUB_LATENCY, llm_latency: float = LLM_LATENCY) -> tuple[ReplayGitHub, ReplayAsyncClient]:
+    """
+    Route all GitHub and OpenAI calls to replay clients. Returns both for inspecting call counts.
+    """
+    from github_api import client as github_client
+    from llm import client as llm_client
+
+    github = ReplayGitHub(fixture, github_latency)
+    github_client._pool = ReplayGitHubPool(github)
+    llm = ReplayAsyncClient(answers, llm_latency)
+    llm_client.set_async_client(llm)
+    return github, llm
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--input", type=Path, nargs="+", default=[Path("experiments/exp_001/base_output.jsonl")])
+    parser.add_argument("--output", type=Path, required=True)
+    args = parser.parse_args()
+
+    issues = list(dict.fromkeys((issue["repo"], int(issue["issue_no"])) for path in args.input for issue in load_jsonl(path)))
+    fixture = record_github_fixture(issues)
+    args.output.parent.mkdir(parents=True, exist_ok=True)
+    with open(args.output, "w") as f:
+        json.dump(fixture, f)
+    print(f"Recorded {len(issues)} issues from {len(fixture['repos'])} repos to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+"""
+End-to-end benchmarks of the flows against replayed GitHub and OpenAI clients, without network access.
+
+Fixtures are derived from the experiment outputs, or loaded from a recorded fixture file
+(see `benchmarks/replay.py`) when BENCH_GITHUB_FIXTURE is set. Each benchmark reports
+issues/sec and GitHub and LLM calls per issue in its extra info.
+
+Usage:
+    pytest benchmarks/test_bench_flows.py --benchmark-only --benchmark-columns=mean,rounds
+    BENCH_GITHUB_LATENCY=0.05 BENCH_LLM_LATENCY=0.5 pytest benchmarks/test_bench_flows.py --benchmark-only
+"""
+import os
+import csv
+import json
+import itertools
+from pathlib import Path
+
+import pytest
+
+pytest.importorskip("pytest_benchmark")
+pytest.importorskip("prefect")
+
+from benchmarks.replay import derive_github_fixture, install_replay, load_jsonl, recorded_answers
+
+EXP_001 = Path("experiments/exp_001")
+EXP_002 = Path("experiments/exp_002")
+GITHUB_LATENCY = float(os.getenv("BENCH_GITHUB_LATENCY", "0.02"))
+LLM_LATENCY = float(os.getenv("BENCH_LLM_LATENCY", "0.2"))
+ROUNDS = int(os.getenv("BENCH_ROUNDS", "3"))
+
+
+@pytest.fixture
+def replay(tmp_path, monkeypatch):
+    """
+    Route GitHub and OpenAI calls to replay clients and keep every cache and output under `tmp_path`.
+    """
+    from github_api import backends, content_cache, fetch_readme
+    from llm import client as llm_client
+    from llm.response_cache import ResponseCache
+    import llm.response_cache as response_cache
+    import flows.explanation_flow as explanation_flow
+
+    fixture_path = os.getenv("BENCH_GITHUB_FIXTURE")
+    if fixture_path:
+        with open(fixture_path) as f:
+            fixture = json.load(f)
+    else:
+        fixture = derive_github_fixture([EXP_001 / "base_output.jsonl"], [EXP_002 / "base_output.jsonl"])
+    answers = recorded_answers([EXP_001 / "base_output.jsonl", EXP_002 / "base_output.jsonl"])
+    github, llm = install_replay(fixture, answers, GITHUB_LATENCY, LLM_LATENCY)
+
+    # Keep the replay on the API backend rather than cloning repos
+    monkeypatch.setattr(backends.shutil, "which", lambda name: None)
+    monkeypatch.setattr(response_cache, "_cache", ResponseCache(tmp_path / "llm.sqlite", mode="bypass"))
+    # Lift client-side rate limits so only the simulated latency is measured
+    monkeypatch.setattr(llm_client, "REQUESTS_PER_MINUTE", 10 ** 9)
+    monkeypatch.setattr(llm_client, "TOKENS_PER_MINUTE", 10 ** 9)
+    monkeypatch.setattr(llm_client, "_semaphore", None)
+
+    topics = {issue["topic"] for path in (EXP_001 / "base_output.jsonl",) for issue in load_jsonl(path)}
+    topic_map_path = tmp_path / "maptopics.csv"
+    with open(topic_map_path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["topicno1", "topic_name"])
+        for topic in topics:
+            number, _, name = topic.partition(": ")
+            writer.writerow([number, name])
+    monkeypatch.setattr(explanation_flow, "MAPTOPIC_PATH", topic_map_path)
+
+    rounds = itertools.count()
+
+    def fresh_round() -> Path:
+        """
+        Cold caches and a new output directory for one benchmark round.
+        """
+        round_dir = tmp_path / f"round_{next(rounds)}"
+        monkeypatch.setattr(content_cache, "_cache", content_cache.ContentCache(round_dir / "contents.sqlite", content_cache.CACHE_MAX_BYTES))
+        monkeypatch.setattr(fetch_readme, "README_CACHE_DIR", round_dir / "readme")
+        fetch_readme._readme_heads.clear()
+        return round_dir
+
+    yield github, llm, fresh_round
+
+    llm_client.set_async_client(None)
+    from github_api import client as github_client
+    github_client._pool = None
+
+
+def _report(benchmark, output_name: str, github, llm, tmp_path: Path):
+    issues = sum(len(load_jsonl(path)) for path in tmp_path.glob(f"round_*/{output_name}")) / ROUNDS
+    benchmark.extra_info["issues"] = issues
+    benchmark.extra_info["issues_per_s"] = issues / benchmark.stats.stats.mean if issues else 0.0
+    benchmark.extra_info["github_calls_per_issue"] = github.stats.total() / ROUNDS / issues if issues else 0.0
+    benchmark.extra_info["llm_calls_per_issue"] = llm.calls / ROUNDS / issues if issues else 0.0
+    benchmark.extra_info["github_calls"] = dict(github.stats.calls)
+    assert issues > 0
+
+
+def test_bench_explanation_flow(benchmark, replay, tmp_path):
+    pytest.importorskip("pyarrow")
+    from flows.explanation_flow import explanation_flow
+    github, llm, fresh_round = replay
+
+    def setup():
+        return (), {"output_path": fresh_round() / "explanations.jsonl"}
+
+    benchmark.pedantic(
+        lambda output_path: explanation_flow(data_path=EXP_001 / "data.feather", output_path=output_path, max_workers=4, resume=False),
+        setup=setup,
+        rounds=ROUNDS
+    )
+    _report(benchmark, "explanations.jsonl", github, llm, tmp_path)
+
+
+def test_bench_reflection_flow(benchmark, replay, tmp_path):
+    from flows.reflection_flow import reflection_flow
+    github, llm, fresh_round = replay
+
+    def setup():
+        return (), {"output_path": fresh_round() / "reflections.jsonl"}
+
+    # The recorded explanations predate stored post-change regions, so this also times the refetch path
+    benchmark.pedantic(
+        lambda output_path: reflection_flow(input_path=EXP_001 / "base_output.jsonl", output_path=output_path, resume=False),
+        setup=setup,
+        rounds=ROUNDS
+    )
+    _report(benchmark, "reflections.jsonl", github, llm, tmp_path)
+
+
+def test_bench_manual_explanation_flow(benchmark, replay, tmp_path):
+    pytest.importorskip("pandas")
+    from flows.manual_flow import manual_explanation_flow
+    github, llm, fresh_round = replay
+
+    def setup():
+        return (), {"output_path": fresh_round() / "augmented_output.jsonl"}
+
+    benchmark.pedantic(
+        lambda output_path: manual_explanation_flow(data_path=EXP_002 / "data.csv", output_path=output_path, include_extra=True, resume=False),
+        setup=setup,
+        rounds=ROUNDS
+    )
+    _report(benchmark, "augmented_output.jsonl", github, llm, tmp_path)
@@ -1,7 +1,20 @@
 from prefect import flow, task
-from pathlib import Path
-from flows.explanation_flow import explanation_flow
 import json
+from dataclasses import replace
+from pathlib import Path
+from typing import Callable
+from flows.explanation_flow import (
+    FIXED_INSTRUCTIONS, load_topic_map, prepare_issue, prepare_issues, explain_issue, explain_issues_in_batch, save_response
+)
+from github_api.backends import BackendSelector, RegionBackend
+from github_api.content_cache import log_cache_stats
+from llm.response_cache import log_response_cache_stats
+from models.datatypes import ExperimentVariant, PreparedIssue, PromptResponse, PromptRow
+from utils.checkpoint import load_completed, record_skipped, close_skipped
+from utils.concurrency import bounded_map
+from utils.data_loader import iter_issue_rows, count_issue_repos
+from utils.jsonl_sink import close_sink
+from utils.metrics import span, reset_metrics, log_run_report
 from utils.logger import logger
 
 SAMPLE_ID = "001"
@@ -36,23 +49,139 @@ def get_extra_info(file_path: str) -> dict:
     else:
         raise ValueError("Unsupported file type. Use .json or .txt")
 
+def variant_issue(issue: PreparedIssue, variant: ExperimentVariant) -> PreparedIssue:
+    """
+    The prepared issue with the variant's extra info merged over the shared README context.
+    """
+    if not variant.extra_info:
+        return issue
+    return replace(issue, extra={**issue.extra, **variant.extra_info})
+
+
+def explain_variants(issue: PreparedIssue, variants: list[ExperimentVariant], multi_region: bool = False) -> list[tuple[ExperimentVariant, PromptResponse]]:
+    """
+    Explain one prepared issue under every variant, with the variants' LLM calls in flight together.
+    """
+    def explain(variant: ExperimentVariant) -> tuple[ExperimentVariant, PromptResponse]:
+        response = explain_issue(
+            variant_issue(issue, variant),
+            multi_region,
+            variant.instructions or FIXED_INSTRUCTIONS,
+            variant.model,
+            variant.temperature
+        )
+        return variant, response
+
+    return list(bounded_map(explain, variants, max_workers=len(variants), ordered=True))
+
+
+def process_variant_row(
+    row: PromptRow,
+    topic_map: dict,
+    backend: RegionBackend,
+    variants: list[ExperimentVariant],
+    multi_region: bool = False,
+    on_skip: Callable[[str, int, str], None] | None = None
+) -> list[tuple[ExperimentVariant, PromptResponse]]:
+    """
+    Fetch and prepare a single issue once, then explain it under each of `variants`.
+
+    Returns:
+        list[tuple[ExperimentVariant, PromptResponse]]: One response per variant, or none if the issue was skipped.
+    """
+    try:
+        with span("issue"):
+            with span("prepare"):
+                issue = prepare_issue(row, topic_map, backend, on_skip=on_skip)
+            if issue is None:
+                return []
+
+            with span("explain"):
+                return explain_variants(issue, variants, multi_region)
+
+    except Exception as e:
+        logger.error(f"Error processing {row.repo}#{row.issue_no}: {e}")
+        return []
+
+
 @flow
-def experiment_flow():
-    base_output = BASE_OUTPUT_PATH 
-    extra_output = AUGMENTED_OUTPUT_PATH
+def variant_experiment_flow(
+    variants: list[ExperimentVariant],
+    data_path: Path = DATA_PATH,
+    max_workers: int = 1,
+    resume: bool = True,
+    use_batch: bool = False,
+    multi_region: bool = False
+):
+    """
+    Explain every issue in `data_path` under several prompt variants, writing each variant to its own output.
 
-    # Run baseline (README only)
-    explanation_flow(
-        data_path=DATA_PATH,
-        output_path=base_output)
-    
-    extra_info = get_extra_info(EXTRA_DATA_PATH) 
+    Code regions and README are fetched once per issue and shared by all variants, so each
+    extra variant only adds its LLM calls.
+
+    Args:
+        variants (list[ExperimentVariant]): Named combinations of extra info, instructions, model and temperature.
+        max_workers (int): Number of issues processed concurrently (1 = sequential).
+        resume (bool): Skip issues already written to a variant's output by an earlier run.
+        use_batch (bool): Send each variant's prompts through the OpenAI Batch API instead of live calls.
+        multi_region (bool): Explain all regions of an issue in one call instead of one call per region.
+    """
+    reset_metrics()
+    completed = {variant.name: load_completed(variant.output_path) if resume else set() for variant in variants}
 
-    # Run with README + extra notes
-    explanation_flow(
+    def pending_variants(row: PromptRow) -> list[ExperimentVariant]:
+        return [variant for variant in variants if (row.repo, row.issue_no) not in completed[variant.name]]
+
+    def skip(repo: str, issue_no: int, reason: str):
+        for variant in variants:
+            record_skipped(variant.output_path, repo, issue_no, reason)
+
+    rows = (row for row in iter_issue_rows(data_path) if pending_variants(row))
+    topic_map = load_topic_map()
+    selector = BackendSelector(count_issue_repos(data_path))
+
+    if use_batch:
+        issues = prepare_issues(rows, topic_map, selector, None, max_workers, skip)
+        for variant in variants:
+            explain_issues_in_batch(
+                [variant_issue(issue, variant) for issue in issues if (issue.repo, issue.issue_no) not in completed[variant.name]],
+                variant.output_path,
+                instructions=variant.instructions or FIXED_INSTRUCTIONS,
+                model=variant.model,
+                temperature=variant.temperature
+            )
+    else:
+        # Responses are written from the flow thread only, so each JSONL stays one line per issue
+        results = bounded_map(
+            lambda row: process_variant_row(row, topic_map, selector.for_repo(row.repo), pending_variants(row), multi_region, skip),
+            rows,
+            max_workers=max_workers
+        )
+        for responses in results:
+            for variant, response in responses:
+                save_response(response, variant.output_path)
+
+    for variant in variants:
+        close_sink(variant.output_path)
+        close_skipped(variant.output_path)
+    log_cache_stats()
+    log_response_cache_stats()
+    log_run_report()
+
+@flow
+def experiment_flow(max_workers: int = 1, use_batch: bool = False, multi_region: bool = False):
+    variants = [
+        # Baseline (README only)
+        ExperimentVariant(name="base", output_path=BASE_OUTPUT_PATH),
+        # README + extra notes
+        ExperimentVariant(name="augmented", output_path=AUGMENTED_OUTPUT_PATH, extra_info=get_extra_info(EXTRA_DATA_PATH)),
+    ]
+    variant_experiment_flow(
+        variants,
         data_path=DATA_PATH,
-        output_path=extra_output,
-        extra_info=extra_info
+        max_workers=max_workers,
+        use_batch=use_batch,
+        multi_region=multi_region
     )
 
 if __name__ == "__main__":
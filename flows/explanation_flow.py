@@ -1,18 +1,31 @@
 from prefect import flow, task
+from github import RateLimitExceededException, UnknownObjectException
 import pandas as pd
+from contextlib import nullcontext
+from functools import partial
 from pathlib import Path
-import json
-from dataclasses import asdict
+from typing import Callable, Iterable
 
 # Local imports (these modules you will define)
 from utils.logger import logger
 from github_api.fetch_commits import get_commits_from_pr
-from github_api.fetch_diffs import get_code_regions, get_code_regions_from_pr, CodeRegionLimitException
+from github_api.fetch_diffs import CodeRegionLimitException
+from github_api.backends import BackendSelector, RegionBackend
 from github_api.fetch_readme import get_readme_head
+from github_api.content_cache import log_cache_stats
+from llm.response_cache import log_response_cache_stats
 from utils.topic_mapping import map_topic_number_to_name
-from prompt.assemble import build_explanation_prompt
-from llm.explanation_llm import generate_llm_explanation
-from models.datatypes import CommitInfo, CodeRegion, PromptRow, PromptResponse
+from utils.concurrency import bounded_map
+from utils.checkpoint import SKIP_NO_PR, SKIP_REGION_LIMIT, load_completed, record_skipped, close_skipped
+from utils.data_loader import iter_issue_rows, count_issue_repos
+from utils.columnar_store import ColumnarWriter
+from utils.jsonl_sink import get_sink, close_sink
+from utils.metrics import span, reset_metrics, log_run_report
+from prompt.assemble import build_explanation_prompt, build_explanation_messages, build_multi_region_messages, fit_shared_extra
+from llm.explanation_llm import generate_llm_explanations, generate_llm_multi_explanation, as_messages
+from llm.batch import make_custom_id, run_batch
+from llm.retry import LLM_CALL_FAILED
+from models.datatypes import CommitInfo, CodeRegion, PromptRow, PromptResponse, PreparedIssue
 
 LOGGING_LEVEL = "DEBUG" # Comment this line for default usage
 logger.setLevel(LOGGING_LEVEL or "INFO")
@@ -22,6 +35,8 @@ DATA_SAMPLE = "sample_issues2" # Sample data identifier
 DATA_PATH = Path(f"data/{DATA_SAMPLE}.feather")  # Feather format
 MAPTOPIC_PATH = Path("data/maptopics.csv")
 OUTPUT_PATH = Path(f"outputs/{DATA_SAMPLE}/explanations.jsonl")
+PROMPT_LAYOUT = "prefix"  # "prefix" (cache-friendly shared prefix) or "legacy" (single JSON prompt)
+STORE_POST_REGIONS = True  # Keep the post-change region with each explanation for offline reflection
 
 # FIXED INSTRUCTIONS = '''
 
@@ -42,91 +57,306 @@ Additionally, refer to the "extra_info" section provided for any additional cont
 '''
 
 @task
-def load_data(data_path: Path = DATA_PATH) -> list[PromptRow]:
-    df = pd.read_feather(data_path)
-
-    # Filter for rows where 'bertopic' is not -1, which means topic has been successfully classified
-    # Filter for rows where 'chunk' is 0, which is where the summary of the issue is given
-    df = df[(df["bertopic"] != -1) & (df["chunk"] == 0)]
-
-    # Only have relevant columns
-    df = df[["repo", "issue_no", "summary", "bertopic"]]
-
-    # replace underscores in repo names with slashes
-    df['repo'] = df['repo'].str.replace('_', '/', regex=False)
-    
-    rows = [
-        PromptRow(
-            repo=row.repo,
-            issue_no=int(row.issue_no),
-            summary=row.summary,
-            bertopic=int(row.bertopic)
+def load_topic_map():
+    return pd.read_csv(MAPTOPIC_PATH).set_index("topicno1").to_dict()["topic_name"]
+
+
+def save_response(response: PromptResponse, output_path: Path = OUTPUT_PATH):
+    get_sink(output_path).write(response)
+
+
+def prepare_issue(
+    row: PromptRow,
+    topic_map: dict,
+    backend: RegionBackend,
+    extra_info: dict | None = None,
+    on_skip: Callable[[str, int, str], None] | None = None
+) -> PreparedIssue | None:
+    """
+    Fetch code regions and README for a single issue.
+
+    Args:
+        on_skip (Callable | None): Called with (repo, issue_no, reason) when the issue is skipped for
+            good (too many regions or no PR), e.g. `record_skipped` so resumed runs do not refetch it.
+            Rate-limit, network and other fetch failures are not reported, since a later run can
+            still process them.
+
+    Returns:
+        PreparedIssue | None: Everything needed to build the issue's prompts, or None if the issue was skipped.
+    """
+    topic_name = f"{row.bertopic}: {map_topic_number_to_name(row.bertopic, topic_map)}"
+    # commits: list[CommitInfo] = get_commits_from_pr(row.repo, row.issue_no)
+    try:
+        code_regions: list[tuple[CodeRegion,CodeRegion]] = backend.get_code_regions_from_pr(row.repo, row.issue_no)
+    except CodeRegionLimitException as cre_error:
+        logger.info(f"{cre_error} for {row.repo}#{row.issue_no}. Skipping this issue.")
+        if on_skip:
+            on_skip(row.repo, row.issue_no, SKIP_REGION_LIMIT)
+        return None
+    except RateLimitExceededException as rate_error:
+        # Retries are exhausted; surface this instead of reporting it as a missing PR
+        logger.warning(f"GitHub rate limit exhausted for {row.repo}#{row.issue_no}. Skipping this issue. Info: {rate_error}")
+        return None
+    except UnknownObjectException as pr_error:
+        logger.debug(f"No PR found for {row.repo}#{row.issue_no}. Skipping this issue. Info: {pr_error}")
+        if on_skip:
+            on_skip(row.repo, row.issue_no, SKIP_NO_PR)
+        return None  # Skip this issue and move to the next one
+    except Exception as fetch_error:
+        # Network, server and git failures are transient; leave the issue for a later run
+        logger.warning(f"Failed to fetch code regions for {row.repo}#{row.issue_no}. Skipping this issue. Info: {fetch_error}")
+        return None
+
+    logger.info(f"Processing {row.repo}#{row.issue_no} for topic '{topic_name}' with {len(code_regions)} code regions.")
+
+    extra = {"readme": get_readme_head(row.repo)}
+
+    if extra_info:
+        extra.update(extra_info)
+
+    return PreparedIssue(
+        repo=row.repo,
+        issue_no=row.issue_no,
+        topic=topic_name,
+        summary=row.summary,
+        code_regions=code_regions,
+        extra=extra
+    )
+
+
+def build_issue_prompts(issue: PreparedIssue, instructions: str = FIXED_INSTRUCTIONS, prompt_layout: str = PROMPT_LAYOUT) -> list[str | list[dict]]:
+    """
+    Build one prompt per code region of an issue.
+
+    Args:
+        prompt_layout (str): "prefix" puts instructions, topic, summary and extra info in a
+            shared message prefix with the region code last, so provider prompt caching can
+            reuse it across regions; "legacy" builds the original single JSON prompt.
+    """
+    pre_regions = [pre_region for pre_region, _ in issue.code_regions]
+
+    if prompt_layout == "legacy":
+        return [
+            build_explanation_prompt(
+                topic_name=issue.topic,
+                summary=issue.summary,
+                code_region=pre_region,  # single region
+                extra=issue.extra,
+                instructions=instructions
+            )
+            for pre_region in pre_regions
+        ]
+
+    # Trim README/notes once per issue so every region shares an identical prefix
+    extra = fit_shared_extra(issue.topic, issue.summary, pre_regions, issue.extra, instructions)
+    return [
+        build_explanation_messages(
+            topic_name=issue.topic,
+            summary=issue.summary,
+            code_region=pre_region,  # single region
+            extra=extra,
+            instructions=instructions
         )
-        for row in df.itertuples()
+        for pre_region in pre_regions
     ]
-    return rows
 
 
-@task
-def load_topic_map():
-    return pd.read_csv(MAPTOPIC_PATH).set_index("topicno1").to_dict()["topic_name"]
+def build_issue_response(issue: PreparedIssue, explanations: list[str | None], store_post_regions: bool = STORE_POST_REGIONS) -> PromptResponse:
+    region_outputs = [
+        CodeRegion(
+            filename=pre_region.filename,
+            code=pre_region.code,
+            explanation=explanation,
+            code_after=post_region.code if store_post_regions else None,
+            error=LLM_CALL_FAILED if explanation is None else None
+        )
+        for (pre_region, post_region), explanation in zip(issue.code_regions, explanations)
+    ]
+    return PromptResponse(repo=issue.repo,issue_no=issue.issue_no,topic=issue.topic,code_regions=region_outputs)
 
 
-@task
-def save_response(response: PromptResponse, output_path: Path = OUTPUT_PATH):
-    output_path.parent.mkdir(parents=True, exist_ok=True)
-    with open(output_path, "a") as f:
-        f.write(json.dumps(asdict(response)) + "\n")
+def explain_issue(
+    issue: PreparedIssue,
+    multi_region: bool = False,
+    instructions: str = FIXED_INSTRUCTIONS,
+    model: str = "gpt-4o",
+    temperature: float = 0.2
+) -> PromptResponse:
+    """
+    Generate an explanation per code region of a prepared issue.
 
+    Args:
+        multi_region (bool): Explain all regions in one structured call, falling back to
+            per-region calls if the answer cannot be parsed.
+        instructions (str): Instruction string for the LLM.
+        model (str): Model to use.
+        temperature (float): Sampling temperature.
+    """
+    if multi_region and len(issue.code_regions) > 1:
+        pre_regions = [pre_region for pre_region, _ in issue.code_regions]
+        with span("prompt"):
+            # Trimmed as for the per-region prompts, so a fallback reuses the same prefix
+            extra = fit_shared_extra(issue.topic, issue.summary, pre_regions, issue.extra, instructions)
+            messages = build_multi_region_messages(issue.topic, issue.summary, pre_regions, extra, instructions)
+        explanations = generate_llm_multi_explanation(messages, len(pre_regions), model, temperature)
+        if explanations is not None:
+            return build_issue_response(issue, explanations)
+        logger.info(f"Falling back to per-region explanations for {issue.repo}#{issue.issue_no}.")
 
-@flow
-def explanation_flow(data_path: Path = DATA_PATH, output_path: Path = OUTPUT_PATH, extra_info: dict | None = None):
-    rows = load_data(data_path)
-    topic_map = load_topic_map()
+    with span("prompt"):
+        prompts = build_issue_prompts(issue, instructions)
+    # All regions of the issue are sent concurrently
+    explanations = generate_llm_explanations(prompts, model, temperature)
+    return build_issue_response(issue, explanations)
 
-    for row in rows:
-        try:
-            topic_name = f"{row.bertopic}: {map_topic_number_to_name(row.bertopic, topic_map)}"
-            # commits: list[CommitInfo] = get_commits_from_pr(row.repo, row.issue_no)
-            try:
-                code_regions: list[tuple[CodeRegion,CodeRegion]] = get_code_regions_from_pr(row.repo, row.issue_no)
-            except CodeRegionLimitException as cre_error:
-                logger.info(f"{cre_error} for {row.repo}#{row.issue_no}. Skipping this issue.")
-                continue
-            except Exception as pr_error:
-                logger.debug(f"No PR found for {row.repo}#{row.issue_no}. Skipping this issue. Info: {pr_error}")
-                continue  # Skip this issue and move to the next one
-            
-            logger.info(f"Processing {row.repo}#{row.issue_no} for topic '{topic_name}' with {len(code_regions)} code regions.")
-            
-            extra = {"readme": get_readme_head(row.repo)}
-
-            if extra_info:
-                extra.update(extra_info)
-
-            region_outputs = []
-            for pre_region, _ in code_regions:
-                prompt_json = build_explanation_prompt(
-                    topic_name=topic_name,
-                    summary=row.summary,
-                    code_region=pre_region,  # single region
-                    extra=extra,
-                    instructions=FIXED_INSTRUCTIONS
-                )
-                explanation = generate_llm_explanation(prompt_json)
-                region_outputs.append(CodeRegion(
-                    filename=pre_region.filename,
-                    code=pre_region.code,
-                    explanation=explanation
-                ))
-                # region_outputs.append({"code": pre_region.code, "explanation": explanation})
-
-            response = PromptResponse(repo=row.repo,issue_no=row.issue_no,topic=topic_name,code_regions=region_outputs)
-            
-            save_response(response, output_path)
 
+def process_row(
+    row: PromptRow,
+    topic_map: dict,
+    backend: RegionBackend,
+    extra_info: dict | None = None,
+    multi_region: bool = False,
+    on_skip: Callable[[str, int, str], None] | None = None
+) -> PromptResponse | None:
+    """
+    Prepare a single issue and generate an explanation per code region.
+
+    Returns:
+        PromptResponse | None: The response for the issue, or None if the issue was skipped.
+    """
+    try:
+        with span("issue"):
+            with span("prepare"):
+                issue = prepare_issue(row, topic_map, backend, extra_info, on_skip)
+            if issue is None:
+                return None
+
+            with span("explain"):
+                return explain_issue(issue, multi_region)
+
+    except Exception as e:
+        logger.error(f"Error processing {row.repo}#{row.issue_no}: {e}")
+        return None
+
+
+def prepare_issues(
+    rows: Iterable[PromptRow],
+    topic_map: dict,
+    selector: BackendSelector,
+    extra_info: dict | None,
+    max_workers: int,
+    on_skip: Callable[[str, int, str], None] | None = None
+) -> list[PreparedIssue]:
+    """
+    Prepare every issue up front, dropping skipped and failed issues.
+    """
+    def safe_prepare(row: PromptRow) -> PreparedIssue | None:
+        try:
+            with span("prepare"):
+                return prepare_issue(row, topic_map, selector.for_repo(row.repo), extra_info, on_skip)
         except Exception as e:
             logger.error(f"Error processing {row.repo}#{row.issue_no}: {e}")
+            return None
+
+    return [issue for issue in bounded_map(safe_prepare, rows, max_workers=max_workers, ordered=True) if issue]
+
+
+def explain_issues_in_batch(
+    issues: list[PreparedIssue],
+    output_path: Path,
+    columnar: ColumnarWriter | None = None,
+    instructions: str = FIXED_INSTRUCTIONS,
+    model: str = "gpt-4o",
+    temperature: float = 0.2
+):
+    """
+    Explain all regions of prepared issues through the OpenAI Batch API and save the stitched responses.
+    """
+    if not issues:
+        return
+
+    batch_requests = [
+        (make_custom_id(issue.repo, issue.issue_no, i), as_messages(prompt))
+        for issue in issues
+        for i, prompt in enumerate(build_issue_prompts(issue, instructions))
+    ]
+    results = run_batch(batch_requests, output_path.with_suffix(".batch_input.jsonl"), model, temperature)
+
+    for issue in issues:
+        explanations = [
+            results.get(make_custom_id(issue.repo, issue.issue_no, i))
+            for i in range(len(issue.code_regions))
+        ]
+        response = build_issue_response(issue, explanations)
+        save_response(response, output_path)
+        if columnar:
+            columnar.write(response)
+
+
+def run_batch_explanations(rows: Iterable[PromptRow], topic_map: dict, selector: BackendSelector, extra_info: dict | None, max_workers: int, output_path: Path, columnar: ColumnarWriter | None = None):
+    """
+    Prepare every issue up front, explain all regions through the OpenAI Batch API and save the stitched responses.
+    """
+    issues = prepare_issues(rows, topic_map, selector, extra_info, max_workers, partial(record_skipped, output_path))
+    explain_issues_in_batch(issues, output_path, columnar)
+
+
+@flow
+def explanation_flow(
+    data_path: Path = DATA_PATH,
+    output_path: Path = OUTPUT_PATH,
+    extra_info: dict | None = None,
+    max_workers: int = 1,
+    ordered: bool = False,
+    resume: bool = True,
+    use_batch: bool = False,
+    multi_region: bool = False,
+    columnar_dir: Path | None = None
+):
+    """
+    Generate explanations for every classified issue in `data_path`.
+
+    Args:
+        max_workers (int): Number of issues processed concurrently (1 = sequential).
+        ordered (bool): Write responses in input order instead of completion order.
+        resume (bool): Skip issues already written to `output_path` by an earlier run.
+        use_batch (bool): Send all prompts through the OpenAI Batch API instead of live calls.
+        multi_region (bool): Explain all regions of an issue in one call instead of one call per region.
+        columnar_dir (Path | None): Also write one Parquet row per code region under this directory.
+    """
+    reset_metrics()
+    completed = load_completed(output_path) if resume else set()
+    if completed:
+        logger.info(f"Resuming: skipping {len(completed)} issues already in {output_path} or skipped earlier.")
+
+    # Rows are streamed from the feather file, so work starts before the whole file is read
+    rows = (row for row in iter_issue_rows(data_path) if (row.repo, row.issue_no) not in completed)
+    topic_map = load_topic_map()
+    # Repos that appear often in this batch are served from a local clone
+    selector = BackendSelector(count_issue_repos(data_path))
+    # The Parquet part is finalized even if the run fails part-way
+    with ColumnarWriter(columnar_dir) if columnar_dir else nullcontext() as columnar:
+        if use_batch:
+            run_batch_explanations(rows, topic_map, selector, extra_info, max_workers, output_path, columnar)
+        else:
+            # Responses are written from the flow thread only, so the JSONL stays one line per issue
+            responses = bounded_map(
+                lambda row: process_row(row, topic_map, selector.for_repo(row.repo), extra_info, multi_region, partial(record_skipped, output_path)),
+                rows,
+                max_workers=max_workers,
+                ordered=ordered
+            )
+            for response in responses:
+                if response is not None:
+                    save_response(response, output_path)
+                    if columnar:
+                        columnar.write(response)
+
+    close_sink(output_path)
+    close_skipped(output_path)
+    log_cache_stats()
+    log_response_cache_stats()
+    log_run_report()
 
 
 if __name__ == "__main__":
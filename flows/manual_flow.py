@@ -1,13 +1,19 @@
-from prefect import flow, task
-from dataclasses import asdict
-import pandas as pd
+from prefect import flow
 from pathlib import Path
-import json
+from typing import Iterator
 from utils.logger import logger
-from models.datatypes import ManualPromptRow, PromptResponse, CodeRegion
-from prompt.assemble import build_explanation_prompt
+from utils.checkpoint import load_completed_rows
+from utils.jsonl_sink import get_sink, close_sink
+from utils.metrics import span, reset_metrics, log_run_report
+from utils.concurrency import bounded_map
+from utils.data_loader import iter_manual_rows
+from models.datatypes import ExperimentVariant, ManualPromptRow, PromptResponse, CodeRegion
+from prompt.assemble import build_explanation_messages
 from github_api.fetch_readme import get_readme_head
 from llm.explanation_llm import generate_llm_explanation
+from llm.batch import make_custom_id, run_batch
+from llm.retry import LLM_CALL_FAILED
+from llm.response_cache import log_response_cache_stats
 
 SAMPLE_ID = "002"
 EXPERIMENT_PATH = Path(f"experiments/exp_{SAMPLE_ID}") 
@@ -34,31 +40,8 @@ Additionally, refer to the "extra_info" section provided for any additional cont
 <Any references to best practices, broader architectural concerns, etc.>
 '''
 
-@task
-def load_data_csv(data_path: Path) -> list[ManualPromptRow]:
-    df = pd.read_csv(data_path)
-    
-    # Only have relevant columns
-    df = df[["url", "summary", "topic", "code", "extra", "answer"]]
-    
-    rows = [
-        ManualPromptRow(
-            url=row.url,
-            summary=row.summary,
-            topic=row.topic,
-            code=row.code,
-            extra=row.extra,
-            answer=row.answer
-        ) for row in df.itertuples()
-    ]
-
-    return rows
-
-@task
 def save_response(response: PromptResponse, output_path: Path):
-    output_path.parent.mkdir(parents=True, exist_ok=True)
-    with open(output_path, "a") as f:
-        f.write(json.dumps(asdict(response)) + "\n")
+    get_sink(output_path).write(response)
 
 def get_repo_issue_from_url(url: str) -> tuple[str, int]:
     parts = url.split('/')
@@ -66,55 +49,153 @@ def get_repo_issue_from_url(url: str) -> tuple[str, int]:
     issue_no = int(parts[-1])
     return repo, issue_no
 
-@flow
-def manual_explanation_flow(data_path: Path, output_path: Path, include_extra: bool = False):
-    rows = load_data_csv(data_path)
+def iter_keyed_rows(data_path: Path) -> Iterator[tuple[int, ManualPromptRow, tuple[str, int]]]:
+    """
+    Yield (row index, row, (repo, issue_no)) for each manual row, skipping rows whose URL cannot be parsed.
+    """
+    for index, row in enumerate(iter_manual_rows(data_path)):
+        try:
+            key = get_repo_issue_from_url(row.url)
+        except (AttributeError, IndexError, ValueError) as e:
+            logger.error(f"Skipping row {index} with malformed URL {row.url!r}: {e}")
+            continue
+        yield index, row, key
+
+def build_manual_prompt(row: ManualPromptRow, include_extra: bool, extra_info: dict | None = None, instructions: str = FIXED_INSTRUCTIONS) -> list[dict]:
+    extra = {"context": row.extra} if include_extra else {}
+    if extra_info:
+        extra.update(extra_info)
+
+    # Build the prompt using the manual data
+    return build_explanation_messages(
+        topic_name=row.topic,
+        summary=row.summary,
+        code_region=CodeRegion(filename=row.url, code=row.code),
+        extra=extra,
+        instructions=instructions
+    )
 
-    for row in rows:
+def build_variant_prompt(row: ManualPromptRow, variant: ExperimentVariant) -> list[dict]:
+    return build_manual_prompt(row, variant.include_row_extra, variant.extra_info, variant.instructions or FIXED_INSTRUCTIONS)
+
+def build_manual_response(index: int, row: ManualPromptRow, explanation: str | None) -> PromptResponse:
+    repo, issue_no = get_repo_issue_from_url(row.url)
+    code_regions = [CodeRegion(
+        filename=row.url,
+        code=row.code,
+        explanation=explanation,
+        answer=row.answer,
+        error=LLM_CALL_FAILED if explanation is None else None
+        )]
+    # The row index keys resume, since the CSV can list the same URL more than once
+    return PromptResponse(repo=repo,issue_no=issue_no,topic=row.topic,code_regions=code_regions,row_index=index)
+
+@flow
+def manual_explanation_flow(data_path: Path, output_path: Path, include_extra: bool = False, resume: bool = True, use_batch: bool = False):
+    reset_metrics()
+    completed = load_completed_rows(output_path) if resume else set()
+    rows = ((index, row, key) for index, row, key in iter_keyed_rows(data_path) if index not in completed)
+
+    if use_batch:
+        rows = list(rows)
+        # Keyed on the row index so duplicate URLs in the CSV do not collide
+        batch_requests = [
+            (make_custom_id(*key, index), build_manual_prompt(row, include_extra))
+            for index, row, key in rows
+        ]
+        results = run_batch(batch_requests, output_path.with_suffix(".batch_input.jsonl"))
+        for (index, row, _), (custom_id, _) in zip(rows, batch_requests):
+            save_response(build_manual_response(index, row, results.get(custom_id)), output_path)
+
+        close_sink(output_path)
+        log_response_cache_stats()
+        log_run_report()
+        return
+
+    for index, row, _ in rows:
         try:
             logger.info(f"Processing {row.url} for topic '{row.topic}'")
-            
-            repo, issue_no = get_repo_issue_from_url(row.url)
-            extra = {"context": row.extra} if include_extra else {}
-             
-            # Build the prompt using the manual data
-            prompt_json = build_explanation_prompt(
-                topic_name=row.topic,
-                summary=row.summary,
-                code_region=CodeRegion(filename=row.url, code=row.code),
-                extra=extra,
-                instructions=FIXED_INSTRUCTIONS
-            )
-
-            explanation = generate_llm_explanation(prompt_json)
-            code_regions = [CodeRegion(
-                filename=row.url,
-                code=row.code,
-                explanation=explanation,
-                answer=row.answer
-                )]
-            
-            response = PromptResponse(repo=repo,issue_no=issue_no,topic=row.topic,code_regions=code_regions)
 
-            save_response(response, output_path)
+            with span("prompt"):
+                prompt = build_manual_prompt(row, include_extra)
+            with span("explain"):
+                explanation = generate_llm_explanation(prompt)
+
+            save_response(build_manual_response(index, row, explanation), output_path)
 
         except Exception as e:
             logger.error(f"Error processing {row.url}: {e}")
+
+    close_sink(output_path)
+    log_response_cache_stats()
+    log_run_report()
             
 @flow
-def manual_experiment_flow():
-    
-    manual_explanation_flow(
-        data_path=DATA_PATH,
-        output_path=BASE_OUTPUT_PATH,
-        include_extra=False
-        )
-    
-    manual_explanation_flow(
-        data_path=DATA_PATH,
-        output_path=AUGMENTED_OUTPUT_PATH,
-        include_extra=True
-    )
+def manual_variant_flow(variants: list[ExperimentVariant], data_path: Path = DATA_PATH, resume: bool = True, use_batch: bool = False):
+    """
+    Explain every manual row under several prompt variants, writing each variant to its own output.
+
+    The rows are read once and each row's variant calls are sent together, so each extra
+    variant only adds its LLM calls.
+
+    Args:
+        variants (list[ExperimentVariant]): Named combinations of extra info, instructions, model and temperature.
+        resume (bool): Skip rows already written to a variant's output by an earlier run, matched by row index.
+        use_batch (bool): Send each variant's prompts through the OpenAI Batch API instead of live calls.
+    """
+    reset_metrics()
+    completed = {variant.name: load_completed_rows(variant.output_path) if resume else set() for variant in variants}
+
+    def pending_variants(index: int) -> list[ExperimentVariant]:
+        return [variant for variant in variants if index not in completed[variant.name]]
+
+    rows = ((index, row, key) for index, row, key in iter_keyed_rows(data_path) if pending_variants(index))
+
+    if use_batch:
+        rows = list(rows)
+        for variant in variants:
+            variant_rows = [(index, row, key) for index, row, key in rows if index not in completed[variant.name]]
+            # Keyed on the row index so duplicate URLs in the CSV do not collide
+            batch_requests = [
+                (make_custom_id(*key, index), build_variant_prompt(row, variant))
+                for index, row, key in variant_rows
+            ]
+            results = run_batch(batch_requests, variant.output_path.with_suffix(".batch_input.jsonl"), variant.model, variant.temperature)
+            for (index, row, _), (custom_id, _) in zip(variant_rows, batch_requests):
+                save_response(build_manual_response(index, row, results.get(custom_id)), variant.output_path)
+    else:
+        for index, row, _ in rows:
+            try:
+                logger.info(f"Processing {row.url} for topic '{row.topic}'")
+
+                def explain(variant: ExperimentVariant) -> tuple[ExperimentVariant, str | None]:
+                    with span("prompt"):
+                        prompt = build_variant_prompt(row, variant)
+                    return variant, generate_llm_explanation(prompt, variant.model, variant.temperature)
+
+                pending = pending_variants(index)
+                # The variants' calls for a row are in flight together
+                with span("explain"):
+                    explanations = list(bounded_map(explain, pending, max_workers=len(pending), ordered=True))
+
+                for variant, explanation in explanations:
+                    save_response(build_manual_response(index, row, explanation), variant.output_path)
+
+            except Exception as e:
+                logger.error(f"Error processing {row.url}: {e}")
+
+    for variant in variants:
+        close_sink(variant.output_path)
+    log_response_cache_stats()
+    log_run_report()
+
+@flow
+def manual_experiment_flow(use_batch: bool = False):
+    variants = [
+        ExperimentVariant(name="base", output_path=BASE_OUTPUT_PATH),
+        ExperimentVariant(name="augmented", output_path=AUGMENTED_OUTPUT_PATH, include_row_extra=True),
+    ]
+    manual_variant_flow(variants, data_path=DATA_PATH, use_batch=use_batch)
     
 if __name__ == "__main__":
     manual_experiment_flow()
@@ -0,0 +1,136 @@
+from prefect import flow
+from pathlib import Path
+
+from utils.logger import logger
+from github_api.backends import BackendSelector
+from github_api.content_cache import log_cache_stats
+from llm.response_cache import log_response_cache_stats
+from utils.concurrency import Stage, run_pipeline
+from utils.checkpoint import load_completed, record_skipped, close_skipped
+from utils.jsonl_sink import close_sink
+from utils.metrics import span, reset_metrics, log_run_report
+from utils.data_loader import iter_issue_rows, count_issue_repos
+from flows.explanation_flow import DATA_PATH, load_topic_map, save_response, prepare_issue, explain_issue
+from flows.reflection_flow import save_reflection, reflect_issue, load_explanations, stored_region_pairs, match_region_pairs
+from models.datatypes import PromptRow, PromptResponse, PreparedIssue, ReflectionResponse
+
+DATA_SAMPLE = "sample_issues2"
+
+EXPLANATION_OUTPUT_PATH = Path(f"outputs/{DATA_SAMPLE}/explanations.jsonl")
+REFLECTION_OUTPUT_PATH = Path(f"outputs/{DATA_SAMPLE}/reflections.jsonl")
+
+
+@flow
+def explain_reflect_flow(
+    data_path: Path = DATA_PATH,
+    explanation_output_path: Path = EXPLANATION_OUTPUT_PATH,
+    reflection_output_path: Path = REFLECTION_OUTPUT_PATH,
+    extra_info: dict | None = None,
+    fetch_workers: int = 4,
+    explain_workers: int = 4,
+    reflect_workers: int = 4,
+    queue_size: int = 8,
+    resume: bool = True,
+    multi_region: bool = False
+):
+    """
+    Explain and then reflect on every classified issue in one streaming pass.
+
+    Each issue's (pre, post) region pairs are fetched once and handed from the fetch stage to the
+    explanation stage and on to the reflection stage through bounded queues, so GitHub fetching,
+    explanation calls and reflection calls overlap. Both outputs are appended as issues complete.
+
+    Args:
+        fetch_workers (int): Issues fetched from GitHub concurrently.
+        explain_workers (int): Issues being explained concurrently.
+        reflect_workers (int): Issues being reflected on concurrently.
+        queue_size (int): Issues buffered between two stages.
+        resume (bool): Skip issues already explained and reflected on; issues already explained are
+            reflected on from their stored explanation instead of being explained again. An issue
+            whose explanation has a failed region is explained and reflected on again, and its new
+            reflection record supersedes the earlier one.
+        multi_region (bool): Explain all regions of an issue in one call instead of one call per region.
+    """
+    reset_metrics()
+    explained = load_completed(explanation_output_path) if resume else set()
+    # Stored explanations of completed issues, reused so resumed issues are not explained twice
+    stored = {
+        (response.repo, int(response.issue_no)): response
+        for response in (load_explanations(explanation_output_path) if explained else [])
+        if (response.repo, int(response.issue_no)) in explained
+    }
+    reflected = load_completed(reflection_output_path) if resume else set()
+    if reflected:
+        logger.info(f"Resuming: skipping {len(reflected & explained)} issues already in {explanation_output_path} and {reflection_output_path}.")
+
+    # A reflected issue whose explanation had a failed region is not in `explained` and is retried
+    rows = (
+        row for row in iter_issue_rows(data_path)
+        if (row.repo, row.issue_no) not in reflected or (row.repo, row.issue_no) not in explained
+    )
+    topic_map = load_topic_map()
+    selector = BackendSelector(count_issue_repos(data_path))
+
+    def skip(repo: str, issue_no: int, reason: str):
+        # Both outputs resume past the issue, whichever flow is rerun
+        record_skipped(explanation_output_path, repo, issue_no, reason)
+        record_skipped(reflection_output_path, repo, issue_no, reason)
+
+    def fetch(row: PromptRow) -> PreparedIssue | None:
+        response = stored.get((row.repo, row.issue_no))
+        pairs = stored_region_pairs(response) if response is not None else None
+        if pairs is not None:
+            # Stored post-change regions make GitHub calls unnecessary
+            return PreparedIssue(repo=row.repo, issue_no=row.issue_no, topic=response.topic, summary=row.summary, code_regions=pairs, extra={})
+        with span("prepare"):
+            return prepare_issue(row, topic_map, selector.for_repo(row.repo), extra_info, skip)
+
+    def explain(issue: PreparedIssue) -> tuple[PreparedIssue, PromptResponse]:
+        response = stored.get((issue.repo, issue.issue_no))
+        if response is not None:
+            return issue, response
+        with span("explain"):
+            return issue, explain_issue(issue, multi_region)
+
+    def write_explanation(result: tuple[PreparedIssue, PromptResponse]):
+        issue, response = result
+        if (issue.repo, issue.issue_no) not in explained:
+            save_response(response, explanation_output_path)
+
+    def reflect(result: tuple[PreparedIssue, PromptResponse]) -> ReflectionResponse | None:
+        issue, response = result
+        if (issue.repo, issue.issue_no) in stored:
+            # Stored regions are dicts and are matched to the fetched pairs by their code
+            explained_regions = response.code_regions
+            code_regions = match_region_pairs(response, issue.code_regions)
+        else:
+            explained_regions = [
+                {"filename": region.filename, "explanation": region.explanation}
+                for region in response.code_regions
+            ]
+            code_regions = issue.code_regions
+        with span("reflect"):
+            return reflect_issue(issue.repo, issue.issue_no, issue.topic, code_regions, explained_regions)
+
+    def write_reflection(response: ReflectionResponse):
+        save_reflection(response, reflection_output_path)
+
+    stages = [
+        Stage("fetch", fetch, workers=fetch_workers),
+        Stage("explain", explain, workers=explain_workers, on_output=write_explanation),
+        Stage("reflect", reflect, workers=reflect_workers, on_output=write_reflection),
+    ]
+    completed = sum(1 for _ in run_pipeline(rows, stages, queue_size=queue_size))
+    logger.info(f"Explained and reflected on {completed} issues.")
+
+    close_sink(explanation_output_path)
+    close_sink(reflection_output_path)
+    close_skipped(explanation_output_path)
+    close_skipped(reflection_output_path)
+    log_cache_stats()
+    log_response_cache_stats()
+    log_run_report()
+
+
+if __name__ == "__main__":
+    explain_reflect_flow()
@@ -1,13 +1,20 @@
 from prefect import flow, task
+from contextlib import nullcontext
 from pathlib import Path
 import json
-from dataclasses import asdict
 
 from utils.logger import logger
+from utils.checkpoint import load_completed
+from utils.columnar_store import ColumnarWriter
+from utils.jsonl_sink import get_sink, close_sink
+from utils.metrics import span, reset_metrics, log_run_report
 from github_api.fetch_commits import get_commits_from_pr
-from github_api.fetch_diffs import get_code_regions
+from github_api.backends import BackendSelector
+from github_api.content_cache import log_cache_stats
+from llm.response_cache import log_response_cache_stats
 from prompt.assemble import build_reflection_prompt
-from llm.reflection_llm import generate_llm_reflection
+from llm.reflection_llm import generate_llm_reflections
+from llm.retry import LLM_CALL_FAILED
 from models.datatypes import ReflectionResponse, PromptResponse, CodeRegion, CommitInfo, CodeRegionReflection
 
 DATA_SAMPLE = "01010_edited"
@@ -16,72 +23,166 @@ REFLECTION_OUTPUT_PATH = Path(f"outputs/{DATA_SAMPLE}/reflections.jsonl")
 EXPLANATION_INPUT_PATH = Path(f"outputs/{DATA_SAMPLE}/explanations.jsonl")
 
 @task
-def load_explanations() -> list[PromptResponse]:
-    responses = []
-    with open(EXPLANATION_INPUT_PATH) as f:
+def load_explanations(input_path: Path = EXPLANATION_INPUT_PATH) -> list[PromptResponse]:
+    # A retried issue is appended after its failed record, so the last record of each issue wins
+    responses = {}
+    with open(input_path) as f:
         for line in f:
             if line[0] == "/":
                 continue
             data = json.loads(line)
-            responses.append(PromptResponse(**data))
-    return responses
-
-@task
-def save_reflection(response: ReflectionResponse):
-    REFLECTION_OUTPUT_PATH.parent.mkdir(parents=True, exist_ok=True)
-    with open(REFLECTION_OUTPUT_PATH, "a") as f:
-        f.write(json.dumps(asdict(response)) + "\n")
+            responses[(data["repo"], int(data["issue_no"]))] = PromptResponse(**data)
+    return list(responses.values())
+
+def save_reflection(response: ReflectionResponse, output_path: Path = REFLECTION_OUTPUT_PATH):
+    get_sink(output_path).write(response)
+
+
+def stored_region_pairs(response: PromptResponse) -> list[tuple[CodeRegion, CodeRegion]] | None:
+    """
+    Rebuild (pre, post) region pairs from an explanation line, or None if it predates stored post regions.
+    """
+    pairs = []
+    for region_data in response.code_regions:
+        if region_data.get("code_after") is None:
+            return None
+        pairs.append((
+            CodeRegion(filename=region_data["filename"], code=region_data["code"]),
+            CodeRegion(filename=region_data["filename"], code=region_data["code_after"])
+        ))
+    return pairs
+
+
+def match_region_pairs(response: PromptResponse, fetched: list[tuple[CodeRegion, CodeRegion]]) -> list[tuple[CodeRegion, CodeRegion] | None]:
+    """
+    Match each explained region to a freshly fetched (pre, post) pair by its pre-change code.
+
+    Regions without a match are returned as None instead of failing the whole issue.
+    """
+    by_code = {pre_region.code.strip(): (pre_region, post_region) for pre_region, post_region in fetched}
+    return [by_code.get(region_data["code"].strip()) for region_data in response.code_regions]
+
+
+def reflect_issue(
+    repo: str,
+    issue_no: int,
+    topic: str,
+    code_regions: list[tuple[CodeRegion, CodeRegion] | None],
+    explained_regions: list[dict]
+) -> ReflectionResponse | None:
+    """
+    Reflect on every explained region of an issue given its (pre, post) region pairs.
+
+    Args:
+        code_regions (list): (pre, post) pair per explained region; None marks a region without a match.
+        explained_regions (list[dict]): The `code_regions` of the issue's explanation response.
+
+    Returns:
+        ReflectionResponse | None: One reflection per matched region, or None if no region could be
+            reflected on, so the issue is not saved and a later run tries it again.
+    """
+    matched = []
+    for region_pair, region_data in zip(code_regions, explained_regions):
+        if region_pair is None:
+            logger.warning(f"No matching code region for {region_data['filename']} in {repo}#{issue_no}, skipping it.")
+            continue
+        if region_data.get("explanation") is None:
+            logger.warning(f"Explanation of {region_data['filename']} in {repo}#{issue_no} failed, skipping it.")
+            continue
+        matched.append((region_pair, region_data))
+
+    if not matched:
+        logger.warning(f"No region of {repo}#{issue_no} can be reflected on, skipping the issue.")
+        return None
+
+    reflection_prompts = [
+        build_reflection_prompt(
+            original_explanation=region_data["explanation"],
+            code_region=pre_region.code,
+            post_commit_code=post_region.code
+        )
+        for (pre_region, post_region), region_data in matched
+    ]
+
+    # All regions of the issue are reflected on concurrently
+    reflections = generate_llm_reflections(reflection_prompts)
+
+    code_reflections: list[CodeRegionReflection] = [
+        CodeRegionReflection(
+            filename=region_data["filename"],
+            code_before=pre_region.code,
+            code_after=post_region.code,
+            original_explanation=region_data["explanation"],
+            reflection_response=reflection,
+            error=LLM_CALL_FAILED if reflection is None else None
+        )
+        for ((pre_region, post_region), region_data), reflection in zip(matched, reflections)
+    ]
+
+    return ReflectionResponse(
+        repo=repo,
+        issue_no=issue_no,
+        topic=topic,
+        code_regions=code_reflections
+    )
 
 
 @flow
-def reflection_flow():
-    explanation_responses = load_explanations()
-
-    for response in explanation_responses:
-        try:
-            repo = response.repo
-            issue_no = response.issue_no
-            commits: list[CommitInfo] = get_commits_from_pr(repo, issue_no)
-            code_regions: list[tuple[CodeRegion,CodeRegion]] = get_code_regions(repo, commits)
-            topic = response.topic
-            logger.info(f"Reflecting on {repo}#{issue_no}...")
-            code_reflections: list[CodeRegionReflection] = []
-
-            for (pre_region, post_region), region_data in zip(code_regions, response.code_regions):
-                # Verify alignment
-                assert pre_region.code.strip() == region_data["code"].strip(), \
-                    f"Mismatch in code region alignment for {repo}#{issue_no}."
-
-                original_explanation: str = region_data["explanation"]
-                filename: str = region_data["filename"]
-
-                reflection_prompt = build_reflection_prompt(
-                    original_explanation=original_explanation,
-                    code_region=pre_region.code,
-                    post_commit_code=post_region.code
-                )
-
-                response = generate_llm_reflection(reflection_prompt)
-
-                code_reflection = CodeRegionReflection(
-                    filename=filename,
-                    code_before=pre_region.code,
-                    code_after=post_region.code,
-                    original_explanation=original_explanation,
-                    reflection_response=response
-                )
-
-                code_reflections.append(code_reflection)
-
-            save_reflection(ReflectionResponse(
-                repo=repo,
-                issue_no=issue_no,
-                topic=topic,
-                code_regions=code_reflections
-            ))
-
-        except Exception as e:
-            logger.error(f"Error processing reflection for {response.repo}#{response.issue_no}: {e}")
+def reflection_flow(
+    input_path: Path = EXPLANATION_INPUT_PATH,
+    output_path: Path = REFLECTION_OUTPUT_PATH,
+    resume: bool = True,
+    offline: bool = False,
+    columnar_dir: Path | None = None
+):
+    """
+    Reflect on each stored explanation using the post-change version of its code region.
+
+    Explanations that carry their post-change regions are reflected on without any GitHub calls;
+    older lines are refetched and matched by code unless `offline` is set, in which case they are skipped.
+    With `columnar_dir`, reflections are also written as one Parquet row per code region.
+    """
+    reset_metrics()
+    explanation_responses = load_explanations(input_path)
+    if resume:
+        completed = load_completed(output_path)
+        explanation_responses = [r for r in explanation_responses if (r.repo, r.issue_no) not in completed]
+        logger.info(f"Resuming: {len(completed)} issues already reflected on, {len(explanation_responses)} remaining.")
+
+    stored_pairs = {(r.repo, r.issue_no): stored_region_pairs(r) for r in explanation_responses}
+    missing = [r for r in explanation_responses if stored_pairs[(r.repo, r.issue_no)] is None]
+    logger.info(f"{len(explanation_responses) - len(missing)} issues have stored post-change regions, {len(missing)} need refetching.")
+    selector = BackendSelector.from_repos(response.repo for response in missing)
+    # The Parquet part is finalized even if the run fails part-way
+    with ColumnarWriter(columnar_dir) if columnar_dir else nullcontext() as columnar:
+        for response in explanation_responses:
+            try:
+                repo = response.repo
+                issue_no = response.issue_no
+                code_regions = stored_pairs[(repo, issue_no)]
+                if code_regions is None:
+                    if offline:
+                        logger.info(f"Skipping {repo}#{issue_no}: no stored post-change regions.")
+                        continue
+                    with span("prepare"):
+                        commits: list[CommitInfo] = get_commits_from_pr(repo, issue_no)
+                        code_regions = match_region_pairs(response, selector.for_repo(repo).get_code_regions(repo, commits))
+                logger.info(f"Reflecting on {repo}#{issue_no}...")
+                with span("reflect"):
+                    reflection = reflect_issue(repo, issue_no, response.topic, code_regions, response.code_regions)
+                if reflection is None:
+                    continue
+                save_reflection(reflection, output_path)
+                if columnar:
+                    columnar.write(reflection)
+
+            except Exception as e:
+                logger.error(f"Error processing reflection for {response.repo}#{response.issue_no}: {e}")
+
+    close_sink(output_path)
+    log_cache_stats()
+    log_response_cache_stats()
+    log_run_report()
 
 if __name__ == "__main__":
     reflection_flow()
\ No newline at end of file
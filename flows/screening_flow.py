@@ -0,0 +1,66 @@
+from prefect import flow
+from collections import Counter
+from pathlib import Path
+
+from github import RateLimitExceededException
+
+from utils.logger import logger
+from utils.concurrency import bounded_map
+from utils.data_loader import iter_issue_rows
+from utils.metrics import reset_metrics, log_run_report
+from github_api.fetch_diffs import MAX_CODE_REGIONS, screen_pr
+from flows.explanation_flow import DATA_PATH
+from models.datatypes import PromptRow
+
+
+def screen_row(row: PromptRow) -> tuple[str, int]:
+    """
+    Classify an issue as ok, over_limit, no_regions, no_pr or rate_limited from its PR file listing.
+
+    Returns:
+        tuple[str, int]: The outcome and the number of prospective code regions.
+    """
+    try:
+        region_count = screen_pr(row.repo, row.issue_no)
+    except RateLimitExceededException:
+        return "rate_limited", 0
+    except Exception as e:
+        logger.debug(f"No PR found for {row.repo}#{row.issue_no}: {e}")
+        return "no_pr", 0
+
+    if region_count == 0:
+        return "no_regions", 0
+    if region_count > MAX_CODE_REGIONS:
+        return "over_limit", region_count
+    return "ok", region_count
+
+
+@flow
+def screening_flow(data_path: Path = DATA_PATH, max_workers: int = 8) -> dict:
+    """
+    Quick first pass over a dataset: screen every issue's PR from its file listing and hunk
+    headers only, and report how many issues the explanation flow will process.
+
+    Returns:
+        dict: Issue counts per outcome, plus the prospective regions (LLM calls) of the ok issues.
+    """
+    reset_metrics()
+    outcomes = Counter()
+    regions = 0
+    for outcome, region_count in bounded_map(screen_row, iter_issue_rows(data_path), max_workers=max_workers):
+        outcomes[outcome] += 1
+        if outcome == "ok":
+            regions += region_count
+
+    total = sum(outcomes.values())
+    logger.info(
+        f"Screened {total} issues: {outcomes['ok']} will be processed ({regions} code regions), "
+        f"{outcomes['over_limit']} over the {MAX_CODE_REGIONS}-region limit, {outcomes['no_regions']} without valid regions, "
+        f"{outcomes['no_pr']} without a PR, {outcomes['rate_limited']} rate limited."
+    )
+    log_run_report()
+    return {**outcomes, "total": total, "regions": regions}
+
+
+if __name__ == "__main__":
+    screening_flow()
@@ -0,0 +1,209 @@
+import os
+import shutil
+import subprocess
+import threading
+from abc import ABC, abstractmethod
+from collections import Counter
+from pathlib import Path
+from typing import Iterable
+
+from github_api.client import get_github
+from github_api.fetch_diffs import get_code_regions, get_code_regions_from_pr, build_commit_region_pairs, build_pr_region_pairs, screen_pr_files
+from models.datatypes import ChangedFile, CodeRegion, CommitInfo
+from utils.logger import logger
+
+CLONE_DIR = Path(os.getenv("GIT_CLONE_DIR", ".cache/repos"))
+CLONE_THRESHOLD = int(os.getenv("GIT_CLONE_THRESHOLD", "5"))  # Issues per repo before a local clone pays off
+
+
+class RegionBackend(ABC):
+    """
+    Source of matched (pre, post) code regions for PRs and commits.
+    """
+
+    @abstractmethod
+    def get_code_regions_from_pr(self, repo_full_name: str, issue_no: int, context_lines: int = 3) -> list[tuple[CodeRegion, CodeRegion]]:
+        ...
+
+    @abstractmethod
+    def get_code_regions(self, repo_full_name: str, commits: list[CommitInfo], context_lines: int = 3) -> list[tuple[CodeRegion, CodeRegion]]:
+        ...
+
+
+class GitHubAPIBackend(RegionBackend):
+    """
+    Extracts regions through the GitHub REST/GraphQL API.
+    """
+
+    def get_code_regions_from_pr(self, repo_full_name: str, issue_no: int, context_lines: int = 3) -> list[tuple[CodeRegion, CodeRegion]]:
+        return get_code_regions_from_pr(repo_full_name, issue_no, context_lines)
+
+    def get_code_regions(self, repo_full_name: str, commits: list[CommitInfo], context_lines: int = 3) -> list[tuple[CodeRegion, CodeRegion]]:
+        return get_code_regions(repo_full_name, commits, context_lines)
+
+
+def parse_git_diff(diff: str) -> list[ChangedFile]:
+    """
+    Split `git diff` output into per-file patches shaped like GitHub's PR file listing.
+    """
+    files: list[ChangedFile] = []
+    current: ChangedFile | None = None
+    hunk_lines: list[str] = []
+
+    def finish():
+        if current is not None:
+            current.patch = "\n".join(hunk_lines) or None
+            files.append(current)
+
+    for line in diff.splitlines():
+        if line.startswith("diff --git "):
+            finish()
+            # diff --git a/<old> b/<new>; the "+++" line below refines the name when present
+            current = ChangedFile(filename=line.split(" b/", 1)[-1], status="modified")
+            hunk_lines = []
+        elif current is None:
+            continue
+        elif hunk_lines:
+            hunk_lines.append(line)
+        elif line.startswith("@@"):
+            hunk_lines.append(line)
+        elif line.startswith("new file mode"):
+            current.status = "added"
+        elif line.startswith("deleted file mode"):
+            current.status = "removed"
+        elif line.startswith("rename to "):
+            current.status = "renamed"
+            current.filename = line[len("rename to "):]
+        elif line.startswith("+++ b/"):
+            current.filename = line[len("+++ b/"):]
+    finish()
+
+    return files
+
+
+class LocalGitBackend(RegionBackend):
+    """
+    Extracts regions from a local partial clone (`--filter=blob:none`) of each repo.
+
+    PR base/head shas still come from one API call per PR; file listings, patches and
+    contents are served by git without touching the REST rate limit.
+    """
+
+    def __init__(self, clone_dir: Path = CLONE_DIR, fallback: RegionBackend | None = None):
+        self.clone_dir = Path(clone_dir)
+        self.fallback = fallback
+        self._locks: dict[str, threading.Lock] = {}
+        self._locks_guard = threading.Lock()
+
+    def _lock(self, repo_full_name: str) -> threading.Lock:
+        with self._locks_guard:
+            return self._locks.setdefault(repo_full_name, threading.Lock())
+
+    def _git(self, repo_dir: Path, *args: str) -> str:
+        result = subprocess.run(
+            ["git", "--git-dir", str(repo_dir), *args],
+            check=True, capture_output=True, text=True
+        )
+        return result.stdout
+
+    def _ensure_commits(self, repo_full_name: str, refspecs: list[str]) -> Path:
+        """
+        Clone the repo on first use and fetch the given refspecs, serialized per repo.
+        """
+        repo_dir = self.clone_dir / f"{repo_full_name.replace('/', '__')}.git"
+        with self._lock(repo_full_name):
+            if not repo_dir.exists():
+                repo_dir.parent.mkdir(parents=True, exist_ok=True)
+                logger.info(f"Cloning {repo_full_name} into {repo_dir}")
+                subprocess.run(
+                    ["git", "clone", "--bare", "--filter=blob:none", "--quiet",
+                     f"https://github.com/{repo_full_name}.git", str(repo_dir)],
+                    check=True, capture_output=True, text=True
+                )
+            self._git(repo_dir, "fetch", "--quiet", "--filter=blob:none", "origin", *refspecs)
+        return repo_dir
+
+    def _show(self, repo_dir: Path, path: str, ref: str) -> str:
+        return self._git(repo_dir, "show", f"{ref}:{path}")
+
+    def _diff(self, repo_dir: Path, *revisions: str) -> list[ChangedFile]:
+        return parse_git_diff(self._git(
+            repo_dir, "diff", "--no-color", "--no-ext-diff", "-M",
+            "--src-prefix=a/", "--dst-prefix=b/", *revisions
+        ))
+
+    def get_code_regions_from_pr(self, repo_full_name: str, issue_no: int, context_lines: int = 3) -> list[tuple[CodeRegion, CodeRegion]]:
+        try:
+            return self._get_code_regions_from_pr(repo_full_name, issue_no, context_lines)
+        except subprocess.CalledProcessError as e:
+            if self.fallback is None:
+                raise
+            logger.warning(f"Local git failed for {repo_full_name}#{issue_no}, using API: {e.stderr.strip()}")
+            return self.fallback.get_code_regions_from_pr(repo_full_name, issue_no, context_lines)
+
+    def get_code_regions(self, repo_full_name: str, commits: list[CommitInfo], context_lines: int = 3) -> list[tuple[CodeRegion, CodeRegion]]:
+        try:
+            return self._get_code_regions(repo_full_name, commits, context_lines)
+        except subprocess.CalledProcessError as e:
+            if self.fallback is None:
+                raise
+            logger.warning(f"Local git failed for {repo_full_name}, using API: {e.stderr.strip()}")
+            return self.fallback.get_code_regions(repo_full_name, commits, context_lines)
+
+    def _get_code_regions_from_pr(self, repo_full_name: str, issue_no: int, context_lines: int = 3) -> list[tuple[CodeRegion, CodeRegion]]:
+        pr = get_github().get_repo(repo_full_name).get_pull(issue_no)
+        base_sha, head_sha = pr.base.sha, pr.head.sha
+
+        repo_dir = self._ensure_commits(repo_full_name, [base_sha, f"pull/{issue_no}/head"])
+        # Three-dot diff matches GitHub's PR file listing (changes since the merge base)
+        files = self._diff(repo_dir, f"{base_sha}...{head_sha}")
+        screen_pr_files(files, context_lines)
+
+        return build_pr_region_pairs(
+            files,
+            lambda path, ref: self._show(repo_dir, path, ref),
+            base_sha,
+            head_sha,
+            context_lines
+        )
+
+    def _get_code_regions(self, repo_full_name: str, commits: list[CommitInfo], context_lines: int = 3) -> list[tuple[CodeRegion, CodeRegion]]:
+        repo_dir = self._ensure_commits(repo_full_name, [c.sha for c in commits])
+        region_pairs: list[tuple[CodeRegion, CodeRegion]] = []
+
+        for commit in commits:
+            parents = self._git(repo_dir, "rev-list", "--parents", "-n", "1", commit.sha).split()[1:]
+            if not parents:
+                continue  # No pre-change version
+            files = self._diff(repo_dir, parents[0], commit.sha)
+            region_pairs.extend(build_commit_region_pairs(
+                files,
+                lambda path, ref: self._show(repo_dir, path, ref),
+                parents[0],
+                commit.sha,
+                context_lines
+            ))
+
+        return region_pairs
+
+
+class BackendSelector:
+    """
+    Chooses a backend per repo: repos appearing at least `clone_threshold` times in the
+    batch use a local clone, the rest use the GitHub API.
+    """
+
+    def __init__(self, repo_counts: Counter, clone_threshold: int = CLONE_THRESHOLD, clone_dir: Path = CLONE_DIR):
+        self.repo_counts = repo_counts
+        self.clone_threshold = clone_threshold
+        self.api_backend = GitHubAPIBackend()
+        self.local_backend = LocalGitBackend(clone_dir, fallback=self.api_backend) if shutil.which("git") else None
+
+    @classmethod
+    def from_repos(cls, repos: Iterable[str], **kwargs) -> "BackendSelector":
+        return cls(Counter(repos), **kwargs)
+
+    def for_repo(self, repo_full_name: str) -> RegionBackend:
+        if self.local_backend and self.repo_counts[repo_full_name] >= self.clone_threshold:
+            return self.local_backend
+        return self.api_backend
@@ -0,0 +1,175 @@
+import os
+import time
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+from github import Auth, Github, GithubRetry
+from dotenv import load_dotenv
+
+from utils.logger import logger
+from utils.metrics import get_metrics, span
+
+load_dotenv()
+# Comma-separated list of tokens rotated round-robin; falls back to the single GITHUB_TOKEN
+GITHUB_TOKENS = [t.strip() for t in (os.getenv("GITHUB_TOKENS") or os.getenv("GITHUB_TOKEN") or "").split(",") if t.strip()]
+POOL_SIZE = int(os.getenv("GITHUB_POOL_SIZE", "16"))  # Keep-alive connections per token
+RATE_LIMIT_RESERVE = int(os.getenv("GITHUB_RATE_LIMIT_RESERVE", "20"))  # Requests kept in reserve per token
+PACING_THRESHOLD = 0.2  # Start spreading requests once less than this fraction of the quota is left
+MAX_RETRIES = 8
+MAX_BACKOFF = 60  # Seconds; cap on exponential backoff when GitHub gives no wait time
+# Body fragments of 403s caused by secondary rate limits rather than missing permissions
+SECONDARY_LIMIT_MARKERS = ("secondary rate limit", "abuse detection")
+
+GRAPHQL_URL = "https://api.github.com/graphql"
+
+
+def retry_wait(response: requests.Response, attempt: int) -> float | None:
+    """
+    Seconds to wait before retrying a failed GraphQL response, or None if it should not be retried.
+
+    429s, 5xx and rate-limit 403s (quota exhausted or a secondary limit) are retried; other 403s,
+    e.g. missing permissions, are not. Waits honour `Retry-After`, then `X-RateLimit-Reset`, and
+    otherwise back off exponentially.
+    """
+    status = response.status_code
+    exhausted = response.headers.get("X-RateLimit-Remaining") == "0"
+    if status == 403:
+        body = response.text.lower()
+        if not exhausted and not any(marker in body for marker in SECONDARY_LIMIT_MARKERS):
+            return None
+    elif status != 429 and status < 500:
+        return None
+
+    retry_after = response.headers.get("Retry-After")
+    if retry_after is not None:
+        try:
+            return float(retry_after)
+        except ValueError:
+            pass  # HTTP-date values fall through to the reset time or backoff
+    reset = response.headers.get("X-RateLimit-Reset")
+    if exhausted and reset is not None:
+        return max(float(reset) - time.time(), 0) + 1
+    return float(min(2 ** attempt, MAX_BACKOFF))
+
+
+class _TokenState:
+    def __init__(self, token: str | None):
+        auth = Auth.Token(token) if token else None
+        self.token = token
+        self.github = Github(
+            auth=auth,
+            pool_size=POOL_SIZE,
+            per_page=100,
+            # Retries secondary rate limit 403s and 5xx with backoff instead of failing the call
+            retry=GithubRetry(total=MAX_RETRIES, secondary_rate_wait=60),
+        )
+        self.next_request_at = 0.0
+
+    def wait_time(self, now: float) -> float:
+        """
+        Seconds to wait before this token should be used, based on its remaining quota.
+        """
+        remaining, limit = self.github.rate_limiting
+        reset = self.github.rate_limiting_resettime
+        window = max(reset - now, 0)
+        budget = remaining - RATE_LIMIT_RESERVE
+
+        if budget <= 0:
+            return window
+        if remaining < limit * PACING_THRESHOLD:
+            # Spread the rest of the budget evenly until the reset time
+            return max(self.next_request_at - now, 0)
+        return 0.0
+
+    def mark_used(self, now: float, wait: float):
+        remaining, _ = self.github.rate_limiting
+        window = max(self.github.rate_limiting_resettime - now, 0)
+        interval = window / max(remaining - RATE_LIMIT_RESERVE, 1)
+        self.next_request_at = now + wait + interval
+
+
+class GitHubClientPool:
+    """
+    Shared GitHub clients with keep-alive pooling, round-robin token rotation and
+    rate-limit aware scheduling.
+    """
+
+    def __init__(self, tokens: list[str] = GITHUB_TOKENS):
+        self._states = [_TokenState(token) for token in tokens] or [_TokenState(None)]
+        self._cursor = 0
+        self._lock = threading.Lock()
+        self._session = requests.Session()
+        self._session.mount("https://", HTTPAdapter(pool_connections=len(self._states), pool_maxsize=POOL_SIZE))
+
+    def _acquire_state(self) -> _TokenState:
+        """
+        Pick the next token that can be used soonest, sleeping if the whole pool must wait.
+        """
+        with self._lock:
+            now = time.time()
+            count = len(self._states)
+            candidates = [self._states[(self._cursor + i) % count] for i in range(count)]
+            state = min(candidates, key=lambda s: s.wait_time(now))
+            wait = state.wait_time(now)
+            state.mark_used(now, wait)
+            self._cursor = (self._states.index(state) + 1) % count
+            remaining, limit = state.github.rate_limiting
+            get_metrics().record_rate_limit(remaining, limit, state.github.rate_limiting_resettime)
+
+        if wait > 0:
+            logger.info(f"GitHub rate limit low, waiting {wait:.1f}s before the next request.")
+            with span("github.rate_limit_wait"):
+                time.sleep(wait)
+        return state
+
+    def acquire(self) -> Github:
+        """
+        Return a client for the next logical operation (e.g. one PR's worth of calls).
+        """
+        return self._acquire_state().github
+
+    def graphql(self, query: str, variables: dict) -> dict:
+        """
+        Run a GraphQL query over the pooled session, retrying rate-limited and server errors (see `retry_wait`).
+        """
+        for attempt in range(MAX_RETRIES):
+            state = self._acquire_state()
+            headers = {"Authorization": f"bearer {state.token}"} if state.token else {}
+            with span("github.graphql"):
+                response = self._session.post(GRAPHQL_URL, json={"query": query, "variables": variables}, headers=headers, timeout=60)
+
+            wait = retry_wait(response, attempt) if response.status_code >= 400 else None
+            if wait is not None:
+                logger.warning(f"GraphQL request failed with {response.status_code}, retrying in {wait:.0f}s.")
+                with span("github.rate_limit_wait"):
+                    time.sleep(wait)
+                continue
+
+            response.raise_for_status()
+            return response.json()
+
+        response.raise_for_status()
+        return response.json()
+
+
+_pool: GitHubClientPool | None = None
+_pool_lock = threading.Lock()
+
+
+def get_client_pool() -> GitHubClientPool:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = GitHubClientPool()
+    return _pool
+
+
+def get_github() -> Github:
+    """
+    Return a shared, rate-limit scheduled GitHub client.
+    """
+    return get_client_pool().acquire()
+
+
+def graphql(query: str, variables: dict) -> dict:
+    return get_client_pool().graphql(query, variables)
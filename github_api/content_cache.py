@@ -0,0 +1,154 @@
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+from utils.logger import logger
+
+try:
+    import zstandard
+except ImportError:  # zstd compression is optional
+    zstandard = None
+
+CACHE_DIR = Path(os.getenv("GITHUB_CACHE_DIR", ".cache"))
+CACHE_MAX_BYTES = int(os.getenv("GITHUB_CACHE_MAX_BYTES", str(2 * 1024 ** 3)))
+
+CODEC_RAW = 0
+CODEC_ZSTD = 1
+
+
+class ContentCache:
+    """
+    Persistent SQLite cache of file contents keyed by (repo, path, ref).
+
+    Contents at a commit or blob sha never change, so entries never go stale.
+    The cache is bounded by `max_bytes` of stored data and evicts the least
+    recently used entries first.
+    """
+
+    def __init__(self, db_path: Path, max_bytes: int = CACHE_MAX_BYTES, compress: bool = True):
+        self.db_path = Path(db_path)
+        self.max_bytes = max_bytes
+        self.compress = compress and zstandard is not None
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS contents (
+                repo TEXT NOT NULL,
+                path TEXT NOT NULL,
+                ref TEXT NOT NULL,
+                codec INTEGER NOT NULL,
+                data BLOB NOT NULL,
+                size INTEGER NOT NULL,
+                last_access REAL NOT NULL,
+                PRIMARY KEY (repo, path, ref)
+            )
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_contents_last_access ON contents (last_access)")
+        self._conn.commit()
+        self._total_bytes = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM contents").fetchone()[0]
+
+    def _encode(self, content: str) -> tuple[int, bytes]:
+        data = content.encode()
+        if self.compress:
+            return CODEC_ZSTD, zstandard.ZstdCompressor().compress(data)
+        return CODEC_RAW, data
+
+    def _decode(self, codec: int, data: bytes) -> str:
+        if codec == CODEC_ZSTD:
+            return zstandard.ZstdDecompressor().decompress(data).decode()
+        return data.decode()
+
+    def get(self, repo: str, path: str, ref: str) -> str | None:
+        """
+        Return cached content for (repo, path, ref), or None on a miss.
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT codec, data FROM contents WHERE repo = ? AND path = ? AND ref = ?",
+                (repo, path, ref)
+            ).fetchone()
+            if row is None or (row[0] == CODEC_ZSTD and zstandard is None):
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._conn.execute(
+                "UPDATE contents SET last_access = ? WHERE repo = ? AND path = ? AND ref = ?",
+                (time.time(), repo, path, ref)
+            )
+            self._conn.commit()
+        return self._decode(*row)
+
+    def put(self, repo: str, path: str, ref: str, content: str):
+        """
+        Store content for (repo, path, ref), evicting old entries if over the size bound.
+        """
+        codec, data = self._encode(content)
+        with self._lock:
+            previous = self._conn.execute(
+                "SELECT size FROM contents WHERE repo = ? AND path = ? AND ref = ?",
+                (repo, path, ref)
+            ).fetchone()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO contents VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (repo, path, ref, codec, data, len(data), time.time())
+            )
+            self._total_bytes += len(data) - (previous[0] if previous else 0)
+            self._evict()
+            self._conn.commit()
+
+    def _evict(self):
+        while self._total_bytes > self.max_bytes:
+            rows = self._conn.execute(
+                "SELECT repo, path, ref, size FROM contents ORDER BY last_access LIMIT 100"
+            ).fetchall()
+            if not rows:
+                break
+            for repo, path, ref, size in rows:
+                self._conn.execute(
+                    "DELETE FROM contents WHERE repo = ? AND path = ? AND ref = ?",
+                    (repo, path, ref)
+                )
+                self._total_bytes -= size
+                if self._total_bytes <= self.max_bytes:
+                    break
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / total if total else 0.0,
+            "stored_bytes": self._total_bytes,
+        }
+
+
+_cache: ContentCache | None = None
+_cache_lock = threading.Lock()
+
+
+def get_content_cache() -> ContentCache:
+    """
+    Return the process-wide content cache shared by all `github_api` fetchers.
+    """
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = ContentCache(CACHE_DIR / "github_contents.sqlite")
+    return _cache
+
+
+def log_cache_stats():
+    stats = get_content_cache().stats()
+    logger.info(
+        f"GitHub content cache: {stats['hits']} hits, {stats['misses']} misses "
+        f"({stats['hit_ratio']:.0%} hit ratio), {stats['stored_bytes']} bytes stored."
+    )
@@ -1,15 +1,9 @@
-from github import Github
-import os
-from dotenv import load_dotenv
+from github_api.client import get_github
 from models.datatypes import CommitInfo
 
-load_dotenv()
-GITHUB_TOKEN = os.getenv("GITHUB_TOKEN")
-g = Github(GITHUB_TOKEN)
-
 
 def get_commits_from_pr(repo_full_name: str, pr_number: int) -> list[CommitInfo]:
-    repo = g.get_repo(repo_full_name)
+    repo = get_github().get_repo(repo_full_name)
     pr = repo.get_pull(pr_number)
     commits = pr.get_commits()
 
@@ -24,7 +18,7 @@ def get_commits_referencing_issue(repo_full_name: str, issue_number: int):
     """
     Return a list of commits that reference a given issue number in their message.
     """
-    repo = g.get_repo(repo_full_name)
+    repo = get_github().get_repo(repo_full_name)
     issue = repo.get_issue(number=issue_number)
     issue_identifier = f"#{issue_number}"
 
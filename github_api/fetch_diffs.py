@@ -1,23 +1,127 @@
-import re
-from github import Github, Repository, Commit
-import os
-from dotenv import load_dotenv
+import json
+from github import Repository, Commit
+from typing import Callable
+from github_api.client import get_github, graphql
 from github_api.fetch_commits import get_commit_objects
+from github_api.content_cache import get_content_cache
 from models.datatypes import CommitInfo, CodeRegion
 from utils.file_filters import is_test_file, is_valid_file
+from utils.patch_parser import extract_pre_regions, extract_region_pairs_with_context, count_regions
 from utils.logger import logger
+from utils.metrics import span
+from utils.single_flight import SingleFlight
 
-load_dotenv()
-GITHUB_TOKEN = os.getenv("GITHUB_TOKEN")
-g = Github(GITHUB_TOKEN)
+GRAPHQL_BATCH_SIZE = 50  # Blob lookups per GraphQL query
+
+# Shares (repo, path, ref) fetches that are in flight at the same time across worker threads
+_content_flights = SingleFlight("github.contents")
+
+def _fetch_file_content(repo: Repository.Repository, path: str, ref: str) -> str:
+    """
+    Return the decoded content of `path` at `ref`, served from the persistent cache when possible.
+    """
+    cache = get_content_cache()
+    content = cache.get(repo.full_name, path, ref)
+    if content is None:
+        def fetch() -> str:
+            with span("github.get_contents"):
+                fetched = repo.get_contents(path, ref=ref).decoded_content.decode()
+            cache.put(repo.full_name, path, ref, fetched)
+            return fetched
+
+        content = _content_flights.do((repo.full_name, path, ref), fetch)
+    return content
+
+def _graphql_fetch_blobs(repo_full_name: str, keys: list[tuple[str, str]]) -> dict[tuple[str, str], str]:
+    """
+    Fetch the text of several (path, ref) blobs in one GraphQL query using aliased
+    `object(expression: "ref:path")` lookups. Missing, binary and truncated blobs are omitted.
+    """
+    owner, name = repo_full_name.split("/", 1)
+    aliases = "\n".join(
+        f"f{i}: object(expression: {json.dumps(f'{ref}:{path}')}) {{ ... on Blob {{ text isBinary isTruncated }} }}"
+        for i, (path, ref) in enumerate(keys)
+    )
+    query = f"query($owner: String!, $name: String!) {{ repository(owner: $owner, name: $name) {{ {aliases} }} }}"
+
+    payload = graphql(query, {"owner": owner, "name": name})
+    repository = (payload.get("data") or {}).get("repository")
+    if repository is None:
+        raise RuntimeError(f"GraphQL blob query failed for {repo_full_name}: {payload.get('errors')}")
+
+    blobs = {}
+    for i, key in enumerate(keys):
+        blob = repository.get(f"f{i}")
+        if blob and not blob.get("isBinary") and not blob.get("isTruncated") and blob.get("text") is not None:
+            blobs[key] = blob["text"]
+    return blobs
+
+def _fetch_file_contents_bulk(repo: Repository.Repository, keys: list[tuple[str, str]]) -> dict[tuple[str, str], str]:
+    """
+    Return contents for many (path, ref) pairs with as few requests as possible.
+
+    Cached entries are served locally, the rest are fetched in batched GraphQL queries.
+    Blobs GraphQL cannot return as text (e.g. truncated large files) fall back to `get_contents`.
+    Pairs that do not exist (e.g. a file added by the PR has no base version) are omitted.
+    Pairs another thread is already fetching are waited on instead of fetched again.
+    """
+    cache = get_content_cache()
+    contents = {}
+    missing = []
+    for path, ref in dict.fromkeys(keys):
+        content = cache.get(repo.full_name, path, ref)
+        if content is None:
+            missing.append((path, ref))
+        else:
+            contents[(path, ref)] = content
+
+    owned, waiting = [], []
+    for path, ref in missing:
+        flight, leader = _content_flights.begin((repo.full_name, path, ref))
+        (owned if leader else waiting).append(((path, ref), flight))
+
+    try:
+        for start in range(0, len(owned), GRAPHQL_BATCH_SIZE):
+            batch = [key for key, _ in owned[start:start + GRAPHQL_BATCH_SIZE]]
+            try:
+                fetched = _graphql_fetch_blobs(repo.full_name, batch)
+            except Exception as e:
+                logger.debug(f"GraphQL blob fetch failed for {repo.full_name}, falling back to REST: {e}")
+                fetched = {}
+
+            for path, ref in batch:
+                if (path, ref) in fetched:
+                    cache.put(repo.full_name, path, ref, fetched[(path, ref)])
+                    contents[(path, ref)] = fetched[(path, ref)]
+                    continue
+                try:
+                    with span("github.get_contents"):
+                        content = repo.get_contents(path, ref=ref).decoded_content.decode()
+                    cache.put(repo.full_name, path, ref, content)
+                    contents[(path, ref)] = content
+                except Exception:
+                    continue
+    finally:
+        for (path, ref), flight in owned:
+            if (path, ref) in contents:
+                _content_flights.finish((repo.full_name, path, ref), flight, result=contents[(path, ref)])
+            else:
+                _content_flights.finish((repo.full_name, path, ref), flight, error=LookupError(f"{path}@{ref} not found in {repo.full_name}"))
+
+    for key, flight in waiting:
+        try:
+            contents[key] = flight.wait()
+        except Exception:
+            continue
+
+    return contents
 
 def _get_file_content(repo: Repository.Repository, commit: Commit.Commit, parent: Commit.Commit | None = None) -> dict[str, str]:
     file_versions = {}
     if not parent: parent = commit
     for file in commit.files:
         try:
-            contents = repo.get_contents(file.filename, ref=parent.sha)
-            file_versions[file.filename] = contents.decoded_content.decode()
+            file_versions[file.filename] = _fetch_file_content(repo, file.filename, parent.sha)
         except Exception:
             continue
     return file_versions
@@ -40,44 +144,11 @@ def _get_file_content_before_commit(repo: Repository.Repository, commit: Commit.
 
 
 def _extract_code_regions_around_patch(pre_change_code: str, patch: str, context_lines: int = 3) -> list[str]:
-    code_lines = pre_change_code.splitlines()
-    code_blocks = []
-
-    for match in re.finditer(r"@@ -(\d+)(?:,(\d+))?", patch):
-        start_line = int(match.group(1)) - 1
-        length = int(match.group(2)) if match.group(2) else 1
-
-        lower = max(0, start_line - context_lines)
-        upper = min(len(code_lines), start_line + length + context_lines)
-
-        snippet = "\n".join(code_lines[lower:upper])
-        code_blocks.append(snippet)
+    return extract_pre_regions(pre_change_code, patch, context_lines)
 
-    return code_blocks
-
-def _extract_matched_code_regions(pre_code: str, post_code: str, patch: str, context_lines: int = 3) -> list[tuple[str, str]]:
-    pre_lines = pre_code.splitlines()
-    post_lines = post_code.splitlines()
-    pairs = []
-
-    # Matches both pre and post start lines from unified diff header
-    for match in re.finditer(r"@@ -(\d+)(?:,(\d+))? \+(\d+)(?:,(\d+))?", patch):
-        start_pre = int(match.group(1)) - 1
-        len_pre = int(match.group(2)) if match.group(2) else 1
-        start_post = int(match.group(3)) - 1
-        len_post = int(match.group(4)) if match.group(4) else 1
-
-        lower_pre = max(0, start_pre - context_lines)
-        upper_pre = min(len(pre_lines), start_pre + len_pre + context_lines)
-        region_pre = "\n".join(pre_lines[lower_pre:upper_pre])
-
-        lower_post = max(0, start_post - context_lines)
-        upper_post = min(len(post_lines), start_post + len_post + context_lines)
-        region_post = "\n".join(post_lines[lower_post:upper_post])
-
-        pairs.append((region_pre, region_post))
-
-    return pairs
+def _extract_matched_code_regions(pre_code: str, post_code: str, patch: str, context_lines: int = 3) -> list[tuple[str, str, int, int]]:
+    # Overlapping hunks are merged so adjacent regions are not explained twice
+    return extract_region_pairs_with_context(pre_code, post_code, patch, context_lines)
 
 
 
@@ -106,70 +177,171 @@ def _extract_matched_code_regions(pre_code: str, post_code: str, patch: str, con
 
 #     return code_regions
 
-def get_code_regions(repo_full_name: str, commits: list[CommitInfo], context_lines: int = 3) -> list[tuple[CodeRegion, CodeRegion]]:
-    repo = g.get_repo(repo_full_name)
-    commit_objs = get_commit_objects(repo, commits)
+def build_commit_region_pairs(files, get_content: Callable[[str, str], str], parent_sha: str, sha: str, context_lines: int = 3) -> list[tuple[CodeRegion, CodeRegion]]:
+    """
+    Match pre/post code regions for the changed files of a single commit.
+
+    Args:
+        files: Changed files exposing `filename` and `patch` (PyGithub `File` or `ChangedFile`).
+        get_content (Callable): Returns the content of (path, ref); raises if it does not exist.
+        parent_sha (str): Ref of the pre-change version.
+        sha (str): Ref of the post-change version.
+    """
     region_pairs: list[tuple[CodeRegion, CodeRegion]] = []
 
-    for commit in commit_objs:
-        pre_change_files = _get_file_content_before_commit(repo, commit)
-        post_change_files = _get_file_content(repo, commit)
+    for file in files:
+        if is_test_file(file.filename) or not file.patch:
+            continue
+        try:
+            pre_code = get_content(file.filename, parent_sha)
+            post_code = get_content(file.filename, sha)
+        except Exception:
+            continue
 
-        for file in commit.files:
-            if is_test_file(file.filename):
-                continue
-            if file.patch and file.filename in pre_change_files and file.filename in post_change_files:
-                pre_code = pre_change_files[file.filename]
-                post_code = post_change_files[file.filename]
+        matched_regions = _extract_matched_code_regions(pre_code, post_code, file.patch, context_lines)
+
+        for region_pre, region_post, context_before, context_after in matched_regions:
+            region_pairs.append((
+                CodeRegion(filename=file.filename, code=region_pre, context_before=context_before, context_after=context_after),
+                CodeRegion(filename=file.filename, code=region_post)
+            ))
+
+    return region_pairs
 
-                matched_regions = _extract_matched_code_regions(pre_code, post_code, file.patch, context_lines)
+def get_code_regions(repo_full_name: str, commits: list[CommitInfo], context_lines: int = 3) -> list[tuple[CodeRegion, CodeRegion]]:
+    repo = get_github().get_repo(repo_full_name)
+    commit_objs = get_commit_objects(repo, commits)
+    region_pairs: list[tuple[CodeRegion, CodeRegion]] = []
 
-                for region_pre, region_post in matched_regions:
-                    region_pairs.append((
-                        CodeRegion(filename=file.filename, code=region_pre),
-                        CodeRegion(filename=file.filename, code=region_post)
-                    ))
+    for commit in commit_objs:
+        if not commit.parents:
+            continue  # No pre-change version
+        region_pairs.extend(build_commit_region_pairs(
+            commit.files,
+            lambda path, ref: _fetch_file_content(repo, path, ref),
+            commit.parents[0].sha,
+            commit.sha,
+            context_lines
+        ))
 
     return region_pairs
 
 class CodeRegionLimitException(Exception):
     pass
 
-def get_code_regions_from_pr(repo_full_name: str, issue_no: int, context_lines: int = 3) -> list[tuple[CodeRegion, CodeRegion]]:
-    repo = g.get_repo(repo_full_name)
-    pr = repo.get_pull(issue_no)
+MAX_CODE_REGIONS = 10  # Limit on code region pairs per PR
+# Files with these statuses have no pre-change version under the same path, so they never yield regions
+NO_BASE_STATUSES = ("added", "removed", "renamed", "copied")
+
+def _is_region_candidate(file) -> bool:
+    return file.status not in NO_BASE_STATUSES and bool(file.patch) and is_valid_file(file.filename)
+
+def count_pr_regions(files, context_lines: int = 3) -> int:
+    """
+    Count the code regions a PR will yield from its file listing and hunk headers alone.
+
+    Args:
+        files: Changed files exposing `filename`, `status` and `patch` (PyGithub `File` or `ChangedFile`).
+    """
+    return sum(count_regions(file.patch, context_lines) for file in files if _is_region_candidate(file))
+
+def screen_pr_files(files, context_lines: int = 3) -> int:
+    """
+    Reject a PR from its file listing before any content is downloaded.
+
+    Returns:
+        int: Number of prospective region pairs.
+
+    Raises:
+        CodeRegionLimitException: If the PR has more than MAX_CODE_REGIONS regions or none at all.
+    """
+    region_count = count_pr_regions(files, context_lines)
+    if region_count > MAX_CODE_REGIONS:
+        raise CodeRegionLimitException(f"The number of code region pairs ({region_count}) exceeds the limit of {MAX_CODE_REGIONS}")
+    if region_count == 0:
+        raise CodeRegionLimitException("No valid code regions found in the PR")
+    return region_count
+
+def build_pr_region_pairs(files, get_content: Callable[[str, str], str], base_sha: str, head_sha: str, context_lines: int = 3) -> list[tuple[CodeRegion, CodeRegion]]:
+    """
+    Match pre/post code regions for the changed files of a PR.
+
+    Args:
+        files: Changed files exposing `filename`, `status` and `patch` (PyGithub `File` or `ChangedFile`).
+        get_content (Callable): Returns the content of (path, ref); raises if it does not exist.
+        base_sha (str): Ref of the pre-change version.
+        head_sha (str): Ref of the post-change version.
+
+    Raises:
+        CodeRegionLimitException: If the PR has more than MAX_CODE_REGIONS regions or none at all.
+    """
     region_pairs = []
 
-    for file in pr.get_files():
-        if file.status == "removed":
-            continue  # No post-PR content
+    for file in files:
+        if not _is_region_candidate(file):
+            continue
 
         try:
-            pre_code = repo.get_contents(file.filename, ref=pr.base.sha).decoded_content.decode()
-            post_code = repo.get_contents(file.filename, ref=pr.head.sha).decoded_content.decode()
+            pre_code = get_content(file.filename, base_sha)
+            post_code = get_content(file.filename, head_sha)
         except Exception:
             continue
 
-        if file.patch and is_valid_file(file.filename):
-            matched_regions = _extract_matched_code_regions(pre_code, post_code, file.patch, context_lines)
-            for pre, post in matched_regions:
-                if len(region_pairs) >= 10: # Limit to 10 code region pairs
-                    raise CodeRegionLimitException("The number of code region pairs exceeds the limit of 10")
-                region_pairs.append((
-                    CodeRegion(filename=file.filename, code=pre),
-                    CodeRegion(filename=file.filename, code=post)
-                ))
+        matched_regions = _extract_matched_code_regions(pre_code, post_code, file.patch, context_lines)
+        for pre, post, context_before, context_after in matched_regions:
+            if len(region_pairs) >= MAX_CODE_REGIONS:
+                raise CodeRegionLimitException(f"The number of code region pairs exceeds the limit of {MAX_CODE_REGIONS}")
+            region_pairs.append((
+                CodeRegion(filename=file.filename, code=pre, context_before=context_before, context_after=context_after),
+                CodeRegion(filename=file.filename, code=post)
+            ))
     if len(region_pairs) == 0:
         raise CodeRegionLimitException("No valid code regions found in the PR")
 
     return region_pairs
 
+def get_code_regions_from_pr(repo_full_name: str, issue_no: int, context_lines: int = 3, bulk_fetch: bool = True) -> list[tuple[CodeRegion, CodeRegion]]:
+    """
+    Return matched (pre, post) code region pairs for every changed file of a PR.
+
+    The PR is screened from its file listing first, so over-limit and empty PRs are rejected
+    before any content is downloaded. With `bulk_fetch`, base and head contents for all
+    candidate files are fetched together in batched GraphQL queries instead of two
+    `get_contents` calls per file.
+    """
+    with span("github.pr_files"):
+        repo = get_github().get_repo(repo_full_name)
+        pr = repo.get_pull(issue_no)
+        files = list(pr.get_files())
+    screen_pr_files(files, context_lines)
+
+    if bulk_fetch:
+        with span("github.contents"):
+            contents = _fetch_file_contents_bulk(repo, [
+                (file.filename, ref)
+                for file in files if _is_region_candidate(file)
+                for ref in (pr.base.sha, pr.head.sha)
+            ])
+        get_content = lambda path, ref: contents[(path, ref)]
+    else:
+        get_content = lambda path, ref: _fetch_file_content(repo, path, ref)
+
+    return build_pr_region_pairs(files, get_content, pr.base.sha, pr.head.sha, context_lines)
+
+def screen_pr(repo_full_name: str, issue_no: int, context_lines: int = 3) -> int:
+    """
+    Count the prospective code regions of a PR from its file listing, without downloading any content.
+    """
+    with span("github.pr_files"):
+        files = list(get_github().get_repo(repo_full_name).get_pull(issue_no).get_files())
+    return count_pr_regions(files, context_lines)
+
 def get_code_diffs(repo_full_name: str, commits: list) -> str:
     """
     Fetches and concatenates code diffs (patches) for a list of commit SHAs.
     Returns a single string of unified diffs.
     """
-    repo = g.get_repo(repo_full_name)
+    repo = get_github().get_repo(repo_full_name)
     all_diffs = []
 
     for commit_info in commits:
@@ -1,31 +1,98 @@
-from github import Github
 import os
-from dotenv import load_dotenv
+import json
+import time
+import threading
 
-load_dotenv()
-GITHUB_TOKEN = os.getenv("GITHUB_TOKEN")
-g = Github(GITHUB_TOKEN)
+from github import UnknownObjectException
 
+from github_api.client import get_github
+from github_api.content_cache import CACHE_DIR
+from utils.logger import logger
+from utils.metrics import span
+from utils.single_flight import SingleFlight
 
-def get_readme_head(repo_full_name: str, max_lines: int = 50) -> str:
+README_CACHE_DIR = CACHE_DIR / "readme"
+README_CACHE_TTL = int(os.getenv("README_CACHE_TTL", str(7 * 24 * 3600)))  # Seconds before revalidating
+
+_readme_heads: dict[tuple[str, int], str] = {}  # In-process memo of (repo, max_lines) -> README head
+_readme_lock = threading.Lock()
+_readme_flights = SingleFlight("github.readme")  # Shares lookups of the same repo that overlap in time
+
+
+def _trim_to_h1(content: str) -> str:
     """
-    Fetch up to `max_lines` lines of README content starting after the first H1 title.
+    Return the README content starting after the first H1 title (`# Title`).
     """
-    try:
-        repo = g.get_repo(repo_full_name)
-        readme = repo.get_readme()
-        content = readme.decoded_content.decode()
-        lines = content.splitlines()
+    lines = content.splitlines()
+
+    start_index = 0
+    for i, line in enumerate(lines):
+        if line.strip().startswith("# "):
+            start_index = i + 1
+            break
+
+    return "\n".join(lines[start_index:])
+
+
+def _load_readme_body(repo_full_name: str) -> str:
+    """
+    Return the H1-trimmed README from the on-disk store, refetching it when the
+    entry is older than README_CACHE_TTL and the default branch has moved.
+
+    A repo without a README is stored with an empty body, so it is not looked up again
+    until the default branch moves.
+    """
+    cache_path = README_CACHE_DIR / f"{repo_full_name.replace('/', '__')}.json"
+    entry = None
+    if cache_path.exists():
+        with open(cache_path) as f:
+            entry = json.load(f)
+        if time.time() - entry["fetched_at"] < README_CACHE_TTL:
+            return entry["body"]
+
+    repo = get_github().get_repo(repo_full_name)
+    sha = repo.get_branch(repo.default_branch).commit.sha
+
+    if entry is None or entry["sha"] != sha:
+        try:
+            body = _trim_to_h1(repo.get_readme(ref=sha).decoded_content.decode())
+        except UnknownObjectException:
+            body = ""
+        entry = {"sha": sha, "body": body}
+    entry["fetched_at"] = time.time()
+
+    README_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    tmp_path = cache_path.with_suffix(f".{threading.get_ident()}.tmp")
+    with open(tmp_path, "w") as f:
+        json.dump(entry, f)
+    os.replace(tmp_path, cache_path)
+
+    return entry["body"]
+
 
-        # Find the first H1 title (`# Title`)
-        start_index = 0
-        for i, line in enumerate(lines):
-            if line.strip().startswith("# "):
-                start_index = i + 1
-                break
+def get_readme_head(repo_full_name: str, max_lines: int = 50) -> str:
+    """
+    Fetch up to `max_lines` lines of README content starting after the first H1 title.
 
-        return "\n".join(lines[start_index:start_index + max_lines])
+    Results are memoized in-process and stored on disk keyed by repo and default-branch sha.
+    Concurrent lookups of the same repo share one fetch. Missing repos and READMEs are
+    memoized as empty; rate-limit and network failures are not, so a later call retries them.
+    """
+    key = (repo_full_name, max_lines)
+    if key in _readme_heads:
+        return _readme_heads[key]
 
+    try:
+        with span("github.readme"):
+            body = _readme_flights.do(repo_full_name, lambda: _load_readme_body(repo_full_name))
+        head = "\n".join(body.splitlines()[:max_lines])
+    except UnknownObjectException:
+        logger.debug(f"Repo {repo_full_name} not found; using an empty README.")
+        head = ""
     except Exception as e:
-        print(f"[WARN] Failed to fetch README for {repo_full_name}: {e}")
-        return ""
\ No newline at end of file
+        logger.warning(f"Failed to fetch README for {repo_full_name}: {e}")
+        return ""
+
+    with _readme_lock:
+        _readme_heads[key] = head
+    return head
@@ -0,0 +1,201 @@
+import json
+import time
+from pathlib import Path
+
+from llm.client import get_client
+from llm.response_cache import LLMCacheMissError, get_response_cache, prompt_key
+from utils.logger import logger
+from utils.metrics import get_metrics
+
+BATCH_ENDPOINT = "/v1/chat/completions"
+BATCH_POLL_INTERVAL = 30  # Seconds between status checks
+BATCH_PENDING_STATUSES = ("validating", "in_progress", "finalizing", "cancelling")
+BATCH_MAX_REQUESTS = 50_000  # Batch API limit on requests per batch
+BATCH_MAX_BYTES = 200 * 1024 * 1024  # Batch API limit on the input file size
+
+
+class BatchFailedException(Exception):
+    pass
+
+
+def make_custom_id(repo: str, issue_no: int, region_index: int) -> str:
+    return f"{repo}|{issue_no}|{region_index}"
+
+
+def parse_custom_id(custom_id: str) -> tuple[str, int, int]:
+    repo, issue_no, region_index = custom_id.rsplit("|", 2)
+    return repo, int(issue_no), int(region_index)
+
+
+def batch_line(custom_id: str, messages: list[dict], model: str = "gpt-4o", temperature: float = 0.2) -> str:
+    """
+    Encode one request as a line of a Batch API input file.
+    """
+    return json.dumps({
+        "custom_id": custom_id,
+        "method": "POST",
+        "url": BATCH_ENDPOINT,
+        "body": {"model": model, "messages": messages, "temperature": temperature},
+    }) + "\n"
+
+
+def write_batch_file(requests: list[tuple[str, list[dict]]], path: Path, model: str = "gpt-4o", temperature: float = 0.2) -> Path:
+    """
+    Write (custom_id, messages) pairs as a Batch API input JSONL file.
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "w") as f:
+        for custom_id, messages in requests:
+            f.write(batch_line(custom_id, messages, model, temperature))
+    return path
+
+
+def chunk_requests(
+    requests: list[tuple[str, list[dict]]],
+    model: str = "gpt-4o",
+    temperature: float = 0.2,
+    max_requests: int = BATCH_MAX_REQUESTS,
+    max_bytes: int = BATCH_MAX_BYTES
+) -> list[list[tuple[str, list[dict]]]]:
+    """
+    Split requests into consecutive chunks that each fit the Batch API request count and input file size limits.
+    """
+    chunks = []
+    chunk, chunk_bytes = [], 0
+    for custom_id, messages in requests:
+        size = len(batch_line(custom_id, messages, model, temperature).encode())
+        if chunk and (len(chunk) >= max_requests or chunk_bytes + size > max_bytes):
+            chunks.append(chunk)
+            chunk, chunk_bytes = [], 0
+        chunk.append((custom_id, messages))
+        chunk_bytes += size
+    if chunk:
+        chunks.append(chunk)
+    return chunks
+
+
+def chunk_path(path: Path, index: int, count: int) -> Path:
+    """
+    Input file path of one chunk; a single chunk keeps `path` itself.
+    """
+    path = Path(path)
+    return path if count == 1 else path.with_name(f"{path.stem}.{index}{path.suffix}")
+
+
+def submit_batch(path: Path, client=None) -> str:
+    """
+    Upload a batch input file and create the batch job.
+
+    Returns:
+        str: The batch id.
+    """
+    client = client or get_client()
+    with open(path, "rb") as f:
+        input_file = client.files.create(file=f, purpose="batch")
+    batch = client.batches.create(input_file_id=input_file.id, endpoint=BATCH_ENDPOINT, completion_window="24h")
+    logger.info(f"Submitted batch {batch.id} from {path}")
+    return batch.id
+
+
+def wait_for_batch(batch_id: str, client=None, poll_interval: float = BATCH_POLL_INTERVAL):
+    """
+    Poll a batch until it reaches a terminal status.
+
+    Raises:
+        BatchFailedException: If the batch failed, expired or was cancelled.
+    """
+    client = client or get_client()
+    while True:
+        batch = client.batches.retrieve(batch_id)
+        if batch.status == "completed":
+            return batch
+        if batch.status not in BATCH_PENDING_STATUSES:
+            raise BatchFailedException(f"Batch {batch_id} ended with status '{batch.status}'")
+        logger.debug(f"Batch {batch_id} is {batch.status}, checking again in {poll_interval}s")
+        time.sleep(poll_interval)
+
+
+def read_batch_results(batch, client=None) -> dict[str, dict]:
+    """
+    Download a completed batch's output and return each successful response body by custom_id.
+    """
+    client = client or get_client()
+    if not batch.output_file_id:
+        return {}
+
+    results = {}
+    for line in client.files.content(batch.output_file_id).text.splitlines():
+        if not line.strip():
+            continue
+        record = json.loads(line)
+        response = record.get("response") or {}
+        if record.get("error") or response.get("status_code") != 200:
+            logger.error(f"Batch request {record['custom_id']} failed: {record.get('error') or response}")
+            continue
+        results[record["custom_id"]] = response["body"]
+    return results
+
+
+def run_batch(
+    requests: list[tuple[str, list[dict]]],
+    path: Path,
+    model: str = "gpt-4o",
+    temperature: float = 0.2,
+    client=None,
+    poll_interval: float = BATCH_POLL_INTERVAL,
+    max_requests: int = BATCH_MAX_REQUESTS,
+    max_bytes: int = BATCH_MAX_BYTES
+) -> dict[str, str]:
+    """
+    Explain all requests through the Batch API and return response contents by custom_id.
+
+    Requests already in the response cache are not resubmitted, and new results are stored
+    in the cache so live and batch runs share answers. In replay mode, requests missing from
+    the cache are left out of the results, so they are marked failed like failed live calls.
+
+    Pending requests are split into batches under the Batch API limits (`max_requests` per
+    batch, `max_bytes` per input file). All batches are submitted first, then each is awaited
+    and its results merged and cached as it completes.
+    """
+    cache = get_response_cache()
+    contents = {}
+    pending = []
+    for custom_id, messages in requests:
+        try:
+            cached = cache.get(prompt_key(messages, model, temperature))
+        except LLMCacheMissError as e:
+            logger.error(f"LLM call failed for {custom_id}: {e}")
+            continue
+        if cached is None:
+            pending.append((custom_id, messages))
+        else:
+            contents[custom_id] = cached
+
+    if not pending:
+        return contents
+
+    client = client or get_client()
+    chunks = chunk_requests(pending, model, temperature, max_requests, max_bytes)
+    batch_ids = [
+        submit_batch(write_batch_file(chunk, chunk_path(path, i, len(chunks)), model, temperature), client)
+        for i, chunk in enumerate(chunks)
+    ]
+
+    succeeded = 0
+    for batch_id, chunk in zip(batch_ids, chunks):
+        bodies = read_batch_results(wait_for_batch(batch_id, client, poll_interval), client)
+        for custom_id, messages in chunk:
+            body = bodies.get(custom_id)
+            if body is None:
+                continue
+            content = body["choices"][0]["message"]["content"].strip()
+            usage = body.get("usage") or {}
+            get_metrics().record_usage(model, usage, batch=True)
+            cache.put(prompt_key(messages, model, temperature), model, temperature, content, usage.get("total_tokens", 0))
+            contents[custom_id] = content
+            succeeded += 1
+        logger.debug(f"Batch {batch_id}: {len(bodies)}/{len(chunk)} requests succeeded.")
+
+    logger.info(f"{len(batch_ids)} batches: {succeeded}/{len(pending)} requests succeeded, {len(requests) - len(pending)} served from cache.")
+    return contents
@@ -0,0 +1,206 @@
+import os
+import time
+import asyncio
+import threading
+from openai import AsyncOpenAI, OpenAI
+from dotenv import load_dotenv
+
+from llm.rate_limit import AsyncRateLimiter
+from llm.retry import LLMCallError, LatencyTracker, backoff_delay, hedged, is_retryable, retry_after_seconds
+from llm.response_cache import get_response_cache, prompt_key
+from utils.metrics import get_metrics, span
+from utils.single_flight import AsyncSingleFlight
+from utils.logger import logger
+
+load_dotenv()
+
+MAX_CONCURRENCY = int(os.getenv("OPENAI_MAX_CONCURRENCY", "8"))
+REQUESTS_PER_MINUTE = int(os.getenv("OPENAI_REQUESTS_PER_MINUTE", "500"))
+TOKENS_PER_MINUTE = int(os.getenv("OPENAI_TOKENS_PER_MINUTE", "30000"))
+EXPECTED_COMPLETION_TOKENS = 1024  # Reserved per call against the TPM budget
+REQUEST_TIMEOUT = float(os.getenv("OPENAI_REQUEST_TIMEOUT", "120"))  # Seconds per attempt
+MAX_RETRIES = int(os.getenv("OPENAI_MAX_RETRIES", "5"))
+BACKOFF_BASE = 1.0  # Seconds; doubled on every retry, with full jitter
+BACKOFF_MAX = 60.0
+# Send a duplicate request once a call has run longer than this percentile of recent latencies
+HEDGE_QUANTILE = float(os.getenv("OPENAI_HEDGE_QUANTILE", "95"))
+HEDGE_ENABLED = os.getenv("OPENAI_HEDGE", "0") == "1"
+
+_loop: asyncio.AbstractEventLoop | None = None
+_loop_lock = threading.Lock()
+_client = None
+_async_client = None
+_semaphore: asyncio.Semaphore | None = None
+_request_limiter: AsyncRateLimiter | None = None
+_token_limiter: AsyncRateLimiter | None = None
+_latencies = LatencyTracker()
+_prompt_flights = AsyncSingleFlight("llm.prompts")  # Shares identical prompts that are in flight at the same time
+
+
+def _get_loop() -> asyncio.AbstractEventLoop:
+    """
+    Return the shared background event loop, starting it on first use.
+
+    All async LLM calls run on this one loop so the client, semaphore and limiters
+    are shared by every caller, including sync callers on worker threads.
+    """
+    global _loop
+    with _loop_lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            threading.Thread(target=_loop.run_forever, name="llm-event-loop", daemon=True).start()
+    return _loop
+
+
+def run_sync(coro):
+    """
+    Run a coroutine on the shared event loop and block until it finishes.
+    """
+    return asyncio.run_coroutine_threadsafe(coro, _get_loop()).result()
+
+
+def get_client():
+    """
+    Return the synchronous OpenAI client used for file and batch endpoints.
+    """
+    global _client
+    if _client is None:
+        _client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+    return _client
+
+
+def set_async_client(async_client) -> None:
+    """
+    Replace the AsyncOpenAI client, e.g. with a local stub for benchmarking.
+    """
+    global _async_client
+    _async_client = async_client
+
+
+def _get_async_client():
+    global _async_client
+    if _async_client is None:
+        # Retries are handled by `achat_completion`, with backoff shared across the rate limits
+        _async_client = AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY"), max_retries=0)
+    return _async_client
+
+
+def _get_limits() -> tuple[asyncio.Semaphore, AsyncRateLimiter, AsyncRateLimiter]:
+    global _semaphore, _request_limiter, _token_limiter
+    if _semaphore is None:
+        _semaphore = asyncio.Semaphore(MAX_CONCURRENCY)
+        _request_limiter = AsyncRateLimiter(REQUESTS_PER_MINUTE)
+        _token_limiter = AsyncRateLimiter(TOKENS_PER_MINUTE)
+    return _semaphore, _request_limiter, _token_limiter
+
+
+def estimate_tokens(messages: list[dict], completion_tokens: int = EXPECTED_COMPLETION_TOKENS) -> int:
+    """
+    Rough token estimate (~4 characters per token) plus the reserved completion, used for TPM pacing.
+    """
+    return sum(len(m.get("content") or "") for m in messages) // 4 + completion_tokens
+
+
+async def _create(request: dict, timeout: float):
+    start = time.perf_counter()
+    response = await asyncio.wait_for(_get_async_client().chat.completions.create(**request), timeout)
+    _latencies.add(time.perf_counter() - start)
+    return response
+
+
+async def achat_completion(
+    messages: list[dict],
+    model: str = "gpt-4o",
+    temperature: float = 0.2,
+    response_format: dict | None = None,
+    timeout: float = REQUEST_TIMEOUT,
+    max_retries: int = MAX_RETRIES,
+    hedge: bool = HEDGE_ENABLED,
+    completion_tokens: int = EXPECTED_COMPLETION_TOKENS
+) -> str:
+    """
+    Send messages to the Chat Completions API under the shared concurrency and rate limits.
+
+    Responses are served from and stored in the persistent response cache according to its mode,
+    and identical requests already in flight share one call. Timeouts, rate limits and server
+    errors are retried with jittered exponential backoff that honours `Retry-After`.
+
+    Args:
+        messages (list[dict]): Messages in Chat format.
+        model (str): Model to use.
+        temperature (float): Sampling temperature.
+        response_format (dict | None): Optional structured output format, e.g. {"type": "json_object"}.
+        timeout (float): Seconds before an attempt is abandoned and retried.
+        max_retries (int): Retries after the first attempt.
+        hedge (bool): Send a duplicate request when an attempt runs past the recent p95 latency.
+        completion_tokens (int): Completion tokens reserved against the TPM budget, e.g. more for
+            an answer that covers several regions.
+
+    Returns:
+        str: The stripped response content.
+
+    Raises:
+        LLMCallError: If the call failed with a non-retryable error or ran out of retries.
+    """
+    cache = get_response_cache()
+    key = prompt_key(messages, model, temperature, response_format)
+    cached = cache.get(key)
+    if cached is not None:
+        return cached
+    return await _prompt_flights.do(key, lambda: _complete(key, messages, model, temperature, response_format, timeout, max_retries, hedge, completion_tokens))
+
+
+async def _complete(
+    key: str,
+    messages: list[dict],
+    model: str,
+    temperature: float,
+    response_format: dict | None,
+    timeout: float,
+    max_retries: int,
+    hedge: bool,
+    completion_tokens: int
+) -> str:
+    cache = get_response_cache()
+    semaphore, request_limiter, token_limiter = _get_limits()
+    request = {"model": model, "messages": messages, "temperature": temperature}
+    if response_format is not None:
+        request["response_format"] = response_format
+
+    async def acquire_budget():
+        with span("llm.rate_limit_wait"):
+            await request_limiter.acquire(1)
+            await token_limiter.acquire(estimate_tokens(messages, completion_tokens))
+
+    async def send_hedge():
+        # The duplicate counts against the same RPM, TPM and concurrency limits as any request
+        await acquire_budget()
+        async with semaphore:
+            return await _create(request, timeout)
+
+    for attempt in range(max_retries + 1):
+        await acquire_budget()
+        try:
+            async with semaphore:
+                with span("llm.call", model=model):
+                    hedge_after = _latencies.quantile(HEDGE_QUANTILE) if hedge else None
+                    response, hedged_win = await hedged(lambda: _create(request, timeout), hedge_after, send_hedge)
+            if hedged_win:
+                logger.debug(f"Hedged request won after {hedge_after:.1f}s.")
+            break
+        except Exception as e:
+            if not is_retryable(e):
+                raise LLMCallError(f"{type(e).__name__}: {e}") from e
+            if attempt == max_retries:
+                raise LLMCallError(f"Gave up after {max_retries + 1} attempts: {type(e).__name__}: {e}") from e
+            delay = backoff_delay(attempt, BACKOFF_BASE, BACKOFF_MAX, retry_after_seconds(e))
+            logger.warning(f"LLM call failed ({type(e).__name__}), retrying in {delay:.1f}s (attempt {attempt + 1}/{max_retries}).")
+            with span("llm.backoff"):
+                await asyncio.sleep(delay)
+
+    content = response.choices[0].message.content.strip()
+
+    usage = getattr(response, "usage", None)
+    get_metrics().record_usage(model, usage)
+    cache.put(key, model, temperature, content, usage.total_tokens if usage else 0)
+    return content
@@ -1,38 +1,95 @@
-import os
-from openai import OpenAI
-from dotenv import load_dotenv
+import asyncio
+import json
 
+from llm.client import EXPECTED_COMPLETION_TOKENS, achat_completion, run_sync
 from utils.logger import logger
 
-load_dotenv()
 
-client = OpenAI(
-    api_key=os.getenv("OPENAI_API_KEY"),
-)
+def as_messages(prompt: str | list[dict]) -> list[dict]:
+    if isinstance(prompt, str):
+        return [{"role": "user", "content": prompt}]
+    return prompt
 
-def generate_llm_explanation(prompt: str, model: str = "gpt-4o", temperature: float = 0.2) -> str:
+
+async def agenerate_llm_explanation(prompt: str | list[dict], model: str = "gpt-4o", temperature: float = 0.2) -> str | None:
     """
     Send the prompt to OpenAI's ChatCompletion API and return the model's explanation.
     
     Args:
-        prompt (str): The prompt string (structured JSON or text) to send to the LLM.
+        prompt (str | list[dict]): The prompt string (structured JSON or text), or prebuilt Chat messages.
         model (str): The model name to use (default: "gpt-4").
         temperature (float): Sampling temperature for creativity control.
 
     Returns:
-        str: The LLM's response content.
+        str | None: The LLM's response content, or None if the call failed after retries.
     """
     try:
-        response = client.chat.completions.create(
+        return await achat_completion(
+            messages=as_messages(prompt),
             model=model,
-            messages=[
-                {"role": "user", "content": prompt}
-            ],
             temperature=temperature,
             #max_tokens=1024
         )
-        return response.choices[0].message.content.strip()
 
     except Exception as e:
         logger.error(f"LLM call failed: {e}")
-        return ""
+        return None
+
+
+def generate_llm_explanation(prompt: str | list[dict], model: str = "gpt-4o", temperature: float = 0.2) -> str | None:
+    """
+    Synchronous wrapper around `agenerate_llm_explanation`.
+    """
+    return run_sync(agenerate_llm_explanation(prompt, model, temperature))
+
+
+def generate_llm_explanations(prompts: list[str | list[dict]], model: str = "gpt-4o", temperature: float = 0.2) -> list[str | None]:
+    """
+    Explain several prompts concurrently, returning explanations in prompt order (None for failed calls).
+    """
+    async def _gather():
+        return await asyncio.gather(*(agenerate_llm_explanation(p, model, temperature) for p in prompts))
+
+    return run_sync(_gather())
+
+
+def parse_multi_region_explanations(content: str, region_count: int) -> list[str] | None:
+    """
+    Parse a multi-region JSON answer into one explanation per region, or None if it is incomplete.
+    """
+    try:
+        regions = json.loads(content)["regions"]
+        explanations = {int(r["index"]): str(r["explanation"]).strip() for r in regions}
+    except (ValueError, KeyError, TypeError) as e:
+        logger.warning(f"Could not parse multi-region explanation: {e}")
+        return None
+
+    if sorted(explanations) != list(range(region_count)) or not all(explanations.values()):
+        logger.warning(f"Multi-region explanation covered regions {sorted(explanations)} of {region_count}")
+        return None
+    return [explanations[i] for i in range(region_count)]
+
+
+def generate_llm_multi_explanation(messages: list[dict], region_count: int, model: str = "gpt-4o", temperature: float = 0.2) -> list[str] | None:
+    """
+    Explain all regions of an issue in one JSON-mode call.
+
+    Returns:
+        list[str] | None: One explanation per region, or None if the call or parsing failed.
+    """
+    async def _call():
+        # The answer covers every region, so reserve a completion's worth of TPM budget per region
+        return await achat_completion(
+            messages,
+            model,
+            temperature,
+            response_format={"type": "json_object"},
+            completion_tokens=EXPECTED_COMPLETION_TOKENS * region_count
+        )
+
+    try:
+        content = run_sync(_call())
+    except Exception as e:
+        logger.error(f"LLM call failed: {e}")
+        return None
+    return parse_multi_region_explanations(content, region_count)
@@ -0,0 +1,42 @@
+import asyncio
+import time
+
+
+class AsyncRateLimiter:
+    """
+    Token-bucket limiter allowing at most `limit` units per `period` seconds.
+
+    Used for both requests-per-minute (1 unit per call) and tokens-per-minute
+    (estimated prompt + completion tokens per call) limits.
+    """
+
+    def __init__(self, limit: int | None, period: float = 60.0):
+        self.limit = limit
+        self.period = period
+        self._available = float(limit or 0)
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        rate = self.limit / self.period
+        self._available = min(self.limit, self._available + (now - self._updated) * rate)
+        self._updated = now
+
+    async def acquire(self, amount: int = 1):
+        """
+        Wait until `amount` units are available, then consume them.
+
+        Requests larger than the whole budget are clamped to it so they can still proceed.
+        """
+        if not self.limit:
+            return
+        amount = min(amount, self.limit)
+
+        async with self._lock:
+            while True:
+                self._refill()
+                if self._available >= amount:
+                    self._available -= amount
+                    return
+                await asyncio.sleep((amount - self._available) * self.period / self.limit)
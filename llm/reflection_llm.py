@@ -1,16 +1,10 @@
-import os
-from openai import OpenAI
-from dotenv import load_dotenv
+import asyncio
 
+from llm.client import achat_completion, run_sync
 from utils.logger import logger
 
-load_dotenv()
 
-client = OpenAI(
-    api_key=os.getenv("OPENAI_API_KEY"),
-)
-
-def generate_llm_reflection(messages: list[dict], model: str = "gpt-4o", temperature: float = 0.2) -> str:
+async def agenerate_llm_reflection(messages: list[dict], model: str = "gpt-4o", temperature: float = 0.2) -> str | None:
     """
     Use OpenAI's ChatCompletion API with structured message input.
 
@@ -20,16 +14,32 @@ def generate_llm_reflection(messages: list[dict], model: str = "gpt-4o", tempera
         temperature (float): Sampling temperature.
 
     Returns:
-        str: The response content from the assistant.
+        str | None: The response content from the assistant, or None if the call failed after retries.
     """
     try:
-        response = client.chat.completions.create(
-            model=model,
+        return await achat_completion(
             messages=messages,
+            model=model,
             temperature=temperature,
         )
-        return response.choices[0].message.content.strip()
 
     except Exception as e:
         logger.error(f"LLM call failed: {e}")
-        return ""
+        return None
+
+
+def generate_llm_reflection(messages: list[dict], model: str = "gpt-4o", temperature: float = 0.2) -> str | None:
+    """
+    Synchronous wrapper around `agenerate_llm_reflection`.
+    """
+    return run_sync(agenerate_llm_reflection(messages, model, temperature))
+
+
+def generate_llm_reflections(messages_list: list[list[dict]], model: str = "gpt-4o", temperature: float = 0.2) -> list[str | None]:
+    """
+    Reflect on several message lists concurrently, returning responses in input order (None for failed calls).
+    """
+    async def _gather():
+        return await asyncio.gather(*(agenerate_llm_reflection(m, model, temperature) for m in messages_list))
+
+    return run_sync(_gather())
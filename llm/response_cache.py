@@ -0,0 +1,135 @@
+import os
+import json
+import hashlib
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+from utils.logger import logger
+
+CACHE_DIR = Path(os.getenv("LLM_CACHE_DIR", ".cache"))
+
+# readwrite: serve hits and store new responses
+# replay:    serve hits only; a miss raises LLMCacheMissError instead of calling the API
+# bypass:    ignore the cache entirely
+CACHE_MODES = ("readwrite", "replay", "bypass")
+CACHE_MODE = os.getenv("LLM_CACHE_MODE", "readwrite")
+
+
+class LLMCacheMissError(Exception):
+    pass
+
+
+def prompt_key(messages: list[dict], model: str, temperature: float, response_format: dict | None = None) -> str:
+    """
+    Content-addressed key for a completion request.
+    """
+    request = {"messages": messages, "model": model, "temperature": temperature}
+    if response_format is not None:
+        request["response_format"] = response_format
+    payload = json.dumps(request, sort_keys=True)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+class ResponseCache:
+    """
+    Persistent SQLite cache of LLM responses keyed by prompt hash, model and temperature.
+    """
+
+    def __init__(self, db_path: Path, mode: str = CACHE_MODE):
+        if mode not in CACHE_MODES:
+            raise ValueError(f"Unsupported LLM cache mode '{mode}'. Use one of {CACHE_MODES}")
+        self.mode = mode
+        self.hits = 0
+        self.misses = 0
+        self.tokens_saved = 0
+        self._lock = threading.Lock()
+
+        Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                model TEXT NOT NULL,
+                temperature REAL NOT NULL,
+                content TEXT NOT NULL,
+                total_tokens INTEGER NOT NULL,
+                created_at REAL NOT NULL
+            )
+            """
+        )
+        self._conn.commit()
+
+    def get(self, key: str) -> str | None:
+        """
+        Return the cached response for `key`, or None on a miss (always None when bypassed).
+
+        Raises:
+            LLMCacheMissError: On a miss in replay mode.
+        """
+        if self.mode == "bypass":
+            return None
+        with self._lock:
+            row = self._conn.execute("SELECT content, total_tokens FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self.tokens_saved += row[1]
+        if row is None:
+            if self.mode == "replay":
+                raise LLMCacheMissError(f"No cached response for prompt {key[:12]} in replay mode")
+            return None
+        return row[0]
+
+    def put(self, key: str, model: str, temperature: float, content: str, total_tokens: int = 0):
+        if self.mode != "readwrite":
+            return
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?)",
+                (key, model, temperature, content, total_tokens, time.time())
+            )
+            self._conn.commit()
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "mode": self.mode,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / total if total else 0.0,
+            "tokens_saved": self.tokens_saved,
+        }
+
+
+_cache: ResponseCache | None = None
+_cache_lock = threading.Lock()
+
+
+def get_response_cache() -> ResponseCache:
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = ResponseCache(CACHE_DIR / "llm_responses.sqlite")
+    return _cache
+
+
+def set_cache_mode(mode: str):
+    """
+    Switch the cache mode for the rest of the process (readwrite, replay or bypass).
+    """
+    if mode not in CACHE_MODES:
+        raise ValueError(f"Unsupported LLM cache mode '{mode}'. Use one of {CACHE_MODES}")
+    get_response_cache().mode = mode
+
+
+def log_response_cache_stats():
+    stats = get_response_cache().stats()
+    logger.info(
+        f"LLM response cache ({stats['mode']}): {stats['hits']} hits, {stats['misses']} misses "
+        f"({stats['hit_ratio']:.0%} hit ratio), {stats['tokens_saved']} tokens saved."
+    )
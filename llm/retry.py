@@ -0,0 +1,119 @@
+import asyncio
+import random
+import threading
+from collections import deque
+from typing import Awaitable, Callable
+
+from utils.metrics import percentile
+
+RETRYABLE_STATUS_CODES = (408, 409, 429)  # Plus every 5xx
+LLM_CALL_FAILED = "llm_call_failed"  # Error marker stored on outputs whose LLM call failed
+
+
+class LLMCallError(Exception):
+    """
+    An LLM call failed for good: a non-retryable error, or retries were exhausted.
+    """
+
+
+def is_retryable(error: Exception) -> bool:
+    """
+    Timeouts, connection errors, rate limits and server errors are worth retrying.
+    """
+    if isinstance(error, (asyncio.TimeoutError, TimeoutError, ConnectionError)):
+        return True
+    status = getattr(error, "status_code", None)
+    if status is not None:
+        return status in RETRYABLE_STATUS_CODES or status >= 500
+    # openai.APIConnectionError and APITimeoutError carry no status code
+    return type(error).__name__ in ("APIConnectionError", "APITimeoutError")
+
+
+def retry_after_seconds(error: Exception) -> float | None:
+    """
+    Server-requested wait from the `retry-after-ms` or `retry-after` response headers, if any.
+    """
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None)
+    if not headers:
+        return None
+    try:
+        if headers.get("retry-after-ms") is not None:
+            return float(headers["retry-after-ms"]) / 1000
+        if headers.get("retry-after") is not None:
+            return float(headers["retry-after"])
+    except (TypeError, ValueError):
+        return None  # HTTP-date values are not worth parsing; fall back to backoff
+    return None
+
+
+def backoff_delay(attempt: int, base: float, cap: float, retry_after: float | None = None) -> float:
+    """
+    Full-jitter exponential backoff, never shorter than a server-requested `retry_after`.
+    """
+    delay = random.uniform(0, min(cap, base * 2 ** attempt))
+    if retry_after is not None:
+        delay = max(delay, retry_after)
+    return delay
+
+
+class LatencyTracker:
+    """
+    Rolling window of recent call latencies used to decide when to hedge.
+    """
+
+    def __init__(self, window: int = 200, min_samples: int = 20):
+        self.min_samples = min_samples
+        self._latencies: deque[float] = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def add(self, latency: float):
+        with self._lock:
+            self._latencies.append(latency)
+
+    def quantile(self, q: float) -> float | None:
+        """
+        The q-th percentile of recent latencies, or None until enough calls have completed.
+        """
+        with self._lock:
+            if len(self._latencies) < self.min_samples:
+                return None
+            return percentile(list(self._latencies), q)
+
+
+async def hedged(call: Callable[[], Awaitable], hedge_after: float | None, hedge_call: Callable[[], Awaitable] | None = None):
+    """
+    Await `call()`, starting a duplicate if it has not finished after `hedge_after` seconds
+    and returning whichever finishes first successfully. The other one is cancelled.
+
+    Args:
+        call (Callable): Starts the primary request.
+        hedge_after (float | None): Seconds before hedging; None never hedges.
+        hedge_call (Callable | None): Starts the duplicate, e.g. after acquiring its own rate-limit
+            budget and concurrency slot. Defaults to `call`.
+
+    Returns:
+        tuple: The result and whether it came from the hedge.
+    """
+    primary = asyncio.ensure_future(call())
+    if hedge_after is None:
+        return await primary, False
+
+    done, _ = await asyncio.wait({primary}, timeout=hedge_after)
+    if done:
+        return primary.result(), False
+
+    hedge = asyncio.ensure_future((hedge_call or call)())
+    pending = {primary, hedge}
+    error = None
+    try:
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    return task.result(), task is hedge
+                error = task.exception()
+        raise error
+    finally:
+        for task in pending:
+            task.cancel()
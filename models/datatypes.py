@@ -1,5 +1,6 @@
 from dataclasses import dataclass, asdict
-from typing import List
+from pathlib import Path
+from typing import List, Tuple
 
 
 @dataclass
@@ -14,6 +15,10 @@ class CodeRegion:
     code: str
     explanation: str = None  # Optional explanation for the code region
     answer: str = None  # Optional answer for the code region, if applicable
+    code_after: str = None  # Optional post-change code of the region, stored so reflection can run offline
+    error: str = None  # Set instead of an explanation when the LLM call failed
+    context_before: int = None  # Added context lines before the change, trimmable when over the token budget
+    context_after: int = None  # Added context lines after the change
 
 @dataclass 
 class CodeRegionReflection:
@@ -22,6 +27,7 @@ class CodeRegionReflection:
     code_after: str
     original_explanation: str
     reflection_response: str
+    error: str = None  # Set instead of a reflection response when the LLM call failed
 
 @dataclass
 class PromptRow:
@@ -39,12 +45,22 @@ class ManualPromptRow:
     extra: str
     answer: str
 
+@dataclass
+class PreparedIssue:
+    repo: str
+    issue_no: int
+    topic: str
+    summary: str
+    code_regions: List[Tuple[CodeRegion, CodeRegion]]  # (pre, post) region pairs
+    extra: dict
+
 @dataclass
 class PromptResponse:
     repo: str
     issue_no: int
     topic: str
     code_regions: List[CodeRegion]
+    row_index: int = None  # Input row of manual runs, whose CSV can repeat an issue
     
     def __getitem__(self, key):
         return asdict(self)[key]
@@ -61,4 +77,20 @@ class ReflectionResponse:
     # code_before: str
     # code_after: str
     # original_explanation: str
-    # reflection_response: str
\ No newline at end of file
+    # reflection_response: str
+
+@dataclass
+class ChangedFile:
+    filename: str
+    status: str  # added, modified, removed or renamed, as reported by GitHub
+    patch: str = None  # Hunks of the unified diff, starting at the first "@@" header
+
+@dataclass
+class ExperimentVariant:
+    name: str
+    output_path: Path
+    extra_info: dict = None  # Merged into each issue's extra context (README etc.)
+    instructions: str = None  # Falls back to the flow's FIXED_INSTRUCTIONS
+    model: str = "gpt-4o"
+    temperature: float = 0.2
+    include_row_extra: bool = False  # Manual experiments only: add each row's own extra context
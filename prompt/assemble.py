@@ -1,5 +1,167 @@
 from models.datatypes import CodeRegion
+from prompt.tokens import TokenCounter, get_token_counter
+from utils.logger import logger
 import json
+import os
+
+DEFAULT_TOKEN_BUDGET = int(os.getenv("PROMPT_TOKEN_BUDGET", "8000"))
+
+
+def _serialize(prompt_dict: dict) -> str:
+    # Compact separators and raw unicode keep the prompt free of whitespace-only tokens
+    return json.dumps(prompt_dict, separators=(",", ":"), ensure_ascii=False)
+
+
+def _truncate_lines(text: str, keep: int) -> str:
+    return "\n".join(text.splitlines()[:keep])
+
+
+def _trim_code_context(code: str, before: int, after: int) -> str:
+    lines = code.splitlines()
+    if len(lines) <= before + after:
+        return code
+    return "\n".join(lines[before:len(lines) - after])
+
+
+def _fit_prompt_dict(
+    topic_name: str,
+    summary: str,
+    code_region: CodeRegion,
+    extra: dict,
+    instructions: str,
+    token_budget: int | None = DEFAULT_TOKEN_BUDGET,
+    count_tokens: TokenCounter | None = None,
+    context_lines: int = 3
+) -> tuple[dict, int]:
+    """
+    Assemble the explanation prompt fields and trim them to fit `token_budget`.
+
+    Trimming happens in priority order until the prompt fits: README lines from the end,
+    then other extra notes from the end, then up to `context_lines` lines from both ends
+    of the code region. A region's `context_before`/`context_after` cap how much is trimmed
+    from each end, so regions at a file edge never lose changed lines; regions without
+    them are assumed to carry `context_lines` on both sides.
+
+    Returns:
+        tuple[dict, int]: The prompt fields and the token count of their serialization.
+    """
+    count_tokens = count_tokens or get_token_counter()
+    extra = dict(extra)
+    prompt_dict = {
+        "topic": topic_name,
+        "summary": summary,
+        "code_context": code_region.code,
+        "extra_info": extra,
+        "instructions": instructions
+    }
+
+    def render() -> tuple[str, int]:
+        prompt = _serialize(prompt_dict)
+        return prompt, count_tokens(prompt)
+
+    prompt, tokens = render()
+    if token_budget is None or tokens <= token_budget:
+        return prompt_dict, tokens
+
+    trim_keys = sorted((k for k, v in extra.items() if isinstance(v, str)), key=lambda k: k != "readme")
+    for key in trim_keys:
+        original = extra[key]
+        # Binary search for the most lines of this field that still fit
+        low, high = 0, len(original.splitlines())
+        while low < high:
+            keep = (low + high + 1) // 2
+            extra[key] = _truncate_lines(original, keep)
+            if render()[1] <= token_budget:
+                low = keep
+            else:
+                high = keep - 1
+        extra[key] = _truncate_lines(original, low)
+        prompt, tokens = render()
+        if tokens <= token_budget:
+            return prompt_dict, tokens
+
+    before = code_region.context_before if code_region.context_before is not None else context_lines
+    after = code_region.context_after if code_region.context_after is not None else context_lines
+    for trim in range(1, context_lines + 1):
+        prompt_dict["code_context"] = _trim_code_context(code_region.code, min(trim, before), min(trim, after))
+        prompt, tokens = render()
+        if tokens <= token_budget:
+            break
+
+    return prompt_dict, tokens
+
+
+def fit_explanation_prompt(
+    topic_name: str,
+    summary: str,
+    code_region: CodeRegion,
+    extra: dict,
+    instructions: str,
+    token_budget: int | None = DEFAULT_TOKEN_BUDGET,
+    count_tokens: TokenCounter | None = None,
+    context_lines: int = 3
+) -> tuple[str, int]:
+    """
+    Assemble an explanation prompt and trim it to fit `token_budget`.
+
+    Returns:
+        tuple[str, int]: The prompt and its token count.
+    """
+    prompt_dict, tokens = _fit_prompt_dict(topic_name, summary, code_region, extra, instructions, token_budget, count_tokens, context_lines)
+    return _serialize(prompt_dict), tokens
+
+
+def fit_shared_extra(
+    topic_name: str,
+    summary: str,
+    code_regions: list[CodeRegion],
+    extra: dict,
+    instructions: str,
+    token_budget: int | None = DEFAULT_TOKEN_BUDGET,
+    count_tokens: TokenCounter | None = None
+) -> dict:
+    """
+    Trim `extra` once for all regions of an issue, against the largest region, so every
+    region's prompt shares the same README and notes (and so the same cacheable prefix).
+    """
+    if not code_regions:
+        return extra
+    largest = max(code_regions, key=lambda region: len(region.code))
+    prompt_dict, _ = _fit_prompt_dict(topic_name, summary, largest, extra, instructions, token_budget, count_tokens)
+    return prompt_dict["extra_info"]
+
+
+def build_explanation_messages(
+    topic_name: str,
+    summary: str,
+    code_region: CodeRegion,
+    extra: dict,
+    instructions: str,
+    token_budget: int | None = DEFAULT_TOKEN_BUDGET,
+    count_tokens: TokenCounter | None = None
+) -> list[dict]:
+    """
+    Assemble explanation messages with the issue-invariant material first.
+
+    The instructions (system) and the topic, summary and extra info (first user message)
+    are identical for every region of an issue, so they form a stable prefix that
+    provider-side prompt caching can reuse. Only the final user message with the
+    code context changes between regions.
+
+    Returns:
+        list[dict]: Messages in Chat format.
+    """
+    prompt_dict, tokens = _fit_prompt_dict(topic_name, summary, code_region, extra, instructions, token_budget, count_tokens)
+    logger.debug(f"Explanation messages for {code_region.filename}: {tokens} tokens.")
+    return [
+        {"role": "system", "content": prompt_dict["instructions"]},
+        {"role": "user", "content": _serialize({
+            "topic": prompt_dict["topic"],
+            "summary": prompt_dict["summary"],
+            "extra_info": prompt_dict["extra_info"]
+        })},
+        {"role": "user", "content": _serialize({"code_context": prompt_dict["code_context"]})}
+    ]
 
 
 def build_explanation_prompt(
@@ -7,7 +169,9 @@ def build_explanation_prompt(
     summary: str,
     code_region: CodeRegion,
     extra: dict,
-    instructions: str
+    instructions: str,
+    token_budget: int | None = DEFAULT_TOKEN_BUDGET,
+    count_tokens: TokenCounter | None = None
 ) -> str:
     """
     Assemble a prompt for the LLM to explain code changes.
@@ -18,21 +182,65 @@ def build_explanation_prompt(
         code_region [CodeRegion]: Code context before changes.
         extra (dict): Optional metadata like commits, README, etc.
         instructions (str): Instruction string for the LLM.
+        token_budget (int | None): Maximum prompt tokens; None disables trimming.
+        count_tokens (TokenCounter | None): Token counting function (defaults to tiktoken or a heuristic).
 
     Returns:
         str: Formatted prompt string to send to the LLM.
     """
+    prompt, tokens = fit_explanation_prompt(topic_name, summary, code_region, extra, instructions, token_budget, count_tokens)
+    if token_budget is not None and tokens > token_budget:
+        logger.warning(f"Explanation prompt for {code_region.filename} is {tokens} tokens, over the budget of {token_budget}.")
+    else:
+        logger.debug(f"Explanation prompt for {code_region.filename}: {tokens} tokens.")
+    return prompt
+
+
+MULTI_REGION_FORMAT = (
+    "Several code regions are provided, each with an index. Answer for every region "
+    "following the format above, and respond with a JSON object of the form "
+    '{"regions": [{"index": <region index>, "explanation": "<your answer for that region>"}]} '
+    "containing exactly one entry per region."
+)
 
-    prompt_dict = {
-        "topic": topic_name,
-        "summary": summary,
-        "code_context": code_region.code,
-        "extra_info": extra,
-        "instructions": instructions
-    }
 
-    # You can return raw string or json.dumps(prompt_dict, indent=2)
-    return json.dumps(prompt_dict, indent=2)
+def build_multi_region_messages(
+    topic_name: str,
+    summary: str,
+    code_regions: list[CodeRegion],
+    extra: dict,
+    instructions: str,
+    token_budget: int | None = DEFAULT_TOKEN_BUDGET,
+    count_tokens: TokenCounter | None = None
+) -> list[dict]:
+    """
+    Assemble one set of messages asking for an explanation of every code region of an issue.
+
+    The system and first user messages are the same as in `build_explanation_messages`, so
+    the per-region calls of a fallback reuse the cached prefix, as long as the combined regions
+    do not force `extra` to be trimmed further. The regions follow, listed by index, and the
+    JSON answer format comes last.
+
+    Returns:
+        list[dict]: Messages in Chat format.
+    """
+    combined = CodeRegion(filename="", code="\n".join(region.code for region in code_regions))
+    # The format instruction is counted against the budget but kept out of the shared prefix
+    prompt_dict, tokens = _fit_prompt_dict(topic_name, summary, combined, extra, instructions + "\n\n" + MULTI_REGION_FORMAT, token_budget, count_tokens, context_lines=0)
+    logger.debug(f"Multi-region explanation messages for {len(code_regions)} regions: {tokens} tokens.")
+    return [
+        {"role": "system", "content": instructions},
+        {"role": "user", "content": _serialize({
+            "topic": prompt_dict["topic"],
+            "summary": prompt_dict["summary"],
+            "extra_info": prompt_dict["extra_info"]
+        })},
+        {"role": "user", "content": _serialize({"code_regions": [
+            {"index": i, "filename": region.filename, "code_context": region.code}
+            for i, region in enumerate(code_regions)
+        ]})},
+        {"role": "user", "content": MULTI_REGION_FORMAT}
+    ]
 
 
 def build_reflection_prompt(original_explanation: str, code_region: str, post_commit_code: str) -> list[dict]:
@@ -0,0 +1,30 @@
+from functools import lru_cache
+from typing import Callable
+
+try:
+    import tiktoken
+except ImportError:  # Fall back to a character heuristic when tiktoken is unavailable
+    tiktoken = None
+
+TokenCounter = Callable[[str], int]
+
+
+def heuristic_token_count(text: str) -> int:
+    """
+    Rough token estimate of ~4 characters per token.
+    """
+    return (len(text) + 3) // 4
+
+
+@lru_cache(maxsize=None)
+def get_token_counter(model: str = "gpt-4o") -> TokenCounter:
+    """
+    Return a token counting function for `model`, using tiktoken when it is installed.
+    """
+    if tiktoken is None:
+        return heuristic_token_count
+    try:
+        encoding = tiktoken.encoding_for_model(model)
+    except KeyError:
+        encoding = tiktoken.get_encoding("o200k_base")
+    return lambda text: len(encoding.encode(text, disallowed_special=()))
@@ -0,0 +1,67 @@
+import json
+from models.datatypes import CodeRegion
+from prompt.assemble import build_explanation_prompt, build_explanation_messages, build_multi_region_messages, fit_explanation_prompt, fit_shared_extra
+from prompt.tokens import heuristic_token_count
+
+CODE = CodeRegion(filename="app.py", code="\n".join(f"line {i}" for i in range(9)))
+README = "\n".join(f"readme line {i} with some words" for i in range(200))
+
+
+def test_prompt_is_compact_json():
+    prompt = build_explanation_prompt("topic", "summary", CODE, {"readme": "hello"}, "explain", count_tokens=heuristic_token_count)
+    assert json.loads(prompt)["extra_info"] == {"readme": "hello"}
+    assert "\n  " not in prompt
+
+
+def test_readme_is_trimmed_before_notes_and_code():
+    extra = {"readme": README, "notes": "keep these notes"}
+    prompt, tokens = fit_explanation_prompt("topic", "summary", CODE, extra, "explain", token_budget=400, count_tokens=heuristic_token_count)
+    data = json.loads(prompt)
+
+    assert tokens <= 400
+    assert 0 < len(data["extra_info"]["readme"].splitlines()) < 200
+    assert data["extra_info"]["notes"] == "keep these notes"
+    assert data["code_context"] == CODE.code
+    assert extra["readme"] == README  # Caller's dict is untouched
+
+
+def test_code_context_is_trimmed_last():
+    prompt, tokens = fit_explanation_prompt("topic", "summary", CODE, {"readme": README}, "explain", token_budget=40, count_tokens=heuristic_token_count)
+    data = json.loads(prompt)
+
+    assert data["extra_info"]["readme"] == ""
+    assert data["code_context"].splitlines()[0] != "line 0"
+
+
+def test_code_trimming_respects_context_bounds():
+    # A region at the start of the file: its first line is already part of the change
+    region = CodeRegion(filename="app.py", code=CODE.code, context_before=0, context_after=3)
+    prompt, _ = fit_explanation_prompt("topic", "summary", region, {"readme": README}, "explain", token_budget=40, count_tokens=heuristic_token_count)
+    lines = json.loads(prompt)["code_context"].splitlines()
+
+    assert lines[0] == "line 0"
+    assert lines[-1] != "line 8"
+
+
+def test_messages_share_prefix_across_regions():
+    regions = [CODE, CodeRegion(filename="other.py", code="x = 1")]
+    extra = fit_shared_extra("topic", "summary", regions, {"readme": README}, "explain", token_budget=400, count_tokens=heuristic_token_count)
+    first, second = (
+        build_explanation_messages("topic", "summary", region, extra, "explain", token_budget=400, count_tokens=heuristic_token_count)
+        for region in regions
+    )
+
+    assert first[:2] == second[:2]
+    assert first[0] == {"role": "system", "content": "explain"}
+    assert json.loads(first[2]["content"]) == {"code_context": CODE.code}
+
+
+def test_multi_region_messages_share_prefix_and_index_regions():
+    other = CodeRegion(filename="lib.py", code="x = 1")
+    single = build_explanation_messages("topic", "summary", CODE, {"readme": "hello"}, "explain", count_tokens=heuristic_token_count)
+    multi = build_multi_region_messages("topic", "summary", [CODE, other], {"readme": "hello"}, "explain", count_tokens=heuristic_token_count)
+
+    assert multi[:2] == single[:2]
+    assert "JSON" in multi[-1]["content"]
+    regions = json.loads(multi[2]["content"])["code_regions"]
+    assert [(r["index"], r["filename"]) for r in regions] == [(0, "app.py"), (1, "lib.py")]
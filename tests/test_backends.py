@@ -0,0 +1,36 @@
+from github_api.backends import parse_git_diff
+
+GIT_DIFF = """diff --git a/src/app.py b/src/app.py
+index 1111111..2222222 100644
+--- a/src/app.py
++++ b/src/app.py
+@@ -1,3 +1,3 @@
+ import os
+-print("old")
++print("new")
+ x = 1
+diff --git a/docs/removed.md b/docs/removed.md
+deleted file mode 100644
+index 3333333..0000000
+--- a/docs/removed.md
++++ /dev/null
+@@ -1 +0,0 @@
+-gone
+diff --git a/old_name.py b/new_name.py
+similarity index 90%
+rename from old_name.py
+rename to new_name.py
+"""
+
+
+def test_parse_git_diff_splits_files():
+    files = parse_git_diff(GIT_DIFF)
+
+    assert [(f.filename, f.status) for f in files] == [
+        ("src/app.py", "modified"),
+        ("docs/removed.md", "removed"),
+        ("new_name.py", "renamed"),
+    ]
+    assert files[0].patch.startswith("@@ -1,3 +1,3 @@")
+    assert files[0].patch.endswith(" x = 1")
+    assert files[2].patch is None
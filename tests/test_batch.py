@@ -0,0 +1,119 @@
+import json
+from types import SimpleNamespace
+
+import llm.batch as batch
+from llm.batch import make_custom_id, parse_custom_id, run_batch
+from llm.response_cache import ResponseCache
+from utils.metrics import get_metrics, reset_metrics
+
+
+class StubBatchClient:
+    """
+    Emulates the OpenAI file and batch endpoints: every request is answered by echoing its prompt.
+    """
+
+    def __init__(self):
+        self.uploaded = {}
+        self.batches_created = []
+        self.retrievals = {}
+        self.files = SimpleNamespace(create=self._create_file, content=self._file_content)
+        self.batches = SimpleNamespace(create=self._create_batch, retrieve=self._retrieve_batch)
+
+    def _create_file(self, file, purpose):
+        file_id = f"file-{len(self.uploaded)}"
+        self.uploaded[file_id] = file.read().decode()
+        return SimpleNamespace(id=file_id)
+
+    def _create_batch(self, input_file_id, endpoint, completion_window):
+        lines = []
+        for line in self.uploaded[input_file_id].splitlines():
+            request = json.loads(line)
+            content = f"explained: {request['body']['messages'][0]['content']}"
+            lines.append(json.dumps({
+                "custom_id": request["custom_id"],
+                "response": {"status_code": 200, "body": {
+                    "choices": [{"message": {"content": content}}],
+                    "usage": {"prompt_tokens": 8, "completion_tokens": 2, "total_tokens": 10},
+                }},
+                "error": None,
+            }))
+        batch_id = f"batch-{len(self.batches_created)}"
+        self.batches_created.append(batch_id)
+        self.uploaded[f"{batch_id}-output"] = "\n".join(lines)
+        return SimpleNamespace(id=batch_id)
+
+    def _retrieve_batch(self, batch_id):
+        self.retrievals[batch_id] = self.retrievals.get(batch_id, 0) + 1
+        status = "completed" if self.retrievals[batch_id] > 1 else "in_progress"
+        return SimpleNamespace(id=batch_id, status=status, output_file_id=f"{batch_id}-output")
+
+    def _file_content(self, file_id):
+        return SimpleNamespace(text=self.uploaded[file_id])
+
+
+def test_custom_id_round_trip():
+    custom_id = make_custom_id("owner/repo", 42, 3)
+    assert parse_custom_id(custom_id) == ("owner/repo", 42, 3)
+
+
+def test_run_batch_against_stub(tmp_path, monkeypatch):
+    monkeypatch.setattr(batch, "get_response_cache", lambda: ResponseCache(tmp_path / "llm.sqlite"))
+    requests = [
+        (make_custom_id("owner/repo", 1, i), [{"role": "user", "content": f"prompt {i}"}])
+        for i in range(3)
+    ]
+
+    results = run_batch(requests, tmp_path / "batch_input.jsonl", client=StubBatchClient(), poll_interval=0)
+
+    assert results == {custom_id: f"explained: prompt {i}" for i, (custom_id, _) in enumerate(requests)}
+    assert len((tmp_path / "batch_input.jsonl").read_text().splitlines()) == 3
+
+
+def test_run_batch_records_batch_usage(tmp_path, monkeypatch):
+    monkeypatch.setattr(batch, "get_response_cache", lambda: ResponseCache(tmp_path / "llm.sqlite"))
+    reset_metrics()
+    requests = [(make_custom_id("owner/repo", 1, i), [{"role": "user", "content": f"prompt {i}"}]) for i in range(3)]
+
+    run_batch(requests, tmp_path / "batch_input.jsonl", client=StubBatchClient(), poll_interval=0)
+
+    assert get_metrics().tokens["batch:gpt-4o"] == {"calls": 3, "prompt": 24, "completion": 6, "cached": 0}
+    assert get_metrics().cost() > 0
+
+
+def test_run_batch_splits_requests_over_batch_limits(tmp_path, monkeypatch):
+    monkeypatch.setattr(batch, "get_response_cache", lambda: ResponseCache(tmp_path / "llm.sqlite"))
+    requests = [
+        (make_custom_id("owner/repo", 1, i), [{"role": "user", "content": f"prompt {i}"}])
+        for i in range(5)
+    ]
+    client = StubBatchClient()
+
+    results = run_batch(requests, tmp_path / "batch_input.jsonl", client=client, poll_interval=0, max_requests=2)
+
+    assert client.batches_created == ["batch-0", "batch-1", "batch-2"]
+    assert results == {custom_id: f"explained: prompt {i}" for i, (custom_id, _) in enumerate(requests)}
+    assert [len((tmp_path / f"batch_input.{i}.jsonl").read_text().splitlines()) for i in range(3)] == [2, 2, 1]
+
+
+def test_chunk_requests_respects_byte_limit():
+    requests = [(make_custom_id("owner/repo", 1, i), [{"role": "user", "content": "x" * 100}]) for i in range(4)]
+    line_size = len(batch.batch_line(*requests[0]).encode())
+
+    chunks = batch.chunk_requests(requests, max_bytes=line_size * 2)
+
+    assert [len(chunk) for chunk in chunks] == [2, 2]
+
+
+def test_run_batch_replay_miss_is_left_out(tmp_path, monkeypatch):
+    cache = ResponseCache(tmp_path / "llm.sqlite")
+    monkeypatch.setattr(batch, "get_response_cache", lambda: cache)
+    requests = [
+        (make_custom_id("owner/repo", 1, i), [{"role": "user", "content": f"prompt {i}"}])
+        for i in range(2)
+    ]
+    run_batch(requests[:1], tmp_path / "batch_input.jsonl", client=StubBatchClient(), poll_interval=0)
+    cache.mode = "replay"
+
+    results = run_batch(requests, tmp_path / "batch_input.jsonl", client=None, poll_interval=0)
+
+    assert results == {requests[0][0]: "explained: prompt 0"}
@@ -0,0 +1,65 @@
+import json
+from utils.checkpoint import SKIP_NO_PR, close_skipped, load_completed, load_completed_rows, record_skipped, repair_jsonl, skipped_path
+
+
+def test_load_completed_truncates_partial_line(tmp_path):
+    output = tmp_path / "explanations.jsonl"
+    complete = json.dumps({"repo": "owner/repo", "issue_no": 1, "topic": "t", "code_regions": []}) + "\n"
+    output.write_text(complete + '{"repo": "owner/repo", "issue_no": 2, "top')
+
+    assert load_completed(output) == {("owner/repo", 1)}
+    assert output.read_text() == complete
+
+
+def test_repair_jsonl_drops_corrupt_last_line(tmp_path):
+    output = tmp_path / "explanations.jsonl"
+    complete = json.dumps({"repo": "owner/repo", "issue_no": 1}) + "\n"
+    output.write_text(complete + '{"repo": "owner/re\n')
+
+    assert repair_jsonl(output) > 0
+    assert output.read_text() == complete
+
+
+def test_load_completed_missing_file(tmp_path):
+    assert load_completed(tmp_path / "missing.jsonl") == set()
+
+
+def test_load_completed_retries_errored_records(tmp_path):
+    output = tmp_path / "explanations.jsonl"
+    failed = {"filename": "a.py", "code": "x", "explanation": None, "error": "llm_call_failed"}
+    explained = {"filename": "a.py", "code": "x", "explanation": "Because", "error": None}
+    lines = [
+        {"repo": "owner/repo", "issue_no": 1, "topic": "t", "code_regions": [explained]},
+        {"repo": "owner/repo", "issue_no": 2, "topic": "t", "code_regions": [explained, failed]},
+        {"repo": "owner/repo", "issue_no": 3, "topic": "t", "code_regions": [failed]},
+        # Issue 3 succeeded on a later resume
+        {"repo": "owner/repo", "issue_no": 3, "topic": "t", "code_regions": [explained]},
+    ]
+    output.write_text("".join(json.dumps(line) + "\n" for line in lines))
+
+    assert load_completed(output) == {("owner/repo", 1), ("owner/repo", 3)}
+
+
+def test_load_completed_includes_skipped_issues(tmp_path):
+    output = tmp_path / "explanations.jsonl"
+    output.write_text(json.dumps({"repo": "owner/repo", "issue_no": 1, "topic": "t", "code_regions": []}) + "\n")
+
+    record_skipped(output, "owner/repo", 2, SKIP_NO_PR)
+    close_skipped(output)
+
+    assert skipped_path(output).name == "explanations.jsonl.skipped"
+    assert load_completed(output) == {("owner/repo", 1), ("owner/repo", 2)}
+
+
+def test_load_completed_rows_keys_on_row_index(tmp_path):
+    output = tmp_path / "base_output.jsonl"
+    region = {"filename": "u", "code": "x", "explanation": "Because", "error": None}
+    failed = {**region, "explanation": None, "error": "llm_call_failed"}
+    records = [
+        {"repo": "owner/repo", "issue_no": 1, "topic": "t", "code_regions": [region], "row_index": 0},
+        {"repo": "owner/repo", "issue_no": 1, "topic": "t", "code_regions": [failed], "row_index": 2},
+        {"repo": "owner/repo", "issue_no": 3, "topic": "t", "code_regions": [region]},
+    ]
+    output.write_text("".join(json.dumps(record) + "\n" for record in records))
+
+    assert load_completed_rows(output) == {0}
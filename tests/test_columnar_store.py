@@ -0,0 +1,55 @@
+import pytest
+
+pytest.importorskip("pyarrow")
+
+import pyarrow.compute as pc
+
+from models.datatypes import CodeRegion, PromptResponse
+from utils.columnar_store import ColumnarWriter, read_regions
+
+
+def make_response(repo: str, issue_no: int) -> PromptResponse:
+    return PromptResponse(
+        repo=repo,
+        issue_no=issue_no,
+        topic="1: Topic",
+        code_regions=[
+            CodeRegion(filename="a.py", code="x = 1", explanation="First"),
+            CodeRegion(filename="b.py", code="y = 2", explanation=None, error="llm_call_failed"),
+        ]
+    )
+
+
+def test_round_trip(tmp_path):
+    with ColumnarWriter(tmp_path, row_group_size=2) as writer:
+        writer.write(make_response("owner/repo", 1))
+        writer.write(make_response("owner/other", 2))
+
+    table = read_regions(tmp_path)
+    assert table.num_rows == 4
+    rows = table.to_pylist()
+    assert rows[0]["repo"] == "owner/repo"
+    assert rows[0]["explanation"] == "First"
+    assert rows[1]["error"] == "llm_call_failed"
+
+
+def test_filter_and_columns_are_pushed_down(tmp_path):
+    with ColumnarWriter(tmp_path) as writer:
+        for issue_no in range(5):
+            writer.write(make_response("owner/repo", issue_no))
+
+    table = read_regions(tmp_path, columns=["issue_no", "filename"], filter=pc.field("issue_no") >= 3)
+    assert table.column_names == ["issue_no", "filename"]
+    assert sorted(set(table.column("issue_no").to_pylist())) == [3, 4]
+
+
+def test_unfinished_part_is_not_read(tmp_path):
+    with ColumnarWriter(tmp_path) as writer:
+        writer.write(make_response("owner/repo", 1))
+
+    # A writer whose run died before close leaves only a hidden temporary file
+    unfinished = ColumnarWriter(tmp_path)
+    unfinished.write(make_response("owner/repo", 2))
+    unfinished._writer.close()
+
+    assert read_regions(tmp_path).num_rows == 2
@@ -0,0 +1,41 @@
+import time
+import random
+from utils.concurrency import bounded_map, run_pipeline, Stage
+
+
+def _slow_square(x: int) -> int:
+    time.sleep(random.uniform(0, 0.01))
+    return x * x
+
+
+def test_bounded_map_ordered():
+    results = list(bounded_map(_slow_square, range(50), max_workers=8, ordered=True))
+    assert results == [x * x for x in range(50)]
+
+
+def test_bounded_map_unordered_returns_every_result():
+    results = list(bounded_map(_slow_square, iter(range(50)), max_workers=8))
+    assert sorted(results) == [x * x for x in range(50)]
+
+
+def test_bounded_map_sequential():
+    assert list(bounded_map(_slow_square, [1, 2, 3])) == [1, 4, 9]
+
+
+def test_pipeline_runs_every_stage_and_drops_failures():
+    written = []
+
+    def halve(x: int) -> int:
+        if x == 36:
+            raise ValueError("bad item")
+        return x // 2 if x % 2 == 0 else None
+
+    stages = [
+        Stage("square", _slow_square, workers=4),
+        Stage("halve", halve, workers=2, on_output=written.append),
+    ]
+    results = list(run_pipeline(range(20), stages, queue_size=2))
+
+    expected = sorted(x * x // 2 for x in range(0, 20, 2) if x != 6)
+    assert sorted(results) == expected
+    assert sorted(written) == expected
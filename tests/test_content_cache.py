@@ -0,0 +1,32 @@
+from github_api.content_cache import ContentCache
+
+
+def test_content_cache_hit_and_miss(tmp_path):
+    cache = ContentCache(tmp_path / "cache.sqlite")
+
+    assert cache.get("owner/repo", "src/app.py", "abc123") is None
+    cache.put("owner/repo", "src/app.py", "abc123", "print('hello')\n")
+    assert cache.get("owner/repo", "src/app.py", "abc123") == "print('hello')\n"
+    assert cache.get("owner/repo", "src/app.py", "def456") is None
+
+    stats = cache.stats()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 2
+
+
+def test_content_cache_persists(tmp_path):
+    ContentCache(tmp_path / "cache.sqlite").put("owner/repo", "a.py", "sha", "x = 1")
+    assert ContentCache(tmp_path / "cache.sqlite").get("owner/repo", "a.py", "sha") == "x = 1"
+
+
+def test_content_cache_evicts_least_recently_used(tmp_path):
+    cache = ContentCache(tmp_path / "cache.sqlite", max_bytes=250, compress=False)
+    cache.put("owner/repo", "a.py", "sha", "a" * 100)
+    cache.put("owner/repo", "b.py", "sha", "b" * 100)
+    cache.get("owner/repo", "a.py", "sha")  # a.py is now more recent than b.py
+    cache.put("owner/repo", "c.py", "sha", "c" * 100)
+
+    assert cache.get("owner/repo", "b.py", "sha") is None
+    assert cache.get("owner/repo", "a.py", "sha") == "a" * 100
+    assert cache.get("owner/repo", "c.py", "sha") == "c" * 100
+    assert cache.stats()["stored_bytes"] <= 250
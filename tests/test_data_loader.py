@@ -0,0 +1,55 @@
+import pytest
+
+pytest.importorskip("pandas")
+pa = pytest.importorskip("pyarrow")
+
+import pyarrow.feather as feather
+
+from models.datatypes import ManualPromptRow, PromptRow
+from utils.data_loader import count_issue_repos, iter_issue_rows, iter_manual_rows
+
+
+@pytest.fixture
+def issues_path(tmp_path):
+    path = tmp_path / "issues.feather"
+    table = pa.table({
+        "repo": ["owner_repo", "owner_repo", "owner_repo", "other_lib", "other_lib"],
+        "issue_no": [1, 1, 2, 3, 4],
+        "summary": ["first", "first, chunk 1", "unclassified", "third", "fourth"],
+        "bertopic": [5, 5, -1, 7, 7],
+        "chunk": [0, 1, 0, 0, 0],
+        "body": ["unused"] * 5,
+    })
+    feather.write_feather(table, path)
+    return path
+
+
+def test_iter_issue_rows_filters_and_streams_in_batches(issues_path):
+    rows = list(iter_issue_rows(issues_path, batch_size=1))
+
+    assert rows == [
+        PromptRow(repo="owner/repo", issue_no=1, summary="first", bertopic=5),
+        PromptRow(repo="other/lib", issue_no=3, summary="third", bertopic=7),
+        PromptRow(repo="other/lib", issue_no=4, summary="fourth", bertopic=7),
+    ]
+
+
+def test_count_issue_repos(issues_path):
+    assert count_issue_repos(issues_path) == {"owner/repo": 1, "other/lib": 2}
+
+
+def test_iter_manual_rows_reads_in_chunks(tmp_path):
+    path = tmp_path / "manual.csv"
+    path.write_text(
+        "url,summary,topic,code,extra,answer,ignored\n"
+        "https://github.com/owner/repo/issues/1,s1,t1,c1,e1,a1,x\n"
+        "https://github.com/owner/repo/issues/2,s2,t2,c2,e2,a2,x\n"
+        "https://github.com/owner/repo/issues/3,s3,t3,c3,e3,a3,x\n"
+    )
+
+    rows = list(iter_manual_rows(path, chunksize=2))
+
+    assert len(rows) == 3
+    assert rows[2] == ManualPromptRow(
+        url="https://github.com/owner/repo/issues/3", summary="s3", topic="t3", code="c3", extra="e3", answer="a3"
+    )
@@ -0,0 +1,50 @@
+from pathlib import Path
+
+import pytest
+
+pytest.importorskip("prefect")
+
+import flows.experiment_flow as experiment_flow
+from models.datatypes import CodeRegion, ExperimentVariant, PreparedIssue, PromptResponse
+
+
+def make_issue() -> PreparedIssue:
+    region = CodeRegion(filename="a.py", code="x = 1")
+    return PreparedIssue(
+        repo="owner/repo",
+        issue_no=1,
+        topic="1: Topic",
+        summary="Summary",
+        code_regions=[(region, region)],
+        extra={"readme": "README"}
+    )
+
+
+def test_variant_issue_merges_extra_info():
+    issue = make_issue()
+    variant = ExperimentVariant(name="augmented", output_path=Path("out.jsonl"), extra_info={"notes": "Notes"})
+
+    assert experiment_flow.variant_issue(issue, variant).extra == {"readme": "README", "notes": "Notes"}
+    assert issue.extra == {"readme": "README"}
+
+
+def test_explain_variants_shares_prepared_issue(monkeypatch):
+    calls = []
+
+    def fake_explain_issue(issue, multi_region, instructions, model, temperature):
+        calls.append((issue.extra, model, temperature))
+        return PromptResponse(repo=issue.repo, issue_no=issue.issue_no, topic=issue.topic, code_regions=[])
+
+    monkeypatch.setattr(experiment_flow, "explain_issue", fake_explain_issue)
+    variants = [
+        ExperimentVariant(name="base", output_path=Path("base.jsonl")),
+        ExperimentVariant(name="mini", output_path=Path("mini.jsonl"), model="gpt-4o-mini", temperature=0.0),
+    ]
+
+    responses = experiment_flow.explain_variants(make_issue(), variants)
+
+    assert [variant.name for variant, _ in responses] == ["base", "mini"]
+    assert sorted(calls, key=lambda call: call[1]) == [
+        ({"readme": "README"}, "gpt-4o", 0.2),
+        ({"readme": "README"}, "gpt-4o-mini", 0.0),
+    ]
@@ -0,0 +1,45 @@
+import subprocess
+
+import pytest
+
+pytest.importorskip("prefect")
+
+from github import UnknownObjectException
+
+import flows.explanation_flow as explanation_flow
+from github_api.fetch_diffs import CodeRegionLimitException
+from models.datatypes import PromptRow
+from utils.checkpoint import SKIP_NO_PR, SKIP_REGION_LIMIT
+
+
+class FailingBackend:
+    def __init__(self, error: Exception):
+        self.error = error
+
+    def get_code_regions_from_pr(self, repo_full_name, issue_no, context_lines=3):
+        raise self.error
+
+
+def prepare(error: Exception) -> list:
+    skipped = []
+    row = PromptRow(repo="owner/repo", issue_no=1, bertopic=0, summary="Summary")
+    issue = explanation_flow.prepare_issue(row, {0: "Topic"}, FailingBackend(error), on_skip=lambda *args: skipped.append(args))
+    assert issue is None
+    return skipped
+
+
+def test_prepare_issue_records_missing_pr():
+    assert prepare(UnknownObjectException(404, {"message": "Not Found"}, {})) == [("owner/repo", 1, SKIP_NO_PR)]
+
+
+def test_prepare_issue_records_region_limit():
+    assert prepare(CodeRegionLimitException("too many")) == [("owner/repo", 1, SKIP_REGION_LIMIT)]
+
+
+@pytest.mark.parametrize("error", [
+    ConnectionError("reset"),
+    TimeoutError("timed out"),
+    subprocess.CalledProcessError(128, ["git", "fetch"]),
+])
+def test_prepare_issue_leaves_transient_failures_for_retry(error):
+    assert prepare(error) == []
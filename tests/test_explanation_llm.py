@@ -0,0 +1,12 @@
+import json
+from llm.explanation_llm import parse_multi_region_explanations
+
+
+def test_multi_region_answers_are_ordered_by_index():
+    content = json.dumps({"regions": [{"index": 1, "explanation": "second"}, {"index": 0, "explanation": "first"}]})
+    assert parse_multi_region_explanations(content, 2) == ["first", "second"]
+
+
+def test_incomplete_multi_region_answer_is_rejected():
+    assert parse_multi_region_explanations(json.dumps({"regions": [{"index": 0, "explanation": "only"}]}), 2) is None
+    assert parse_multi_region_explanations("not json", 1) is None
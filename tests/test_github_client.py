@@ -0,0 +1,37 @@
+import time
+
+import pytest
+
+pytest.importorskip("github")
+requests = pytest.importorskip("requests")
+
+from github_api.client import retry_wait
+
+
+def make_response(status: int, headers: dict | None = None, body: str = "") -> requests.Response:
+    response = requests.Response()
+    response.status_code = status
+    response.headers.update(headers or {})
+    response._content = body.encode()
+    return response
+
+
+def test_permission_403_is_not_retried():
+    assert retry_wait(make_response(403, {"X-RateLimit-Remaining": "4000"}, '{"message": "Resource not accessible"}'), 0) is None
+    assert retry_wait(make_response(404), 0) is None
+
+
+def test_rate_limit_403_waits_for_reset():
+    reset = time.time() + 30
+    wait = retry_wait(make_response(403, {"X-RateLimit-Remaining": "0", "X-RateLimit-Reset": str(int(reset))}), 0)
+    assert 25 <= wait <= 32
+
+
+def test_secondary_limit_honours_retry_after():
+    response = make_response(403, {"Retry-After": "17"}, '{"message": "You have exceeded a secondary rate limit."}')
+    assert retry_wait(response, 3) == 17.0
+
+
+def test_server_errors_back_off():
+    assert retry_wait(make_response(502), 2) == 4.0
+    assert retry_wait(make_response(503), 10) == 60.0
@@ -0,0 +1,86 @@
+import json
+import threading
+
+import pytest
+
+from models.datatypes import CodeRegion, PromptResponse
+from utils.jsonl_sink import JsonlSink
+
+
+def test_concurrent_writers_produce_complete_lines(tmp_path):
+    path = tmp_path / "out" / "responses.jsonl"
+    sink = JsonlSink(path, flush_interval=0.01)
+
+    def worker(offset: int):
+        for i in range(50):
+            region = CodeRegion(filename="app.py", code="x = 1", explanation="é" * 10)
+            sink.write(PromptResponse(repo="owner/repo", issue_no=offset + i, topic="t", code_regions=[region]))
+
+    threads = [threading.Thread(target=worker, args=(n * 100,)) for n in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    sink.close()
+
+    records = [json.loads(line) for line in path.read_text().splitlines()]
+    assert len(records) == 200
+    assert len({r["issue_no"] for r in records}) == 200
+    assert records[0]["code_regions"][0]["explanation"] == "é" * 10
+
+
+def test_flush_makes_records_visible(tmp_path):
+    path = tmp_path / "responses.jsonl"
+    sink = JsonlSink(path, flush_interval=60)
+    sink.write({"repo": "owner/repo", "issue_no": 1})
+    sink.flush()
+    assert json.loads(path.read_text()) == {"repo": "owner/repo", "issue_no": 1}
+    sink.close()
+
+
+def test_encoding_does_not_depend_on_orjson(monkeypatch):
+    import utils.jsonl_sink as jsonl_sink
+    record = PromptResponse(repo="owner/repo", issue_no=1, topic="t", code_regions=[
+        CodeRegion(filename="app.py", code="if x:\n\treturn \"é\"", explanation=None)
+    ])
+    encoded = jsonl_sink.encode_record(record)
+    monkeypatch.setattr(jsonl_sink, "orjson", None)
+    assert jsonl_sink.encode_record(record) == encoded
+
+
+def test_unencodable_record_is_reported_to_caller(tmp_path):
+    sink = JsonlSink(tmp_path / "responses.jsonl")
+    with pytest.raises(TypeError):
+        sink.write({"repo": "owner/repo", "issue_no": object()})
+    sink.close()
+
+
+
+def test_unwritable_path_is_raised_from_write_and_close(tmp_path):
+    blocker = tmp_path / "out"
+    blocker.write_text("not a directory")
+    sink = JsonlSink(blocker / "responses.jsonl")
+    sink._thread.join()
+
+    with pytest.raises(OSError):
+        sink.write({"repo": "owner/repo", "issue_no": 1})
+    with pytest.raises(OSError):
+        sink.close()
+
+
+def test_failed_write_releases_flush(tmp_path, monkeypatch):
+    import utils.jsonl_sink as jsonl_sink
+
+    def full_disk(fd):
+        raise OSError(28, "No space left on device")
+
+    monkeypatch.setattr(jsonl_sink.os, "fsync", full_disk)
+    sink = JsonlSink(tmp_path / "responses.jsonl", flush_interval=0.05)
+    sink.write({"repo": "owner/repo", "issue_no": 1})
+
+    with pytest.raises(OSError):
+        sink.flush()
+    with pytest.raises(OSError):
+        sink.write({"repo": "owner/repo", "issue_no": 2})
+    with pytest.raises(OSError):
+        sink.close()
@@ -0,0 +1,52 @@
+import json
+
+import pytest
+
+pytest.importorskip("prefect")
+pytest.importorskip("pandas")
+
+from flows.manual_flow import iter_keyed_rows
+
+
+def test_malformed_urls_are_skipped(tmp_path):
+    data_path = tmp_path / "data.csv"
+    data_path.write_text(
+        "url,summary,topic,code,extra,answer\n"
+        "https://github.com/owner/repo/issues/1,s,t,c,e,a\n"
+        "not a url,s,t,c,e,a\n"
+        "https://github.com/owner/repo/issues/1,s,t,c,e,a\n"
+    )
+
+    keyed = [(index, key) for index, _, key in iter_keyed_rows(data_path)]
+
+    # Duplicate URLs keep distinct row indexes
+    assert keyed == [(0, ("owner/repo", 1)), (2, ("owner/repo", 1))]
+
+
+def test_resume_keys_duplicate_urls_on_row_index(tmp_path, monkeypatch):
+    import flows.manual_flow as manual_flow
+
+    data_path = tmp_path / "data.csv"
+    data_path.write_text(
+        "url,summary,topic,code,extra,answer\n"
+        "https://github.com/owner/repo/issues/1,s,t,first,e,a\n"
+        "https://github.com/owner/repo/issues/1,s,t,second,e,a\n"
+    )
+    output_path = tmp_path / "output.jsonl"
+    answers = {"first": "explained", "second": None}
+
+    def fake_generate(prompt, *args):
+        # Each row's code is in its prompt; the second row fails on the first run
+        return next(answer for code, answer in answers.items() if code in str(prompt))
+
+    monkeypatch.setattr(manual_flow, "generate_llm_explanation", fake_generate)
+    monkeypatch.setattr(manual_flow, "log_response_cache_stats", lambda: None)
+
+    manual_flow.manual_explanation_flow.fn(data_path, output_path)
+    answers["second"] = "explained later"
+    manual_flow.manual_explanation_flow.fn(data_path, output_path)
+
+    records = [json.loads(line) for line in output_path.read_text().splitlines()]
+    assert [(r["row_index"], r["code_regions"][0]["explanation"]) for r in records] == [
+        (0, "explained"), (1, None), (1, "explained later")
+    ]
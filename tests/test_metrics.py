@@ -0,0 +1,43 @@
+import json
+from types import SimpleNamespace
+from utils.metrics import RunMetrics, percentile, get_metrics, reset_metrics, span, log_run_report
+
+
+def test_percentile_nearest_rank():
+    values = [float(v) for v in range(1, 101)]
+    assert percentile(values, 50) == 50.0
+    assert percentile(values, 95) == 95.0
+    assert percentile([], 95) == 0.0
+
+
+def test_usage_and_cost_count_cached_prompt_tokens():
+    metrics = RunMetrics()
+    usage = SimpleNamespace(prompt_tokens=1_000_000, completion_tokens=100_000, prompt_tokens_details=SimpleNamespace(cached_tokens=400_000))
+    metrics.record_usage("gpt-4o", usage)
+
+    assert metrics.tokens["gpt-4o"] == {"calls": 1, "prompt": 1_000_000, "completion": 100_000, "cached": 400_000}
+    assert abs(metrics.cost() - (0.6 * 2.50 + 0.4 * 1.25 + 0.1 * 10.00)) < 1e-9
+
+
+def test_batch_usage_is_kept_apart_and_discounted():
+    metrics = RunMetrics()
+    usage = {"prompt_tokens": 1_000_000, "completion_tokens": 100_000, "prompt_tokens_details": {"cached_tokens": 0}}
+    metrics.record_usage("gpt-4o", usage, batch=True)
+
+    assert metrics.tokens["batch:gpt-4o"] == {"calls": 1, "prompt": 1_000_000, "completion": 100_000, "cached": 0}
+    assert "gpt-4o" not in metrics.tokens
+    assert abs(metrics.cost() - (2.50 + 0.1 * 10.00) * 0.5) < 1e-9
+
+
+def test_run_report_is_exported(tmp_path):
+    reset_metrics()
+    for _ in range(3):
+        with span("prepare"):
+            pass
+    get_metrics().record_rate_limit(4000, 5000, 0.0)
+    get_metrics().record_rate_limit(4500, 5000, 0.0)
+
+    report = log_run_report(tmp_path / "report.json")
+    assert report["stages"]["prepare"]["count"] == 3
+    assert report["github_rate_limit"]["min_remaining"] == 4000
+    assert json.loads((tmp_path / "report.json").read_text())["stages"]["prepare"]["count"] == 3
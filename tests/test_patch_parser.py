@@ -0,0 +1,85 @@
+from utils.patch_parser import LineIndex, parse_patch, parse_hunk_headers, region_spans, extract_region_pairs, extract_region_pairs_with_context, count_regions
+
+PRE_CODE = "\n".join(f"line {i}" for i in range(1, 41)) + "\n"
+POST_CODE = PRE_CODE.replace("line 5\n", "line 5 changed\n").replace("line 30\n", "")
+
+PATCH = """@@ -2,7 +2,7 @@ def f():
+ line 2
+ line 3
+ line 4
+-line 5
++line 5 changed
+ line 6
+ line 7
+ line 8
+@@ -27,7 +27,6 @@ def g():
+ line 27
+ line 28
+ line 29
+-line 30
+ line 31
+ line 32
+ line 33
+\\ No newline at end of file"""
+
+
+def test_parse_patch_hunks():
+    first, second = parse_patch(PATCH)
+
+    assert (first.old_start, first.old_length, first.new_start, first.new_length) == (1, 7, 1, 7)
+    assert first.removed == [4]
+    assert first.added == [4]
+    assert first.context == [1, 2, 3, 5, 6, 7]
+    assert second.removed == [29]
+    assert second.added == []
+
+    headers = parse_hunk_headers(PATCH)
+    assert [(h.old_start, h.old_length, h.new_start, h.new_length) for h in headers] == \
+        [(h.old_start, h.old_length, h.new_start, h.new_length) for h in (first, second)]
+
+
+def test_parse_patch_new_file():
+    (hunk,) = parse_patch("@@ -0,0 +1,2 @@\n+a\n+b")
+    assert (hunk.old_start, hunk.old_length, hunk.new_start, hunk.new_length) == (0, 0, 0, 2)
+    assert hunk.added == [0, 1]
+
+
+def test_extract_region_pairs_matches_line_windows():
+    pairs = extract_region_pairs(PRE_CODE, POST_CODE, PATCH, context_lines=3)
+    pre_lines = PRE_CODE.splitlines()
+    post_lines = POST_CODE.splitlines()
+
+    assert pairs == [
+        ("\n".join(pre_lines[0:11]), "\n".join(post_lines[0:11])),
+        ("\n".join(pre_lines[23:36]), "\n".join(post_lines[23:35])),
+    ]
+
+
+def test_context_bounds_stop_at_file_edges():
+    regions = extract_region_pairs_with_context(PRE_CODE, POST_CODE, PATCH, context_lines=3)
+    # The first region starts one line into the file, so only one line of added context precedes it
+    assert [(before, after) for _, _, before, after in regions] == [(1, 3), (3, 3)]
+
+    end_patch = "@@ -38,3 +38,3 @@\n line 38\n line 39\n-line 40\n+line forty"
+    ((_, _, before, after),) = extract_region_pairs_with_context(PRE_CODE, PRE_CODE, end_patch, context_lines=3)
+    assert (before, after) == (3, 0)
+
+
+def test_overlapping_hunks_are_merged():
+    patch = "@@ -5,3 +5,3 @@\n a\n-b\n+B\n c\n@@ -12,3 +12,3 @@\n d\n-e\n+E\n f"
+    hunks = parse_patch(patch)
+
+    assert len(region_spans(hunks, context_lines=3, merge=False)) == 2
+    (span,) = region_spans(hunks, context_lines=3)
+    assert (span.old_lower, span.old_upper) == (1, 17)
+    assert count_regions(patch) == 1
+
+
+def test_line_index_slice_matches_splitlines():
+    for text in ["", "a", "a\n", "a\nb", "a\nb\n", "\n\n", "a\r\nb\r\n"]:
+        index = LineIndex(text)
+        lines = text.splitlines()
+        assert len(index) == len(lines)
+        for lower in range(len(lines) + 1):
+            for upper in range(lower, len(lines) + 2):
+                assert index.slice(lower, upper) == "\n".join(lines[lower:upper])
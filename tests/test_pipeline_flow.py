@@ -0,0 +1,61 @@
+import json
+from collections import Counter
+
+import pytest
+
+pytest.importorskip("prefect")
+
+import flows.pipeline_flow as pipeline_flow
+from models.datatypes import CodeRegion, PreparedIssue, PromptResponse, PromptRow, ReflectionResponse
+
+
+def write_lines(path, records):
+    path.write_text("".join(json.dumps(record) + "\n" for record in records))
+
+
+def test_resume_retries_reflected_issue_with_failed_explanation(tmp_path, monkeypatch):
+    explanations = tmp_path / "explanations.jsonl"
+    reflections = tmp_path / "reflections.jsonl"
+    region = {"filename": "a.py", "code": "x = 1", "code_after": "x = 2"}
+    write_lines(explanations, [
+        {"repo": "owner/repo", "issue_no": 1, "topic": "t", "code_regions": [{**region, "explanation": None, "error": "llm_call_failed"}]},
+        {"repo": "owner/repo", "issue_no": 2, "topic": "t", "code_regions": [{**region, "explanation": "e"}]},
+    ])
+    write_lines(reflections, [
+        {"repo": "owner/repo", "issue_no": 1, "topic": "t", "code_regions": []},
+        {"repo": "owner/repo", "issue_no": 2, "topic": "t", "code_regions": []},
+    ])
+
+    prepared = []
+
+    def fake_prepare_issue(row, topic_map, backend, extra_info, on_skip):
+        prepared.append(row.issue_no)
+        pair = (CodeRegion(filename="a.py", code="x = 1"), CodeRegion(filename="a.py", code="x = 2"))
+        return PreparedIssue(repo=row.repo, issue_no=row.issue_no, topic="t", summary=row.summary, code_regions=[pair], extra={})
+
+    def fake_explain_issue(issue, multi_region):
+        region = CodeRegion(filename="a.py", code="x = 1", explanation="e", code_after="x = 2")
+        return PromptResponse(repo=issue.repo, issue_no=issue.issue_no, topic=issue.topic, code_regions=[region])
+
+    def fake_reflect_issue(repo, issue_no, topic, code_regions, explained_regions):
+        return ReflectionResponse(repo=repo, issue_no=issue_no, topic=topic, code_regions=[])
+
+    rows = [PromptRow(repo="owner/repo", issue_no=n, summary="s", bertopic=0) for n in (1, 2)]
+    monkeypatch.setattr(pipeline_flow, "iter_issue_rows", lambda data_path: iter(rows))
+    monkeypatch.setattr(pipeline_flow, "count_issue_repos", lambda data_path: Counter())
+    monkeypatch.setattr(pipeline_flow, "load_topic_map", lambda: {})
+    monkeypatch.setattr(pipeline_flow, "prepare_issue", fake_prepare_issue)
+    monkeypatch.setattr(pipeline_flow, "explain_issue", fake_explain_issue)
+    monkeypatch.setattr(pipeline_flow, "reflect_issue", fake_reflect_issue)
+    monkeypatch.setattr(pipeline_flow, "log_cache_stats", lambda: None)
+    monkeypatch.setattr(pipeline_flow, "log_response_cache_stats", lambda: None)
+
+    pipeline_flow.explain_reflect_flow.fn(
+        data_path=tmp_path / "issues.feather",
+        explanation_output_path=explanations,
+        reflection_output_path=reflections
+    )
+
+    assert prepared == [1]
+    last = json.loads(explanations.read_text().splitlines()[-1])
+    assert (last["issue_no"], last["code_regions"][0]["explanation"]) == (1, "e")
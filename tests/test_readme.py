@@ -1,5 +1,111 @@
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("github")
+
+from github import UnknownObjectException
+
+import github_api.fetch_readme as fetch_readme
 from github_api.fetch_readme import get_readme_head
 
+
+class StubRepo:
+    def __init__(self, readme: str | None, sha: str = "sha-1"):
+        self.default_branch = "main"
+        self.readme = readme
+        self.sha = sha
+        self.readme_calls = 0
+
+    def get_branch(self, name):
+        return SimpleNamespace(commit=SimpleNamespace(sha=self.sha))
+
+    def get_readme(self, ref):
+        self.readme_calls += 1
+        if self.readme is None:
+            raise UnknownObjectException(404, {"message": "Not Found"}, {})
+        return SimpleNamespace(decoded_content=self.readme.encode())
+
+
+class StubGithub:
+    def __init__(self, repo: StubRepo):
+        self.repo = repo
+        self.repo_calls = 0
+
+    def get_repo(self, name):
+        self.repo_calls += 1
+        return self.repo
+
+
+@pytest.fixture
+def stub_github(tmp_path, monkeypatch):
+    monkeypatch.setattr(fetch_readme, "README_CACHE_DIR", tmp_path / "readme")
+    monkeypatch.setattr(fetch_readme, "_readme_heads", {})
+
+    def install(repo: StubRepo) -> StubGithub:
+        client = StubGithub(repo)
+        monkeypatch.setattr(fetch_readme, "get_github", lambda: client)
+        return client
+
+    return install
+
+
+def test_readme_head_is_memoized_in_process(stub_github):
+    client = stub_github(StubRepo("# Title\nline 1\nline 2"))
+
+    assert get_readme_head("owner/repo") == "line 1\nline 2"
+    assert get_readme_head("owner/repo") == "line 1\nline 2"
+    assert client.repo_calls == 1
+
+
+def test_missing_readme_is_memoized_as_empty(stub_github):
+    repo = StubRepo(None)
+    client = stub_github(repo)
+
+    assert get_readme_head("owner/repo") == ""
+    fetch_readme._readme_heads.clear()
+    assert get_readme_head("owner/repo") == ""
+    assert client.repo_calls == 1
+    assert repo.readme_calls == 1
+
+
+def test_expired_entry_is_revalidated_without_refetch_when_sha_unchanged(stub_github, monkeypatch):
+    repo = StubRepo("# Title\nbody")
+    client = stub_github(repo)
+    assert get_readme_head("owner/repo") == "body"
+
+    monkeypatch.setattr(fetch_readme, "README_CACHE_TTL", 0)
+    fetch_readme._readme_heads.clear()
+    assert get_readme_head("owner/repo") == "body"
+    assert client.repo_calls == 2
+    assert repo.readme_calls == 1
+
+    repo.sha, repo.readme = "sha-2", "# Title\nnew body"
+    fetch_readme._readme_heads.clear()
+    assert get_readme_head("owner/repo") == "new body"
+    assert repo.readme_calls == 2
+
+
+def test_fresh_disk_entry_skips_github(stub_github):
+    client = stub_github(StubRepo("# Title\nbody"))
+    get_readme_head("owner/repo")
+    fetch_readme._readme_heads.clear()
+
+    assert get_readme_head("owner/repo") == "body"
+    assert client.repo_calls == 1
+
+
+def test_transient_failure_is_not_memoized(stub_github, monkeypatch):
+    def unreachable():
+        raise ConnectionError("reset")
+
+    monkeypatch.setattr(fetch_readme, "get_github", unreachable)
+    assert get_readme_head("owner/repo") == ""
+
+    stub_github(StubRepo("# Title\nbody"))
+    assert get_readme_head("owner/repo") == "body"
+
+
 if __name__ == "__main__":
     repo = "microsoft/CNTK"  # Example repository
-    print(get_readme_head(repo))
\ No newline at end of file
+    print(get_readme_head(repo))
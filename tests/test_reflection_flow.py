@@ -0,0 +1,64 @@
+import pytest
+
+pytest.importorskip("prefect")
+
+import flows.reflection_flow as reflection_flow
+from flows.reflection_flow import match_region_pairs, reflect_issue, stored_region_pairs
+from models.datatypes import CodeRegion, PromptResponse
+
+
+def make_response(*regions: dict) -> PromptResponse:
+    return PromptResponse(repo="owner/repo", issue_no=1, topic="1: Topic", code_regions=list(regions))
+
+
+def test_stored_region_pairs_rebuilds_pairs_offline():
+    response = make_response(
+        {"filename": "a.py", "code": "x = 1", "explanation": "e", "code_after": "x = 2"},
+        {"filename": "b.py", "code": "y = 1", "explanation": "e", "code_after": "y = 2"},
+    )
+
+    pairs = stored_region_pairs(response)
+
+    assert [(pre.filename, pre.code, post.code) for pre, post in pairs] == [
+        ("a.py", "x = 1", "x = 2"),
+        ("b.py", "y = 1", "y = 2"),
+    ]
+
+
+def test_stored_region_pairs_is_none_for_older_lines():
+    response = make_response(
+        {"filename": "a.py", "code": "x = 1", "explanation": "e", "code_after": "x = 2"},
+        {"filename": "b.py", "code": "y = 1", "explanation": "e"},
+    )
+
+    assert stored_region_pairs(response) is None
+
+
+def test_match_region_pairs_matches_by_code():
+    response = make_response(
+        {"filename": "b.py", "code": "y = 1\n", "explanation": "e"},
+        {"filename": "c.py", "code": "z = 1", "explanation": "e"},
+        {"filename": "a.py", "code": "x = 1", "explanation": "e"},
+    )
+    fetched = [
+        (CodeRegion(filename="a.py", code="x = 1"), CodeRegion(filename="a.py", code="x = 2")),
+        (CodeRegion(filename="b.py", code="y = 1"), CodeRegion(filename="b.py", code="y = 2")),
+    ]
+
+    matched = match_region_pairs(response, fetched)
+
+    assert [pair[1].code if pair else None for pair in matched] == ["y = 2", None, "x = 2"]
+
+
+def test_reflect_issue_without_matched_regions_is_not_saved(monkeypatch):
+    def unexpected_call(prompts):
+        raise AssertionError("No reflection should be requested")
+
+    monkeypatch.setattr(reflection_flow, "generate_llm_reflections", unexpected_call)
+    pair = (CodeRegion(filename="a.py", code="x = 1"), CodeRegion(filename="a.py", code="x = 2"))
+    explained = [
+        {"filename": "a.py", "code": "x = 1", "explanation": None},
+        {"filename": "b.py", "code": "y = 1", "explanation": "e"},
+    ]
+
+    assert reflect_issue("owner/repo", 1, "1: Topic", [pair, None], explained) is None
@@ -0,0 +1,22 @@
+from pathlib import Path
+
+from benchmarks.replay import derive_github_fixture, install_replay, load_jsonl
+from github_api import client as github_client, content_cache
+from github_api.fetch_diffs import get_code_regions_from_pr
+from llm import client as llm_client
+
+OUTPUT = Path("experiments/exp_001/base_output.jsonl")
+
+
+def test_derived_fixture_replays_recorded_regions(tmp_path, monkeypatch):
+    monkeypatch.setattr(content_cache, "_cache", content_cache.ContentCache(tmp_path / "contents.sqlite"))
+    monkeypatch.setattr(github_client, "_pool", None)
+    monkeypatch.setattr(llm_client, "_async_client", None)
+    github, _ = install_replay(derive_github_fixture([OUTPUT]), [], github_latency=0, llm_latency=0)
+
+    issue = next(i for i in load_jsonl(OUTPUT) if i["repo"] == "h2oai/h2o-3")
+    pairs = get_code_regions_from_pr(issue["repo"], issue["issue_no"])
+
+    assert [pre.code for pre, _ in pairs] == [region["code"] for region in issue["code_regions"]]
+    assert all(pre.code != post.code for pre, post in pairs)
+    assert github.stats.calls["graphql"] == 1
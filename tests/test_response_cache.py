@@ -0,0 +1,34 @@
+import pytest
+from llm.response_cache import ResponseCache, LLMCacheMissError, prompt_key
+
+MESSAGES = [{"role": "user", "content": "Explain this code"}]
+
+
+def test_prompt_key_depends_on_model_and_temperature():
+    key = prompt_key(MESSAGES, "gpt-4o", 0.2)
+    assert key == prompt_key(list(MESSAGES), "gpt-4o", 0.2)
+    assert key != prompt_key(MESSAGES, "gpt-4o-mini", 0.2)
+    assert key != prompt_key(MESSAGES, "gpt-4o", 0.7)
+
+
+def test_response_cache_readwrite(tmp_path):
+    cache = ResponseCache(tmp_path / "llm.sqlite")
+    key = prompt_key(MESSAGES, "gpt-4o", 0.2)
+
+    assert cache.get(key) is None
+    cache.put(key, "gpt-4o", 0.2, "An explanation", total_tokens=120)
+    assert cache.get(key) == "An explanation"
+    assert cache.stats()["tokens_saved"] == 120
+
+
+def test_response_cache_replay_and_bypass(tmp_path):
+    key = prompt_key(MESSAGES, "gpt-4o", 0.2)
+    ResponseCache(tmp_path / "llm.sqlite").put(key, "gpt-4o", 0.2, "An explanation")
+
+    replay = ResponseCache(tmp_path / "llm.sqlite", mode="replay")
+    assert replay.get(key) == "An explanation"
+    with pytest.raises(LLMCacheMissError):
+        replay.get(prompt_key(MESSAGES, "gpt-4o", 0.9))
+
+    bypass = ResponseCache(tmp_path / "llm.sqlite", mode="bypass")
+    assert bypass.get(key) is None
@@ -0,0 +1,56 @@
+import asyncio
+
+import pytest
+
+from llm.retry import backoff_delay, hedged, is_retryable, retry_after_seconds
+
+
+class StatusError(Exception):
+    def __init__(self, status_code, headers=None):
+        super().__init__(f"status {status_code}")
+        self.status_code = status_code
+        self.response = type("Response", (), {"headers": headers or {}})()
+
+
+def test_is_retryable():
+    assert is_retryable(asyncio.TimeoutError())
+    assert is_retryable(StatusError(429))
+    assert is_retryable(StatusError(503))
+    assert not is_retryable(StatusError(400))
+    assert not is_retryable(ValueError("bad prompt"))
+
+
+def test_backoff_honors_retry_after():
+    error = StatusError(429, {"retry-after-ms": "1500"})
+    assert retry_after_seconds(error) == 1.5
+    assert backoff_delay(0, base=0.01, cap=0.01, retry_after=retry_after_seconds(error)) == 1.5
+    assert all(0 <= backoff_delay(3, base=1.0, cap=2.0) <= 2.0 for _ in range(50))
+
+
+def test_hedged_returns_faster_call():
+    delays = iter([1.0, 0.01])
+
+    async def call():
+        delay = next(delays)
+        await asyncio.sleep(delay)
+        return delay
+
+    result, from_hedge = asyncio.run(hedged(call, hedge_after=0.02))
+    assert (result, from_hedge) == (0.01, True)
+
+
+def test_hedged_raises_when_both_fail():
+    calls = []
+
+    async def call():
+        calls.append("primary")
+        await asyncio.sleep(0.05)
+        raise StatusError(500)
+
+    async def hedge_call():
+        calls.append("hedge")
+        raise StatusError(503)
+
+    with pytest.raises(StatusError):
+        asyncio.run(hedged(call, hedge_after=0.01, hedge_call=hedge_call))
+    assert calls == ["primary", "hedge"]
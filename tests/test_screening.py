@@ -0,0 +1,29 @@
+import pytest
+from github_api.fetch_diffs import CodeRegionLimitException, build_pr_region_pairs, count_pr_regions, screen_pr_files
+from models.datatypes import ChangedFile
+
+PRE = "\n".join(f"line {i}" for i in range(200)) + "\n"
+
+
+def _patch(*starts: int) -> str:
+    return "\n".join(f"@@ -{s},1 +{s},1 @@\n-line {s - 1}\n+changed {s - 1}" for s in starts)
+
+
+def test_screen_count_matches_extracted_regions():
+    files = [
+        ChangedFile("src/app.py", "modified", _patch(10, 12, 100)),  # First two hunks merge
+        ChangedFile("src/new.py", "added", _patch(1)),
+        ChangedFile("README.md", "modified", _patch(5)),
+        ChangedFile("src/binary.py", "modified", None),
+    ]
+    pairs = build_pr_region_pairs(files, lambda path, ref: PRE, "base", "head")
+
+    assert count_pr_regions(files) == len(pairs) == 2
+
+
+def test_screen_rejects_over_limit_and_empty_prs():
+    over_limit = [ChangedFile("src/app.py", "modified", _patch(*range(10, 200, 15)))]
+    with pytest.raises(CodeRegionLimitException):
+        screen_pr_files(over_limit)
+    with pytest.raises(CodeRegionLimitException):
+        screen_pr_files([ChangedFile("src/new.py", "added", _patch(1))])
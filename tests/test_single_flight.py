@@ -0,0 +1,62 @@
+import time
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from utils.metrics import get_metrics, reset_metrics
+from utils.single_flight import AsyncSingleFlight, SingleFlight
+
+
+def test_concurrent_calls_share_one_call():
+    reset_metrics()
+    flights = SingleFlight("test")
+    release = threading.Event()
+    calls = []
+
+    def fetch():
+        calls.append(1)
+        release.wait()
+        return "content"
+
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        futures = [executor.submit(flights.do, "key", fetch) for _ in range(4)]
+        while get_metrics().dedup["test"]["calls"] < 4:
+            time.sleep(0.001)
+        release.set()
+        results = [future.result() for future in futures]
+
+    assert results == ["content"] * 4
+    assert len(calls) == 1
+    assert get_metrics().report()["dedup"]["test"] == {"calls": 4, "shared": 3, "ratio": 0.75}
+    # The key is released once the call finishes
+    assert flights.do("key", lambda: "again") == "again"
+
+
+def test_errors_reach_every_waiter():
+    flights = SingleFlight("test")
+    flight, leader = flights.begin("key")
+    waiter, waiter_leads = flights.begin("key")
+    assert leader and not waiter_leads
+    flights.finish("key", flight, error=LookupError("missing"))
+    try:
+        waiter.wait()
+    except LookupError:
+        pass
+    else:
+        raise AssertionError("waiter should see the leader's error")
+
+
+def test_async_calls_share_one_call():
+    flights = AsyncSingleFlight("test")
+    calls = []
+
+    async def complete():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return "explanation"
+
+    async def run():
+        return await asyncio.gather(*(flights.do("prompt", complete) for _ in range(3)))
+
+    assert asyncio.run(run()) == ["explanation"] * 3
+    assert len(calls) == 1
@@ -0,0 +1,105 @@
+import json
+from pathlib import Path
+
+from utils.jsonl_sink import get_sink, close_sink
+from utils.logger import logger
+
+SKIP_REGION_LIMIT = "region_limit"
+SKIP_NO_PR = "no_pr"
+
+
+def repair_jsonl(path: Path) -> int:
+    """
+    Truncate a partially written trailing line left behind by an interrupted run.
+
+    Returns:
+        int: Number of bytes removed.
+    """
+    path = Path(path)
+    if not path.exists():
+        return 0
+
+    with open(path, "rb+") as f:
+        data = f.read()
+        end = len(data)
+        if data and not data.endswith(b"\n"):
+            end = data.rfind(b"\n") + 1
+        else:
+            # A complete line can still be corrupt if the process died between flushes
+            last_start = data.rfind(b"\n", 0, max(end - 1, 0)) + 1
+            last_line = data[last_start:end].strip()
+            if last_line and not last_line.startswith(b"/"):
+                try:
+                    json.loads(last_line)
+                except ValueError:
+                    end = last_start
+
+        removed = len(data) - end
+        if removed:
+            f.truncate(end)
+            logger.warning(f"Truncated {removed} bytes of partially written output from {path}")
+    return removed
+
+
+def skipped_path(path: Path) -> Path:
+    """
+    Sidecar of `path` listing issues skipped for good, e.g. `explanations.jsonl.skipped`.
+    """
+    path = Path(path)
+    return path.with_name(f"{path.name}.skipped")
+
+
+def record_skipped(path: Path, repo: str, issue_no: int, reason: str):
+    """
+    Note in the sidecar of output `path` that an issue was skipped, so resumed runs do not fetch it again.
+    """
+    get_sink(skipped_path(path)).write({"repo": repo, "issue_no": int(issue_no), "reason": reason})
+
+
+def close_skipped(path: Path):
+    close_sink(skipped_path(path))
+
+
+def load_completed(path: Path) -> set[tuple[str, int]]:
+    """
+    Return the (repo, issue_no) pairs already written to a JSONL output or recorded as
+    skipped in its sidecar, repairing both first.
+
+    Records with a region whose LLM call failed (`error` set) are not completed, so a
+    resumed run retries them; the retried record is appended after the failed one.
+    """
+    return _load_keys(path) | _load_keys(skipped_path(path))
+
+
+def load_completed_rows(path: Path) -> set[int]:
+    """
+    Return the input row indexes already written to a JSONL output, repairing it first.
+
+    For outputs whose input can repeat an issue (manual CSVs), so each row resumes on its own.
+    Records with a failed region are not completed, and records without a `row_index`
+    (written before it was stored) are ignored, so those rows run again.
+    """
+    return {index for index, in _load_keys(path, lambda data: (data.get("row_index"),)) if index is not None}
+
+
+def _issue_key(data: dict) -> tuple[str, int]:
+    return data["repo"], int(data["issue_no"])
+
+
+def _load_keys(path: Path, key=_issue_key) -> set[tuple]:
+    path = Path(path)
+    if not path.exists():
+        return set()
+
+    repair_jsonl(path)
+
+    completed = set()
+    with open(path) as f:
+        for line in f:
+            if not line.strip() or line[0] == "/":
+                continue
+            data = json.loads(line)
+            if any(region.get("error") for region in data.get("code_regions") or []):
+                continue
+            completed.add(key(data))
+    return completed
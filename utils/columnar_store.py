@@ -0,0 +1,120 @@
+import os
+import time
+import threading
+from dataclasses import asdict, is_dataclass
+from pathlib import Path
+
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+from utils.logger import logger
+
+ROW_GROUP_SIZE = 10_000  # Regions buffered before a row group is written
+
+REGION_SCHEMA = pa.schema([
+    ("repo", pa.dictionary(pa.int32(), pa.string())),
+    ("issue_no", pa.int64()),
+    ("topic", pa.dictionary(pa.int32(), pa.string())),
+    ("region_index", pa.int32()),
+    ("filename", pa.string()),
+    ("code", pa.string()),
+    ("code_after", pa.string()),
+    ("explanation", pa.string()),
+    ("answer", pa.string()),
+    ("reflection", pa.string()),
+    ("error", pa.string()),
+])
+
+
+def region_rows(response) -> list[dict]:
+    """
+    Flatten a PromptResponse or ReflectionResponse (or its dict form) into one row per code region.
+    """
+    data = asdict(response) if is_dataclass(response) else response
+    rows = []
+    for i, region in enumerate(data["code_regions"]):
+        rows.append({
+            "repo": data["repo"],
+            "issue_no": int(data["issue_no"]),
+            "topic": data["topic"],
+            "region_index": i,
+            "filename": region.get("filename"),
+            # Reflection regions name their fields after the before/after pair
+            "code": region.get("code", region.get("code_before")),
+            "code_after": region.get("code_after"),
+            "explanation": region.get("explanation", region.get("original_explanation")),
+            "answer": region.get("answer"),
+            "reflection": region.get("reflection_response"),
+            "error": region.get("error"),
+        })
+    return rows
+
+
+class ColumnarWriter:
+    """
+    Buffered Parquet writer with one flattened row per code region.
+
+    Each writer creates a new part file inside `directory`, so resumed runs add parts
+    next to earlier ones and `read_regions` loads them together as one dataset. The part is
+    written under a hidden temporary name and renamed on close, so a run that dies before
+    writing the Parquet footer leaves nothing `read_regions` would pick up.
+    """
+
+    def __init__(self, directory: Path, row_group_size: int = ROW_GROUP_SIZE):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        name = f"part-{time.time_ns()}.parquet"
+        self.path = self.directory / name
+        # Dataset discovery skips files starting with "."
+        self._tmp_path = self.directory / f".{name}.tmp"
+        self.row_group_size = row_group_size
+        self.rows_written = 0
+        self._buffer: list[dict] = []
+        self._lock = threading.Lock()
+        self._closed = False
+        self._writer = pq.ParquetWriter(self._tmp_path, REGION_SCHEMA, use_dictionary=["repo", "topic"], compression="zstd")
+
+    def write(self, response):
+        with self._lock:
+            self._buffer.extend(region_rows(response))
+            if len(self._buffer) >= self.row_group_size:
+                self._flush()
+
+    def _flush(self):
+        if not self._buffer:
+            return
+        table = pa.Table.from_pylist(self._buffer, schema=REGION_SCHEMA)
+        self._writer.write_table(table, row_group_size=self.row_group_size)
+        self.rows_written += len(self._buffer)
+        self._buffer = []
+
+    def close(self):
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            try:
+                self._flush()
+            finally:
+                self._writer.close()
+                os.replace(self._tmp_path, self.path)
+        logger.info(f"Wrote {self.rows_written} code regions to {self.path}")
+
+    def __enter__(self) -> "ColumnarWriter":
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def read_regions(directory: Path, columns: list[str] | None = None, filter=None) -> pa.Table:
+    """
+    Load every part file under `directory` as one table, reading only the requested columns.
+
+    Args:
+        columns (list[str] | None): Columns to read; all by default.
+        filter (pyarrow.compute.Expression | None): Row filter pushed down into the scan.
+    """
+    dataset = ds.dataset(directory, format="parquet", schema=REGION_SCHEMA)
+    return dataset.to_table(columns=columns, filter=filter)
@@ -0,0 +1,137 @@
+import queue
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from dataclasses import dataclass
+from typing import Any, Callable, Iterable, Iterator, TypeVar
+
+from utils.logger import logger
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+
+def bounded_map(fn: Callable[[T], R], items: Iterable[T], max_workers: int = 1, ordered: bool = False) -> Iterator[R]:
+    """
+    Apply `fn` to every item using a bounded pool of worker threads.
+
+    At most `2 * max_workers` items are in flight at any time, so `items` can be
+    a lazy iterable of arbitrary length. Results are yielded on the calling thread.
+
+    Args:
+        fn (Callable): Function to apply to each item.
+        items (Iterable): Items to process.
+        max_workers (int): Number of worker threads. 1 or less runs sequentially.
+        ordered (bool): Yield results in input order instead of completion order.
+
+    Returns:
+        Iterator: Results of `fn` for each item.
+    """
+    if max_workers <= 1:
+        for item in items:
+            yield fn(item)
+        return
+
+    max_in_flight = max_workers * 2
+    item_iter = iter(items)
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        pending = deque()
+
+        def fill():
+            while len(pending) < max_in_flight:
+                try:
+                    item = next(item_iter)
+                except StopIteration:
+                    return
+                pending.append(executor.submit(fn, item))
+
+        fill()
+        while pending:
+            if ordered:
+                future = pending.popleft()
+                result = future.result()
+            else:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                future = next(iter(done))
+                pending.remove(future)
+                result = future.result()
+            fill()
+            yield result
+
+
+@dataclass
+class Stage:
+    name: str
+    fn: Callable[[Any], Any]  # Returns the item for the next stage, or None to drop it
+    workers: int = 1
+    on_output: Callable[[Any], None] | None = None  # Called with each output, one call at a time
+
+
+_END = object()
+
+
+def run_pipeline(items: Iterable, stages: list[Stage], queue_size: int = 8) -> Iterator[Any]:
+    """
+    Run `items` through a chain of stages, each with its own worker threads.
+
+    Stages are connected by queues holding at most `queue_size` items, so a slow stage
+    applies backpressure to the ones before it while all stages work concurrently.
+    An item whose stage raises is logged and dropped. Outputs of the last stage are
+    yielded on the calling thread as they complete.
+
+    Args:
+        items (Iterable): Inputs of the first stage; consumed lazily.
+        stages (list[Stage]): Stages in order.
+        queue_size (int): Capacity of each queue between stages.
+
+    Returns:
+        Iterator: Outputs of the last stage, in completion order.
+    """
+    queues = [queue.Queue(maxsize=queue_size) for _ in range(len(stages) + 1)]
+
+    def feed():
+        try:
+            for item in items:
+                queues[0].put(item)
+        except Exception as e:
+            logger.error(f"Pipeline input failed: {e}")
+        finally:
+            queues[0].put(_END)
+
+    def work(index: int, stage: Stage, lock: threading.Lock, remaining: list[int]):
+        inbox, outbox = queues[index], queues[index + 1]
+        while True:
+            item = inbox.get()
+            if item is _END:
+                inbox.put(_END)  # Let the stage's other workers see the end as well
+                with lock:
+                    remaining[0] -= 1
+                    last = remaining[0] == 0
+                if last:
+                    outbox.put(_END)
+                return
+            try:
+                result = stage.fn(item)
+                if result is None:
+                    continue
+                if stage.on_output is not None:
+                    with lock:
+                        stage.on_output(result)
+            except Exception as e:
+                logger.error(f"Pipeline stage '{stage.name}' failed: {e}")
+                continue
+            outbox.put(result)
+
+    threading.Thread(target=feed, name="pipeline-feed", daemon=True).start()
+    for index, stage in enumerate(stages):
+        lock = threading.Lock()
+        remaining = [max(stage.workers, 1)]
+        for n in range(remaining[0]):
+            threading.Thread(target=work, args=(index, stage, lock, remaining), name=f"pipeline-{stage.name}-{n}", daemon=True).start()
+
+    while True:
+        result = queues[-1].get()
+        if result is _END:
+            return
+        yield result
@@ -0,0 +1,64 @@
+from collections import Counter
+from pathlib import Path
+from typing import Iterator
+
+import pandas as pd
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+
+from models.datatypes import PromptRow, ManualPromptRow
+
+ISSUE_COLUMNS = ["repo", "issue_no", "summary", "bertopic"]
+MANUAL_COLUMNS = ["url", "summary", "topic", "code", "extra", "answer"]
+BATCH_SIZE = 10_000
+
+
+def _issue_scanner(data_path: Path, columns: list[str], batch_size: int = BATCH_SIZE) -> ds.Scanner:
+    """
+    Scanner over an Arrow IPC (feather v2) file with the issue filter pushed down into the reader.
+    """
+    dataset = ds.dataset(data_path, format="feather")
+    # 'bertopic' != -1: topic has been successfully classified
+    # 'chunk' == 0: row holds the summary of the issue
+    issue_filter = (pc.field("bertopic") != -1) & (pc.field("chunk") == 0)
+    return dataset.scanner(columns=columns, filter=issue_filter, batch_size=batch_size)
+
+
+def iter_issue_rows(data_path: Path, batch_size: int = BATCH_SIZE) -> Iterator[PromptRow]:
+    """
+    Lazily yield classified issue summaries from a feather file, one record batch at a time.
+    """
+    for batch in _issue_scanner(data_path, ISSUE_COLUMNS, batch_size).to_batches():
+        for record in batch.to_pylist():
+            yield PromptRow(
+                repo=record["repo"].replace("_", "/"),  # replace underscores in repo names with slashes
+                issue_no=int(record["issue_no"]),
+                summary=record["summary"],
+                bertopic=int(record["bertopic"])
+            )
+
+
+def count_issue_repos(data_path: Path) -> Counter:
+    """
+    Count classified issues per repo, reading only the 'repo' column.
+    """
+    counts = Counter()
+    for batch in _issue_scanner(data_path, ["repo"]).to_batches():
+        counts.update(repo.replace("_", "/") for repo in batch.column("repo").to_pylist())
+    return counts
+
+
+def iter_manual_rows(data_path: Path, chunksize: int = BATCH_SIZE) -> Iterator[ManualPromptRow]:
+    """
+    Lazily yield manual prompt rows from a CSV file, reading only the needed columns in chunks.
+    """
+    for chunk in pd.read_csv(data_path, usecols=MANUAL_COLUMNS, chunksize=chunksize):
+        for row in chunk.itertuples():
+            yield ManualPromptRow(
+                url=row.url,
+                summary=row.summary,
+                topic=row.topic,
+                code=row.code,
+                extra=row.extra,
+                answer=row.answer
+            )
@@ -0,0 +1,239 @@
+import os
+import sys
+import json
+import time
+import queue
+import atexit
+import signal
+import threading
+from dataclasses import asdict, is_dataclass
+from pathlib import Path
+
+from utils.logger import logger
+from utils.metrics import span
+
+try:
+    import orjson
+except ImportError:  # Optional; the stdlib encoder is used instead
+    orjson = None
+
+FLUSH_INTERVAL = 1.0  # Seconds a record may sit in the buffer before it is written
+FSYNC_INTERVAL = 5.0  # Seconds between fsyncs of written data
+MAX_BUFFERED = 500  # Records buffered before a write is forced
+
+_CLOSE = object()
+
+
+def encode_record(record) -> bytes:
+    """
+    Encode a dataclass or dict as one JSON line.
+
+    Both encoders write compact separators and raw UTF-8, so the output bytes are the same
+    whether or not orjson is installed.
+    """
+    if orjson is not None:
+        return orjson.dumps(record, option=orjson.OPT_APPEND_NEWLINE)
+    if is_dataclass(record):
+        record = asdict(record)
+    return (json.dumps(record, ensure_ascii=False, separators=(",", ":")) + "\n").encode()
+
+
+class JsonlSink:
+    """
+    Append-only JSONL output fed by any number of threads and written by one.
+
+    Records are encoded by `write` on the caller's thread, so encoding errors reach the
+    caller, then queued, buffered by a single writer thread and written every
+    FLUSH_INTERVAL seconds or MAX_BUFFERED records, with an fsync at most every
+    FSYNC_INTERVAL seconds. Each record is written as one complete line.
+
+    If the writer thread fails (e.g. a full disk), the error is kept and raised from every
+    later `write`, `flush` and `close`, so lost records are never reported as saved.
+    """
+
+    def __init__(self, path: Path, flush_interval: float = FLUSH_INTERVAL, fsync_interval: float = FSYNC_INTERVAL, max_buffered: int = MAX_BUFFERED):
+        self.path = Path(path)
+        self.flush_interval = flush_interval
+        self.fsync_interval = fsync_interval
+        self.max_buffered = max_buffered
+        self.records_written = 0
+        self._queue: queue.Queue = queue.Queue()
+        self._closed = False
+        self._error: BaseException | None = None
+        self._thread = threading.Thread(target=self._run, name=f"jsonl-sink-{self.path.name}", daemon=True)
+        self._thread.start()
+
+    def write(self, record):
+        """
+        Queue one record for writing.
+
+        Raises:
+            TypeError: If the record cannot be encoded as JSON.
+            OSError: If the writer thread failed to write earlier records.
+        """
+        self._raise_error()
+        if self._closed:
+            raise RuntimeError(f"JSONL sink for {self.path} is closed")
+        self._queue.put(encode_record(record))
+
+    def flush(self):
+        """
+        Block until every record queued so far is written and synced to disk.
+
+        Raises:
+            OSError: If the writer thread failed before the records were written.
+        """
+        self._raise_error()
+        done = threading.Event()
+        self._queue.put(done)
+        # The writer thread may have stopped after the check above and will never set the event
+        while not done.wait(timeout=self.flush_interval) and self._thread.is_alive():
+            pass
+        self._raise_error()
+
+    def close(self):
+        """
+        Write out every queued record and stop the writer thread.
+
+        Raises:
+            OSError: If the writer thread failed, so some records were not written.
+        """
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(_CLOSE)
+        self._thread.join()
+        self._raise_error()
+
+    def _raise_error(self):
+        if self._error is not None:
+            raise self._error
+
+    def _run(self):
+        try:
+            self._write_loop()
+        except BaseException as e:
+            self._error = e
+            logger.error(f"JSONL sink for {self.path} stopped writing: {e}")
+        finally:
+            # Release callers blocked in flush(); the records they wait on will not be written
+            while True:
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if isinstance(item, threading.Event):
+                    item.set()
+
+    def _write_loop(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        buffer: list[bytes] = []
+        last_write = last_sync = time.monotonic()
+        unsynced = False
+
+        with open(self.path, "ab") as f:
+            def write_buffer(sync: bool):
+                nonlocal buffer, last_write, last_sync, unsynced
+                if buffer:
+                    with span("write"):
+                        f.write(b"".join(buffer))
+                        f.flush()
+                    self.records_written += len(buffer)
+                    buffer = []
+                    unsynced = True
+                last_write = time.monotonic()
+                if unsynced and (sync or last_write - last_sync >= self.fsync_interval):
+                    os.fsync(f.fileno())
+                    last_sync = last_write
+                    unsynced = False
+
+            while True:
+                timeout = max(self.flush_interval - (time.monotonic() - last_write), 0)
+                try:
+                    item = self._queue.get(timeout=timeout)
+                except queue.Empty:
+                    write_buffer(sync=False)
+                    continue
+
+                if item is _CLOSE:
+                    write_buffer(sync=True)
+                    return
+                if isinstance(item, threading.Event):
+                    write_buffer(sync=True)
+                    item.set()
+                    continue
+
+                buffer.append(item)
+                if len(buffer) >= self.max_buffered or time.monotonic() - last_write >= self.flush_interval:
+                    write_buffer(sync=False)
+
+
+_sinks: dict[Path, JsonlSink] = {}
+_sinks_lock = threading.Lock()
+_handlers_installed = False
+
+
+def get_sink(path: Path) -> JsonlSink:
+    """
+    Return the shared sink for `path`, so every writer of a file goes through one thread.
+    """
+    key = Path(path).resolve()
+    with _sinks_lock:
+        sink = _sinks.get(key)
+        if sink is None:
+            _install_exit_handlers()
+            sink = _sinks[key] = JsonlSink(path)
+    return sink
+
+
+def close_sink(path: Path):
+    """
+    Write out and close the shared sink for `path`, if one is open.
+    """
+    with _sinks_lock:
+        sink = _sinks.pop(Path(path).resolve(), None)
+    if sink is not None:
+        sink.close()
+        logger.debug(f"Closed JSONL sink for {sink.path} after {sink.records_written} records.")
+
+
+def close_all_sinks(blocking: bool = True) -> bool:
+    """
+    Write out and close every open sink.
+
+    Returns:
+        bool: False if `blocking` is off and the sink registry was busy, in which case nothing was closed.
+    """
+    if not _sinks_lock.acquire(blocking=blocking):
+        return False
+    try:
+        sinks = list(_sinks.values())
+        _sinks.clear()
+    finally:
+        _sinks_lock.release()
+    for sink in sinks:
+        try:
+            sink.close()
+        except Exception as e:
+            # Keep closing the other sinks; the error was already logged by the writer thread
+            logger.error(f"Failed to close JSONL sink for {sink.path}: {e}")
+    return True
+
+
+def _handle_signal(signum, frame):
+    # The frame this handler interrupted may hold the registry lock; if so, leave closing to
+    # the atexit handler, which runs after SystemExit has unwound that frame
+    close_all_sinks(blocking=False)
+    # Exit through SystemExit so the remaining atexit handlers still run
+    sys.exit(128 + signum)
+
+
+def _install_exit_handlers():
+    global _handlers_installed
+    if _handlers_installed:
+        return
+    _handlers_installed = True
+    atexit.register(close_all_sinks)
+    # Signal handlers can only be set from the main thread; leave custom handlers alone
+    if threading.current_thread() is threading.main_thread() and signal.getsignal(signal.SIGTERM) == signal.SIG_DFL:
+        signal.signal(signal.SIGTERM, _handle_signal)
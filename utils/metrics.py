@@ -0,0 +1,207 @@
+import os
+import json
+import math
+import time
+import threading
+from collections import defaultdict
+from contextlib import contextmanager, nullcontext
+from pathlib import Path
+
+from utils.logger import logger
+
+try:
+    from opentelemetry import trace
+except ImportError:  # Optional; spans are only recorded in-process without it
+    trace = None
+
+# Written as JSON at the end of each run when set
+METRICS_EXPORT_PATH = os.getenv("METRICS_EXPORT_PATH")
+# Also emit every span to the configured OpenTelemetry tracer
+OTEL_ENABLED = os.getenv("METRICS_OTEL", "0") == "1"
+
+# USD per 1M tokens: (input, cached input, output)
+MODEL_PRICES = {
+    "gpt-4o": (2.50, 1.25, 10.00),
+    "gpt-4o-mini": (0.15, 0.075, 0.60),
+    "gpt-4.1": (2.00, 0.50, 8.00),
+    "gpt-4.1-mini": (0.40, 0.10, 1.60),
+}
+BATCH_PREFIX = "batch:"  # Token totals of Batch API calls are kept under "batch:<model>"
+BATCH_DISCOUNT = 0.5  # Batch API calls are billed at half the live price
+
+
+def _usage_field(usage, name: str):
+    # Live calls return usage objects, Batch API output holds the same fields as plain dicts
+    return usage.get(name) if isinstance(usage, dict) else getattr(usage, name, None)
+
+
+def percentile(values: list[float], q: float) -> float:
+    """
+    Nearest-rank percentile of `values` (q in [0, 100]).
+    """
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(math.ceil(q / 100 * len(ordered)) - 1, 0)
+    return ordered[min(rank, len(ordered) - 1)]
+
+
+class RunMetrics:
+    """
+    Thread-safe collector of stage timings, LLM token usage, GitHub rate-limit state and in-run
+    deduplication of identical calls for one run.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.started_at = time.time()
+        self.spans: dict[str, list[float]] = defaultdict(list)
+        self.tokens: dict[str, dict[str, int]] = defaultdict(lambda: {"calls": 0, "prompt": 0, "completion": 0, "cached": 0})
+        self.github_rate_limit: dict | None = None
+        self.dedup: dict[str, dict[str, int]] = defaultdict(lambda: {"calls": 0, "shared": 0})
+        self._tracer = trace.get_tracer("rag-inclusion-llm") if trace is not None and OTEL_ENABLED else None
+
+    @contextmanager
+    def span(self, stage: str, **attributes):
+        """
+        Time the enclosed block under `stage`; failed blocks are timed as well.
+        """
+        otel_span = self._tracer.start_as_current_span(stage, attributes=attributes) if self._tracer else nullcontext()
+        start = time.perf_counter()
+        try:
+            with otel_span:
+                yield
+        finally:
+            elapsed = time.perf_counter() - start
+            with self._lock:
+                self.spans[stage].append(elapsed)
+
+    def record_usage(self, model: str, usage, batch: bool = False):
+        """
+        Add the token counts of an OpenAI `usage` object or dict, including prompt tokens served from the provider's cache.
+
+        Args:
+            batch (bool): The call went through the Batch API; its tokens are kept under
+                "batch:<model>" and priced with BATCH_DISCOUNT.
+        """
+        if usage is None:
+            return
+        details = _usage_field(usage, "prompt_tokens_details")
+        cached = (_usage_field(details, "cached_tokens") if details is not None else 0) or 0
+        with self._lock:
+            totals = self.tokens[f"{BATCH_PREFIX}{model}" if batch else model]
+            totals["calls"] += 1
+            totals["prompt"] += _usage_field(usage, "prompt_tokens") or 0
+            totals["completion"] += _usage_field(usage, "completion_tokens") or 0
+            totals["cached"] += cached
+
+    def record_rate_limit(self, remaining: int, limit: int, reset: float):
+        with self._lock:
+            if self.github_rate_limit is None or remaining < self.github_rate_limit["min_remaining"]:
+                min_remaining = remaining
+            else:
+                min_remaining = self.github_rate_limit["min_remaining"]
+            self.github_rate_limit = {"remaining": remaining, "limit": limit, "reset": reset, "min_remaining": min_remaining}
+
+    def record_dedup(self, name: str, shared: bool):
+        """
+        Count one call of a single-flight group, and whether it shared a call already in flight.
+        """
+        with self._lock:
+            counts = self.dedup[name]
+            counts["calls"] += 1
+            counts["shared"] += int(shared)
+
+    def cost(self) -> float:
+        total = 0.0
+        with self._lock:
+            for model, totals in self.tokens.items():
+                batch = model.startswith(BATCH_PREFIX)
+                prices = MODEL_PRICES.get(model.removeprefix(BATCH_PREFIX))
+                if prices is None:
+                    continue
+                input_price, cached_price, output_price = prices
+                uncached = totals["prompt"] - totals["cached"]
+                model_cost = (uncached * input_price + totals["cached"] * cached_price + totals["completion"] * output_price) / 1_000_000
+                total += model_cost * BATCH_DISCOUNT if batch else model_cost
+        return total
+
+    def report(self) -> dict:
+        """
+        Summary of the run: per-stage count, total, p50 and p95 seconds, throughput, tokens, cost
+        and the share of calls served by an identical call already in flight.
+        """
+        elapsed = time.time() - self.started_at
+        cost = self.cost()
+        with self._lock:
+            stages = {
+                stage: {
+                    "count": len(durations),
+                    "total_s": sum(durations),
+                    "p50_s": percentile(durations, 50),
+                    "p95_s": percentile(durations, 95),
+                    "per_s": len(durations) / elapsed if elapsed else 0.0,
+                }
+                for stage, durations in sorted(self.spans.items())
+            }
+            return {
+                "elapsed_s": elapsed,
+                "stages": stages,
+                "tokens": {model: dict(totals) for model, totals in self.tokens.items()},
+                "cost_usd": cost,
+                "github_rate_limit": self.github_rate_limit,
+                "dedup": {
+                    name: {**counts, "ratio": counts["shared"] / counts["calls"] if counts["calls"] else 0.0}
+                    for name, counts in sorted(self.dedup.items())
+                },
+            }
+
+
+_metrics = RunMetrics()
+
+
+def get_metrics() -> RunMetrics:
+    return _metrics
+
+
+def reset_metrics():
+    """
+    Start a fresh collection, e.g. at the beginning of each flow run.
+    """
+    global _metrics
+    _metrics = RunMetrics()
+
+
+def span(stage: str, **attributes):
+    return _metrics.span(stage, **attributes)
+
+
+def log_run_report(export_path: Path | str | None = METRICS_EXPORT_PATH) -> dict:
+    """
+    Log the run summary and, if `export_path` is set, also write it as JSON.
+    """
+    report = _metrics.report()
+    logger.info(f"Run finished in {report['elapsed_s']:.1f}s.")
+    for stage, stats in report["stages"].items():
+        logger.info(
+            f"  {stage}: {stats['count']} x, p50 {stats['p50_s'] * 1000:.0f}ms, p95 {stats['p95_s'] * 1000:.0f}ms, "
+            f"total {stats['total_s']:.1f}s, {stats['per_s']:.2f}/s"
+        )
+    for model, totals in report["tokens"].items():
+        logger.info(
+            f"  {model}: {totals['calls']} calls, {totals['prompt']} prompt tokens ({totals['cached']} cached), "
+            f"{totals['completion']} completion tokens"
+        )
+    logger.info(f"  Estimated cost: ${report['cost_usd']:.4f}")
+    if report["github_rate_limit"]:
+        limit = report["github_rate_limit"]
+        logger.info(f"  GitHub rate limit: {limit['remaining']}/{limit['limit']} remaining (lowest {limit['min_remaining']}).")
+    for name, counts in report["dedup"].items():
+        logger.info(f"  Deduplicated {name}: {counts['shared']}/{counts['calls']} calls shared ({counts['ratio']:.1%}).")
+
+    if export_path:
+        export_path = Path(export_path)
+        export_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(export_path, "w") as f:
+            json.dump(report, f, indent=2)
+    return report
@@ -0,0 +1,179 @@
+import re
+from dataclasses import dataclass, field
+
+HUNK_HEADER = re.compile(r"^@@ -(\d+)(?:,(\d+))? \+(\d+)(?:,(\d+))? @@", re.MULTILINE)
+
+
+@dataclass
+class Hunk:
+    old_start: int  # 0-based first line of the hunk in the pre-change file
+    old_length: int
+    new_start: int  # 0-based first line of the hunk in the post-change file
+    new_length: int
+    removed: list[int] = field(default_factory=list)  # 0-based offsets of removed lines in the old file
+    added: list[int] = field(default_factory=list)  # 0-based offsets of added lines in the new file
+    context: list[int] = field(default_factory=list)  # 0-based offsets of context lines in the old file
+
+
+@dataclass
+class RegionSpan:
+    old_lower: int  # Half-open [lower, upper) line ranges, already widened by the context lines
+    old_upper: int
+    new_lower: int
+    new_upper: int
+    hunks: list[Hunk] = field(default_factory=list)
+
+
+def parse_patch(patch: str) -> list[Hunk]:
+    """
+    Parse the hunks of a unified diff patch in a single pass.
+    """
+    hunks: list[Hunk] = []
+    hunk = None
+    old_line = new_line = 0
+
+    for line in patch.split("\n"):
+        if line.startswith("@@"):
+            match = HUNK_HEADER.match(line)
+            if not match:
+                continue
+            old_length = int(match.group(2)) if match.group(2) is not None else 1
+            new_length = int(match.group(4)) if match.group(4) is not None else 1
+            # A zero-length side reports the line *before* the change, so it has no offset to subtract
+            old_line = int(match.group(1)) - (1 if old_length else 0)
+            new_line = int(match.group(3)) - (1 if new_length else 0)
+            hunk = Hunk(old_start=old_line, old_length=old_length, new_start=new_line, new_length=new_length)
+            hunks.append(hunk)
+        elif hunk is None:
+            continue
+        elif line.startswith("-"):
+            hunk.removed.append(old_line)
+            old_line += 1
+        elif line.startswith("+"):
+            hunk.added.append(new_line)
+            new_line += 1
+        elif line.startswith(" "):
+            hunk.context.append(old_line)
+            old_line += 1
+            new_line += 1
+        # "\ No newline at end of file" and blank trailing lines carry no line numbers
+
+    return hunks
+
+
+def parse_hunk_headers(patch: str) -> list[Hunk]:
+    """
+    Parse only the hunk headers of a patch; line offsets are left empty.
+
+    Enough to compute region spans, and much cheaper than `parse_patch` on large patches.
+    """
+    hunks: list[Hunk] = []
+    for match in HUNK_HEADER.finditer(patch):
+        old_length = int(match.group(2)) if match.group(2) is not None else 1
+        new_length = int(match.group(4)) if match.group(4) is not None else 1
+        hunks.append(Hunk(
+            old_start=int(match.group(1)) - (1 if old_length else 0),
+            old_length=old_length,
+            new_start=int(match.group(3)) - (1 if new_length else 0),
+            new_length=new_length
+        ))
+    return hunks
+
+
+def region_spans(hunks: list[Hunk], context_lines: int = 3, merge: bool = True) -> list[RegionSpan]:
+    """
+    Widen each hunk by `context_lines` on both sides and, with `merge`, join hunks whose
+    widened ranges overlap or touch so the same lines are never sent twice.
+    """
+    spans: list[RegionSpan] = []
+    for hunk in hunks:
+        span = RegionSpan(
+            old_lower=max(0, hunk.old_start - context_lines),
+            old_upper=hunk.old_start + hunk.old_length + context_lines,
+            new_lower=max(0, hunk.new_start - context_lines),
+            new_upper=hunk.new_start + hunk.new_length + context_lines,
+            hunks=[hunk]
+        )
+        if merge and spans and (span.old_lower <= spans[-1].old_upper or span.new_lower <= spans[-1].new_upper):
+            previous = spans[-1]
+            previous.old_upper = max(previous.old_upper, span.old_upper)
+            previous.new_upper = max(previous.new_upper, span.new_upper)
+            previous.hunks.append(hunk)
+        else:
+            spans.append(span)
+    return spans
+
+
+class LineIndex:
+    """
+    Lines of a text, split once and shared by every region sliced from it.
+    """
+
+    def __init__(self, text: str):
+        self.lines = text.split("\n")
+        if self.lines[-1] == "":
+            self.lines.pop()  # A trailing newline (or empty text) does not start another line
+
+    def __len__(self) -> int:
+        return len(self.lines)
+
+    def slice(self, lower: int, upper: int) -> str:
+        """
+        Return lines [lower, upper) joined by newlines.
+        """
+        segment = "\n".join(self.lines[lower:upper])
+        if "\r" in segment:
+            segment = segment.replace("\r\n", "\n").removesuffix("\r")
+        return segment
+
+
+def span_context(span: RegionSpan, line_count: int) -> tuple[int, int]:
+    """
+    Lines of added context actually present before and after the hunks of a pre-change region.
+
+    Fewer than `context_lines` remain when the region touches the start or end of the file.
+    """
+    first, last = span.hunks[0], span.hunks[-1]
+    before = first.old_start - span.old_lower
+    after = min(span.old_upper, line_count) - (last.old_start + last.old_length)
+    return max(before, 0), max(after, 0)
+
+
+def extract_region_pairs_with_context(pre_code: str, post_code: str, patch: str, context_lines: int = 3, merge: bool = True) -> list[tuple[str, str, int, int]]:
+    """
+    Return matched (pre, post) code regions for every (merged) hunk of a patch, with the
+    number of added context lines before and after the hunks of each pre region.
+    """
+    spans = region_spans(parse_hunk_headers(patch), context_lines, merge)
+    if not spans:
+        return []
+
+    pre_index = LineIndex(pre_code)
+    post_index = LineIndex(post_code)
+    return [
+        (pre_index.slice(span.old_lower, span.old_upper), post_index.slice(span.new_lower, span.new_upper), *span_context(span, len(pre_index)))
+        for span in spans
+    ]
+
+
+def extract_region_pairs(pre_code: str, post_code: str, patch: str, context_lines: int = 3, merge: bool = True) -> list[tuple[str, str]]:
+    """
+    Return matched (pre, post) code regions for every (merged) hunk of a patch.
+    """
+    return [(pre, post) for pre, post, _, _ in extract_region_pairs_with_context(pre_code, post_code, patch, context_lines, merge)]
+
+
+def extract_pre_regions(pre_code: str, patch: str, context_lines: int = 3, merge: bool = True) -> list[str]:
+    """
+    Return the pre-change code region for every (merged) hunk of a patch.
+    """
+    spans = region_spans(parse_hunk_headers(patch), context_lines, merge)
+    pre_index = LineIndex(pre_code)
+    return [pre_index.slice(span.old_lower, span.old_upper) for span in spans]
+
+
+def count_regions(patch: str, context_lines: int = 3, merge: bool = True) -> int:
+    """
+    Number of regions a patch yields, from its hunk headers alone.
+    """
+    return len(region_spans(parse_hunk_headers(patch), context_lines, merge))
@@ -0,0 +1,100 @@
+import asyncio
+import threading
+from typing import Awaitable, Callable, Hashable, TypeVar
+
+from utils.metrics import get_metrics
+
+R = TypeVar("R")
+
+
+class Flight:
+    """
+    One in-flight call, whose result or error is handed to every waiter.
+    """
+
+    def __init__(self):
+        self.result = None
+        self.error: BaseException | None = None
+        self._done = threading.Event()
+
+    def wait(self):
+        self._done.wait()
+        if self.error is not None:
+            raise self.error
+        return self.result
+
+
+class SingleFlight:
+    """
+    Collapse concurrent calls with the same key into one call shared by every caller.
+
+    Only calls that overlap in time are shared; once a call finishes its key is released,
+    so later callers go through the persistent caches as before. Every call is counted
+    under `name` in the run metrics, as either the leader or a shared waiter.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._lock = threading.Lock()
+        self._flights: dict[Hashable, Flight] = {}
+
+    def begin(self, key: Hashable) -> tuple[Flight, bool]:
+        """
+        Join the flight for `key`, starting one if none is in progress.
+
+        Returns:
+            tuple: The flight, and whether the caller leads it and must `finish` it.
+        """
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = Flight()
+        get_metrics().record_dedup(self.name, shared=not leader)
+        return flight, leader
+
+    def finish(self, key: Hashable, flight: Flight, result=None, error: BaseException | None = None):
+        with self._lock:
+            if self._flights.get(key) is flight:
+                del self._flights[key]
+        flight.result = result
+        flight.error = error
+        flight._done.set()
+
+    def do(self, key: Hashable, fn: Callable[[], R]) -> R:
+        """
+        Return `fn()`, or the result of the identical call already in flight.
+        """
+        flight, leader = self.begin(key)
+        if not leader:
+            return flight.wait()
+        try:
+            result = fn()
+        except BaseException as e:
+            self.finish(key, flight, error=e)
+            raise
+        self.finish(key, flight, result=result)
+        return result
+
+
+class AsyncSingleFlight:
+    """
+    `SingleFlight` for coroutines running on one event loop.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._tasks: dict[Hashable, asyncio.Future] = {}
+
+    async def do(self, key: Hashable, call: Callable[[], Awaitable[R]]) -> R:
+        """
+        Await `call()`, or the identical call already in flight.
+
+        The shared call runs as its own task, so a cancelled waiter does not cancel it for the others.
+        """
+        task = self._tasks.get(key)
+        get_metrics().record_dedup(self.name, shared=task is not None)
+        if task is None:
+            task = self._tasks[key] = asyncio.ensure_future(call())
+            task.add_done_callback(lambda _: self._tasks.pop(key, None))
+        return await asyncio.shield(task)